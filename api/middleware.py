@@ -0,0 +1,140 @@
+"""Middleware y endpoints ASGI puros para las rutas más calientes."""
+from typing import Iterable, List, Tuple
+
+Headers = List[Tuple[bytes, bytes]]
+
+ALLOW_METHODS = b"DELETE, GET, HEAD, OPTIONS, PATCH, POST, PUT"
+PREFLIGHT_MAX_AGE = b"600"
+
+
+class PureASGICORS:
+    """CORS permisivo equivalente a ``CORSMiddleware`` sin construir Request/Response.
+
+    Replica la configuración anterior (cualquier origen, método y header, con
+    credenciales): las cabeceras se precalculan y solo se añaden al mensaje
+    ``http.response.start``.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self._simple_headers: Headers = [
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-expose-headers", b"*"),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        request_method = None
+        request_headers = None
+        has_cookie = False
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value
+            elif name == b"access-control-request-method":
+                request_method = value
+            elif name == b"access-control-request-headers":
+                request_headers = value
+            elif name == b"cookie":
+                has_cookie = True
+
+        # Sin Origin no es una petición CORS
+        if origin is None:
+            await self.app(scope, receive, send)
+            return
+
+        if scope["method"] == "OPTIONS" and request_method is not None:
+            await self._preflight(origin, request_headers, send)
+            return
+
+        # Con credenciales el navegador no acepta "*": se refleja el origen
+        if has_cookie:
+            extra = [(b"access-control-allow-origin", origin), (b"vary", b"Origin")]
+        else:
+            extra = [(b"access-control-allow-origin", b"*")]
+        extra += self._simple_headers
+
+        async def send_with_cors(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                present = {name.lower() for name, _ in headers}
+                headers.extend(h for h in extra if h[0] not in present)
+                message = {**message, "headers": headers}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cors)
+
+    @staticmethod
+    async def _preflight(origin: bytes, request_headers, send) -> None:
+        """Responde el preflight directamente, sin llegar al router."""
+        headers = [
+            (b"access-control-allow-origin", origin),
+            (b"access-control-allow-credentials", b"true"),
+            (b"access-control-allow-methods", ALLOW_METHODS),
+            (b"access-control-max-age", PREFLIGHT_MAX_AGE),
+            (b"vary", b"Origin"),
+            (b"content-type", b"text/plain; charset=utf-8"),
+            (b"content-length", b"2"),
+        ]
+        if request_headers is not None:
+            headers.append((b"access-control-allow-headers", request_headers))
+
+        await send({"type": "http.response.start", "status": 200, "headers": headers})
+        await send({"type": "http.response.body", "body": b"OK"})
+
+
+class StaticASGIResponse:
+    """Endpoint ASGI que sirve siempre el mismo cuerpo precalculado.
+
+    Al no ser una función, Starlette lo monta como aplicación ASGI y no
+    instancia ``Request`` por petición.
+    """
+
+    def __init__(
+        self,
+        body: bytes,
+        media_type: bytes,
+        methods: Iterable[str] = ("GET", "HEAD"),
+        status: int = 200
+    ):
+        self.body = body
+        self.status = status
+        self.methods = frozenset(methods)
+        self.headers: Headers = [
+            (b"content-type", media_type),
+            (b"content-length", str(len(body)).encode("latin-1")),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        method = scope["method"]
+        if method not in self.methods:
+            allow = ", ".join(sorted(self.methods)).encode("latin-1")
+            await send({
+                "type": "http.response.start",
+                "status": 405,
+                "headers": [(b"allow", allow), (b"content-length", b"0")],
+            })
+            await send({"type": "http.response.body", "body": b""})
+            return
+
+        await send({"type": "http.response.start", "status": self.status, "headers": self.headers})
+        await send({"type": "http.response.body", "body": b"" if method == "HEAD" else self.body})
+
+
+class ReadinessEndpoint:
+    """Delega en ``ready`` o ``starting`` según ``app.state.ready``.
+
+    Sin evento de arranque (p. ej. sin lifespan en tests) se considera lista.
+    """
+
+    def __init__(self, ready, starting):
+        self.ready = ready
+        self.starting = starting
+
+    async def __call__(self, scope, receive, send):
+        event = getattr(scope["app"].state, "ready", None)
+        target = self.ready if event is None or event.is_set() else self.starting
+        await target(scope, receive, send)
@@ -1,16 +1,17 @@
 """Endpoints del API REST."""
 import asyncio
-from datetime import datetime
-from typing import Dict, Any
-from utils.monitoring import log_search_prediction
+import time
+from typing import AsyncIterator, Dict, Any
+from utils.monitoring import enqueue_search_prediction
 
 
+from elasticsearch.exceptions import ConnectionError as ESConnectionError, TransportError
 from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from config import get_settings
 from models.schemas import (
-    SearchRequest, SearchResponse, SyncRequest, SyncResponse,
+    Product, SearchRequest, SearchResponse, SyncRequest, SyncResponse,
     HealthResponse, CategoriesResponse, StatsResponse, ServiceStatus,
     IndexStats, ErrorResponse
 )
@@ -22,7 +23,14 @@ from utils.logger import get_logger
 settings = get_settings()
 logger = get_logger(__name__)
 
-router = APIRouter()
+router = APIRouter(default_response_class=ORJSONResponse)
+
+
+async def _prepend(first: Product, rest: AsyncIterator[Product]) -> AsyncIterator[Product]:
+    """Reinyecta el primer producto ya leído delante del resto del flujo."""
+    yield first
+    async for product in rest:
+        yield product
 
 
 @router.post("/sync", response_model=SyncResponse)
@@ -31,7 +39,7 @@ async def sync_products(
     background_tasks: BackgroundTasks = None
 ):
     """Sincroniza productos desde la API externa hacia Elasticsearch."""
-    start_time = datetime.now()
+    start_ns = time.perf_counter_ns()
     
     try:
         logger.info("Iniciando sincronización de productos")
@@ -39,27 +47,29 @@ async def sync_products(
         es_service = get_elasticsearch_service()
         product_service = get_product_service()
         
-        # Verificar conexión con Elasticsearch
-        es_health = await es_service.check_connection()
-        if es_health["status"] != "up":
+        # Verificar Elasticsearch mientras se lee el primer producto; el
+        # resto del catálogo se consume en streaming durante la indexación
+        products = product_service.iter_all_products()
+        es_health, first = await asyncio.gather(
+            es_service.check_connection(),
+            anext(products, None),
+            return_exceptions=True
+        )
+        
+        if isinstance(es_health, Exception) or es_health["status"] != "up":
+            await products.aclose()
             raise HTTPException(
                 status_code=503,
                 detail="Elasticsearch no disponible"
             )
         
-        # Crear índice si no existe o forzar recreación
-        if sync_request.force_reindex:
-            logger.info("Forzando recreación del índice")
-            await es_service.delete_index()
-            
-        await es_service.create_index()
-        
-        # Obtener todos los productos
-        products = await product_service.get_all_products()
+        if isinstance(first, Exception):
+            raise first
         
-        if not products:
+        if first is None:
+            # Sin productos no se crea ni se recrea el índice
             logger.warning("No se encontraron productos para sincronizar")
-            elapsed = int((datetime.now() - start_time).total_seconds() * 1000)
+            elapsed = (time.perf_counter_ns() - start_ns) // 1_000_000
             return SyncResponse(
                 message="No se encontraron productos para sincronizar",
                 productos_indexados=0,
@@ -67,25 +77,36 @@ async def sync_products(
                 errores=0
             )
         
-        # Indexar productos en lotes
-        batch_size = 50  # Procesar en lotes para mejor performance
-        total_indexed = 0
-        total_errors = 0
+        # Crear índice si no existe o forzar recreación
+        if sync_request.force_reindex:
+            logger.info("Forzando recreación del índice")
+            index_ready = await es_service.recreate_index()
+        else:
+            index_ready = await es_service.create_index()
+        
+        if not index_ready:
+            # Sin índice (o con el mapping sin aplicar) no se indexa nada
+            await products.aclose()
+            raise HTTPException(
+                status_code=503,
+                detail="No se pudo preparar el índice de Elasticsearch"
+            )
+        
+        # Indexar el catálogo en streaming con los helpers bulk de Elasticsearch,
+        # con el índice en modo carga bulk (sin refrescos ni réplicas)
+        # Tras reconstruir el índice completo se compacta a un segmento
+        result = await es_service.bulk_index(
+            _prepend(first, products),
+            forcemerge=sync_request.force_reindex,
+            bulk_load=True
+        )
+        total_indexed = result["indexed"]
+        total_errors = result["errors"]
         
-        for i in range(0, len(products), batch_size):
-            batch = products[i:i + batch_size]
-            logger.info(f"Procesando lote {i//batch_size + 1} ({len(batch)} productos)")
-            
-            try:
-                result = await es_service.index_products_batch(batch)
-                total_indexed += result["indexed"]
-                total_errors += result["errors"]
-                
-            except Exception as e:
-                logger.error(f"Error procesando lote: {str(e)}")
-                total_errors += len(batch)
+        # Un único refresh al final: el catálogo sincronizado queda buscable
+        await es_service.refresh_for_read()
         
-        elapsed = int((datetime.now() - start_time).total_seconds() * 1000)
+        elapsed = (time.perf_counter_ns() - start_ns) // 1_000_000
         
         logger.info(
             "Sincronización completada",
@@ -105,8 +126,14 @@ async def sync_products(
         
     except HTTPException:
         raise
+    except ESConnectionError as e:
+        logger.error(f"Elasticsearch no disponible durante la sincronización: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Elasticsearch no disponible"
+        )
     except Exception as e:
-        elapsed = int((datetime.now() - start_time).total_seconds() * 1000)
+        elapsed = (time.perf_counter_ns() - start_ns) // 1_000_000
         logger.error(f"Error en sincronización: {str(e)}")
         raise HTTPException(
             status_code=500,
@@ -120,7 +147,7 @@ async def search_products(
     background_tasks: BackgroundTasks = None
 ):
     """Búsqueda semántica de productos."""
-    start_time = datetime.now()
+    start_ns = time.perf_counter_ns()
     error = None
     results = None
     embedding = None
@@ -130,49 +157,37 @@ async def search_products(
 
         es_service = get_elasticsearch_service()
 
-        # Verificar que el índice existe
-        es_health = await es_service.check_connection()
-        if es_health["status"] != "up":
+        # Durante el arranque el modelo se carga en segundo plano: esperar
+        # poco y responder 503 en lugar de retener la petición varios segundos
+        if not await get_embedding_service().wait_loaded(settings.model_ready_timeout_s):
             raise HTTPException(
                 status_code=503,
-                detail="Servicio de búsqueda no disponible"
+                detail="Modelo de embeddings cargándose, reintenta en unos segundos"
             )
 
-        # Realizar búsqueda
+        # Realizar búsqueda (sin ping previo: los errores de conexión
+        # del cliente se traducen a 503 más abajo)
         results = await es_service.search_products(search_request)
 
         # TODO: Opcionalmente obtener embedding para monitoreo más detallado
         # embedding_service = get_embedding_service()
         # embedding = await embedding_service.generate_embedding(search_request.query)
 
-        # Log to monitoring BEFORE returning (blocking to ensure it executes)
-        try:
-            latency_ms = (datetime.now() - start_time).total_seconds() * 1000
-
-            # Extract results list from response dict
-            results_list = []
-            if results and isinstance(results, dict):
-                results_list = results.get("resultados", [])
-
-            await log_search_prediction(
-                query=search_request.query,
-                embedding=embedding,  # None if not calculated
-                results=results_list,
-                latency_ms=latency_ms,
-                category_filter=getattr(search_request, 'category', None),
-                price_min=getattr(search_request, 'price_min', None),
-                price_max=getattr(search_request, 'price_max', None),
-                error=error,
-            )
-        except Exception as log_error:
-            # Silent fail - monitoring should never break the main request
-            logger.warning(f"Failed to log to monitoring: {log_error}")
-
-        return SearchResponse(**results)
+        # Respuesta interna de confianza: se construye sin revalidar y se
+        # serializa directamente, evitando la validación de response_model
+        response = SearchResponse.model_construct(**results)
+        return ORJSONResponse(response.model_dump(mode="json"))
 
     except HTTPException:
         error = "Service unavailable"
         raise
+    except (ESConnectionError, TransportError) as e:
+        error = "Service unavailable"
+        logger.error(f"Elasticsearch no disponible en búsqueda: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail="Servicio de búsqueda no disponible"
+        )
     except Exception as e:
         error = str(e)
         logger.error(f"Error en búsqueda: {str(e)}")
@@ -180,6 +195,24 @@ async def search_products(
             status_code=500,
             detail=f"Error interno en búsqueda: {str(e)}"
         )
+    finally:
+        # Encolar el registro de monitoreo (también en errores) sin bloquear
+        latency_ms = (time.perf_counter_ns() - start_ns) // 1_000_000
+
+        results_list = []
+        if results and isinstance(results, dict):
+            results_list = results.get("resultados", [])
+
+        enqueue_search_prediction(
+            query=search_request.query,
+            embedding=embedding,  # None if not calculated
+            results=results_list,
+            latency_ms=latency_ms,
+            category_filter=search_request.category,
+            price_min=search_request.price_min,
+            price_max=search_request.price_max,
+            error=error,
+        )
 
 
 @router.get("/health", response_model=HealthResponse)
@@ -188,38 +221,44 @@ async def health_check():
     try:
         logger.info("Ejecutando health check")
         
-        # Verificar servicios en paralelo
         es_service = get_elasticsearch_service()
         product_service = get_product_service()
         embedding_service = get_embedding_service()
         
-        # Ejecutar verificaciones en paralelo
-        es_check_task = asyncio.create_task(es_service.check_connection())
-        api_check_task = asyncio.create_task(product_service.check_api_health())
+        # Ejecutar todas las verificaciones en paralelo: la latencia total
+        # es la de la verificación más lenta, no la suma de todas
+        es_status, api_status, model_info, stats = await asyncio.gather(
+            es_service.check_connection(),
+            product_service.check_api_health(),
+            embedding_service.get_model_info(),
+            es_service.get_index_stats(),
+            return_exceptions=True
+        )
         
-        es_status = await es_check_task
-        api_status = await api_check_task
+        if isinstance(es_status, Exception):
+            es_status = {"status": "down", "error": str(es_status)}
+        
+        if isinstance(api_status, Exception):
+            api_status = {"status": "down", "error": str(api_status)}
         
         # Verificar modelo de embeddings
-        try:
-            model_info = await embedding_service.get_model_info()
+        if isinstance(model_info, Exception):
             embedding_status = ServiceStatus(
-                status="loaded",
-                model=model_info.get("model_name")
+                status="error",
+                model=str(model_info)
             )
-        except Exception as e:
+        else:
             embedding_status = ServiceStatus(
-                status="error",
-                model=str(e)
+                status="loaded",
+                model=model_info.get("model_name")
             )
         
-        # Obtener estadísticas del índice
-        try:
-            stats = await es_service.get_index_stats()
-            index_stats = IndexStats(**stats)
-        except Exception as e:
-            logger.warning(f"Error obteniendo stats del índice: {str(e)}")
+        # Estadísticas del índice
+        if isinstance(stats, Exception):
+            logger.warning(f"Error obteniendo stats del índice: {str(stats)}")
             index_stats = IndexStats(total_productos=0)
+        else:
+            index_stats = IndexStats(**stats)
         
         # Determinar estado general
         overall_status = "healthy"
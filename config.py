@@ -12,12 +12,31 @@ class Settings(BaseSettings):
     # Elasticsearch Configuration
     elasticsearch_url: str = "http://localhost:9200"
     index_name: str = "productos"
+    es_pool_size: int = 32  # conexiones por nodo compartidas por búsquedas y bulk
     
     # External API
     productos_api_url: str = "http://localhost:8000/api/v1/products"
+    productos_api_http2: bool = True  # multiplexa las páginas en una conexión (requiere h2 y https)
+    productos_api_max_connections: int = 100
+    productos_api_max_keepalive: int = 20
+    productos_api_max_retries: int = 2  # reintentos ante 429/503
+    productos_api_concurrency: int = 8  # páginas pedidas en paralelo al sincronizar
+    productos_cache_ttl_s: float = 300  # 0 = sin cache de productos
+    productos_cache_size: int = 10_000
     
     # ML Model (renombrado para evitar conflicto)
     embedding_model_name: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    embed_threads: int = 0  # 0 = usar el valor por defecto de torch
+    embed_device: str = ""  # vacío = "cuda" si hay GPU, si no "cpu"
+    embed_batch_size: int = 0  # 0 = 256 en GPU, 32 en CPU
+    query_cache_size: int = 4096  # embeddings de consultas en memoria (0 = sin cache)
+    model_ready_timeout_s: float = 2.0  # espera máxima de una búsqueda a la carga del modelo
+    # "float" o "byte" (int8, 4x menos espacio); cambiarlo requiere force_reindex
+    embedding_element_type: str = "float"
+    # Índice HNSW de vectores: "hnsw" funciona desde ES 8.11; "int8_hnsw"
+    # cuantiza en el servidor (4x menos memoria, requiere ES 8.12+).
+    # Cambiarlo requiere force_reindex
+    vector_index_type: str = "hnsw"
     
     # API Configuration
     api_v1_str: str = "/api/v1"
@@ -29,6 +48,16 @@ class Settings(BaseSettings):
     search_timeout: int = 5
     default_page_size: int = 10
     max_page_size: int = 100
+    sync_concurrency: int = 4
+    sync_batch_size: int = 500
+    sync_max_chunk_bytes: int = 10_000_000
+    sync_max_retries: int = 3  # reintentos de documentos rechazados con 429
+    sync_initial_backoff_s: float = 1.0
+    index_refresh_interval: str = "5s"  # refresco del índice fuera de las cargas bulk
+    categories_ttl_s: int = 60
+    stats_ttl_s: int = 5
+    search_cache_ttl_s: float = 1.0
+    knn_num_candidates: int = 100  # mínimo de candidatos HNSW por shard
     
     # Logging
     log_level: str = "INFO"
@@ -43,4 +72,19 @@ class Settings(BaseSettings):
 @lru_cache()
 def get_settings() -> Settings:
     """Obtiene la configuración singleton."""
-    return Settings()
\ No newline at end of file
+    return Settings()
+
+
+def refresh_settings() -> Settings:
+    """Recarga la configuración desde el entorno sin reiniciar el proceso.
+    
+    Los módulos enlazan ``settings = get_settings()`` una sola vez al
+    importarse, así que los valores nuevos se copian sobre la instancia
+    cacheada y todos los módulos los ven sin volver a llamar a
+    ``get_settings()`` en el camino de cada petición.
+    """
+    current = get_settings()
+    fresh = Settings()
+    for field_name in Settings.model_fields:
+        setattr(current, field_name, getattr(fresh, field_name))
+    return current
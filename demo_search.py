@@ -3,6 +3,7 @@ import asyncio
 import sys
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
 
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
@@ -13,9 +14,13 @@ from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
+# Marca de tiempo fija para los productos de muestra (fixtures deterministas)
+_NOW = datetime(2024, 1, 1)
 
+
+@lru_cache(maxsize=1)
 def create_sample_products():
-    """Crea productos de muestra para testing."""
+    """Crea productos de muestra para testing (lista compartida)."""
     products = [
         Product(
             id="sample-iphone-15-pro",
@@ -25,8 +30,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1592750475338-74b7b21085ab",
             category="Smartphones",
             stock=15,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         ),
         Product(
             id="sample-samsung-s24-ultra",
@@ -36,8 +41,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1610945265064-0e34e5519bbf",
             category="Smartphones", 
             stock=8,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         ),
         Product(
             id="sample-macbook-air-m3",
@@ -47,8 +52,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1517336714731-489689fd1ca8",
             category="Laptops",
             stock=12,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         ),
         Product(
             id="sample-dell-xps-15",
@@ -58,8 +63,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1496181133206-80ce9b88a853",
             category="Laptops",
             stock=6,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         ),
         Product(
             id="sample-ipad-pro-12",
@@ -69,8 +74,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1544244015-0df4b3ffc6b0",
             category="Tablets",
             stock=10,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         ),
         Product(
             id="sample-canon-eos-r5",
@@ -80,8 +85,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1606983340126-99ab4feaa64a",
             category="Cámaras",
             stock=4,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         ),
         Product(
             id="sample-airpods-pro-2",
@@ -91,8 +96,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1606983340126-99ab4feaa64a",
             category="Audio",
             stock=25,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         ),
         Product(
             id="sample-nintendo-switch",
@@ -102,8 +107,8 @@ def create_sample_products():
             image_url="https://images.unsplash.com/photo-1606144042614-b2417e99c4e3",
             category="Gaming",
             stock=18,
-            created_at=datetime.now(),
-            updated_at=datetime.now()
+            created_at=_NOW,
+            updated_at=_NOW
         )
     ]
     
@@ -117,13 +122,15 @@ async def index_sample_products():
     es_service = get_elasticsearch_service()
     
     try:
-        # Crear productos de muestra
+        # Productos de muestra (construidos una sola vez)
         products = create_sample_products()
         
         print(f"Creando {len(products)} productos de muestra...")
         
         # Indexar en lotes
         result = await es_service.index_products_batch(products)
+        # Las búsquedas de la demo se lanzan justo después
+        await es_service.refresh_for_read()
         
         print(f"✅ Productos indexados: {result['indexed']}")
         if result['errors'] > 0:
@@ -134,8 +141,6 @@ async def index_sample_products():
     except Exception as e:
         print(f"❌ Error indexando productos: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def test_semantic_searches():
@@ -154,12 +159,17 @@ async def test_semantic_searches():
     ]
     
     try:
-        for query in test_queries:
+        # Lanzar todas las búsquedas en paralelo (acotadas) y mostrar en orden
+        semaphore = asyncio.Semaphore(4)
+        
+        async def search(query: str):
+            async with semaphore:
+                return await es_service.search_products(SearchRequest(query=query, top_k=3))
+        
+        all_results = await asyncio.gather(*(search(query) for query in test_queries))
+        
+        for query, results in zip(test_queries, all_results):
             print(f"\n📋 Buscar: '{query}'")
-            
-            search_request = SearchRequest(query=query, top_k=3)
-            results = await es_service.search_products(search_request)
-            
             print(f"   └─ Resultados: {results['total_resultados']} en {results['tiempo_busqueda_ms']}ms")
             
             for i, product in enumerate(results['resultados'][:2], 1):
@@ -171,8 +181,6 @@ async def test_semantic_searches():
     except Exception as e:
         print(f"❌ Error en búsquedas: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def test_filtered_searches():
@@ -211,8 +219,6 @@ async def test_filtered_searches():
     except Exception as e:
         print(f"❌ Error en búsquedas filtradas: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def test_categories():
@@ -233,8 +239,6 @@ async def test_categories():
     except Exception as e:
         print(f"❌ Error obteniendo categorías: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def main():
@@ -242,20 +246,26 @@ async def main():
     print("🧪 DEMO COMPLETA DEL SISTEMA DE BÚSQUEDA SEMÁNTICA")
     print("=" * 60)
     
-    # Indexar productos de muestra
-    indexed = await index_sample_products()
-    if not indexed:
-        print("❌ No se pudieron indexar los productos")
-        return False
-    
-    # Probar búsquedas semánticas
-    searches_ok = await test_semantic_searches()
-    
-    # Probar búsquedas con filtros
-    filters_ok = await test_filtered_searches()
+    es_service = get_elasticsearch_service()
     
-    # Probar categorías
-    categories_ok = await test_categories()
+    try:
+        # Indexar productos de muestra
+        indexed = await index_sample_products()
+        if not indexed:
+            print("❌ No se pudieron indexar los productos")
+            return False
+        
+        # Probar búsquedas semánticas
+        searches_ok = await test_semantic_searches()
+        
+        # Probar búsquedas con filtros
+        filters_ok = await test_filtered_searches()
+        
+        # Probar categorías
+        categories_ok = await test_categories()
+    finally:
+        # Un solo cliente compartido por todas las pruebas; se cierra al final
+        await es_service.close()
     
     # Resumen
     print("\n" + "=" * 60)
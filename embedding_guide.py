@@ -4,24 +4,101 @@
 import asyncio
 import sys
 from pathlib import Path
-import json
-from typing import List, Dict, Any
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+try:
+    import simsimd  # Opcional: kernels int8 SIMD
+except ImportError:
+    simsimd = None
+
+try:
+    import faiss  # Opcional: índice de producto interno
+except ImportError:
+    faiss = None
 
 # Agregar el directorio raíz al path  
 sys.path.append(str(Path(__file__).parent))
 
+from search_kernels import cosine_all
 from services.embedding_service import get_embedding_service
+from utils.embedding_cache import EmbeddingDiskCache
+
+
+# Cache semántico de consultas: tamaño máximo y umbral de similitud
+QUERY_CACHE_SIZE = 128
+QUERY_CACHE_THRESHOLD = 0.95
+
+
+def _normalize(vec) -> np.ndarray:
+    """Devuelve el vector float32 con norma L2 unitaria."""
+    vec = np.asarray(vec, dtype=np.float32)
+    return vec / (np.linalg.norm(vec) + 1e-12)
+
+
+def _top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Índices de los top_k scores en orden descendente.
+    
+    argpartition selecciona los k mayores en O(N) y solo esos k se ordenan.
+    """
+    k = min(top_k, scores.size)
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    top_idx = np.argpartition(-scores, k - 1)[:k]
+    return top_idx[np.argsort(-scores[top_idx])]
+
+
+def _quantize_int8(matrix: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Cuantiza cada fila a int8 con escala propia; devuelve (int8, normas)."""
+    scales = 127.0 / (np.abs(matrix).max(axis=1, keepdims=True) + 1e-12)
+    quantized = np.round(matrix * scales).astype(np.int8)
+    norms = np.linalg.norm(quantized.astype(np.float32), axis=1)
+    return quantized, norms
+
+
+def _int8_cosine(matrix: np.ndarray, norms: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """Similitud coseno entre filas int8 y una query int8.
+    
+    El coseno no depende de la escala, así que se opera directamente
+    sobre los enteros cuantizados.
+    """
+    if simsimd is not None:
+        distances = simsimd.cdist(matrix, query[np.newaxis, :], metric="cosine", dtype="int8")
+        return 1.0 - np.asarray(distances, dtype=np.float32).ravel()
+    
+    raw = matrix.astype(np.int32) @ query.astype(np.int32)
+    query_norm = np.linalg.norm(query.astype(np.float32))
+    return raw / (norms * query_norm + 1e-12)
 
 
 class CustomEmbeddingHelper:
     """Helper para trabajar con embeddings personalizados."""
     
-    def __init__(self):
+    def __init__(self, quantize: bool = False):
         self.embedding_service = None
+        self.disk_cache = None
+        # Catálogo en columnas (SoA): matriz (N, D) normalizada y listas paralelas
+        self.catalog: Optional[Dict[str, Any]] = None
+        self.product_matrix = None
+        # Con quantize=True la matriz se guarda en int8 (4x menos memoria)
+        self.quantize = quantize
+        self.product_q = None
+        self.product_q_norms = None
+        # Índice FAISS exacto (IndexFlatIP) si faiss está disponible
+        self.index = None
+        # (consulta normalizada, top_k) -> (embedding de la consulta, resultados)
+        self._query_cache: "OrderedDict[Tuple[str, int], Tuple[np.ndarray, List[Dict]]]" = OrderedDict()
         
     async def initialize(self):
         """Inicializa el servicio de embeddings."""
         self.embedding_service = get_embedding_service()
+        self.disk_cache = EmbeddingDiskCache()
+    
+    async def cached_embed(self, texts: List[str]) -> List[np.ndarray]:
+        """Genera embeddings reutilizando los guardados en disco."""
+        return await self.disk_cache.embed(texts, self.embedding_service.generate_embeddings)
     
     async def create_product_embeddings(self, products: List[Dict]) -> Dict[str, Any]:
         """Crea embeddings para una lista de productos."""
@@ -44,89 +121,229 @@ class CustomEmbeddingHelper:
         
         print(f"🧠 Generando embeddings para {len(products)} productos...")
         
-        embeddings = await self.embedding_service.generate_embeddings(product_texts)
+        embeddings = await self.cached_embed(product_texts)
         
         if not embeddings:
             return {"error": "No se pudieron generar embeddings"}
         
-        # Crear resultado estructurado
+        # Matriz float32 contigua (N, D) para los cálculos de similitud
+        raw = np.stack(embeddings).astype(np.float32, copy=False)
+        # Normas calculadas una sola vez (einsum fusiona producto y suma)
+        # y reutilizadas para las estadísticas y la normalización
+        norms = np.sqrt(np.einsum('ij,ij->i', raw, raw))
+        
+        # Resultado en columnas: la búsqueda solo recorre la matriz y los
+        # metadatos se indexan únicamente para los top_k mostrados
         result = {
             "total_products": len(products),
-            "embedding_dimension": len(embeddings[0]) if embeddings else 0,
-            "products_with_embeddings": []
+            "embedding_dimension": raw.shape[1],
+            # Normalizados una sola vez: el coseno se reduce a un producto punto
+            "embeddings": raw / (norms[:, np.newaxis] + 1e-12),
+            "ids": [product.get('id', f'product_{i}') for i, product in enumerate(products)],
+            "names": [product['name'] for product in products],
+            "categories": [product['category'] for product in products],
+            "texts": product_texts,
+            "embedding_stats": {
+                "norm": norms,
+                "mean": raw.mean(axis=1),
+                "min_value": raw.min(axis=1),
+                "max_value": raw.max(axis=1)
+            }
         }
         
-        for i, (product, embedding, text) in enumerate(zip(products, embeddings, product_texts)):
-            result["products_with_embeddings"].append({
-                "id": product.get('id', f'product_{i}'),
-                "name": product['name'],
-                "category": product['category'],
-                "text_used": text,
-                "embedding": embedding,
-                "embedding_stats": {
-                    "dimension": len(embedding),
-                    "norm": (sum(x*x for x in embedding) ** 0.5),
-                    "mean": sum(embedding) / len(embedding),
-                    "min_value": min(embedding),
-                    "max_value": max(embedding)
-                }
-            })
+        self.catalog = result
+        self.product_matrix = result["embeddings"]
+        self.index = None
+        if self.quantize:
+            self.product_q, self.product_q_norms = _quantize_int8(self.product_matrix)
+            self.product_matrix = None
+        elif faiss is not None:
+            # Producto interno sobre vectores normalizados == coseno
+            self.index = faiss.IndexFlatIP(self.product_matrix.shape[1])
+            self.index.add(self.product_matrix)
+        self._query_cache.clear()
         
         print(f"✅ Embeddings creados exitosamente")
         print(f"📏 Dimensión: {result['embedding_dimension']}")
         
         return result
     
-    async def semantic_search(self, query: str, product_embeddings: List[Dict], top_k: int = 5) -> List[Dict]:
+    async def semantic_search(self, query: str, catalog: Dict[str, Any], top_k: int = 5) -> List[Dict]:
         """Realiza búsqueda semántica en embeddings de productos."""
         print(f"🔍 BÚSQUEDA SEMÁNTICA: '{query}'")
         print("=" * 50)
         
-        # Generar embedding para la query
-        query_embeddings = await self.embedding_service.generate_embeddings([query])
-        if not query_embeddings:
-            return []
+        # El cache de consultas solo aplica al catálogo propio del helper
+        use_cache = catalog is self.catalog
+        cache_key = self._cache_key(query, top_k)
         
-        query_embedding = query_embeddings[0]
+        # Nivel 1: coincidencia exacta tras normalizar el texto
+        cached_key = cache_key if use_cache and cache_key in self._query_cache else None
         
-        # Calcular similitudes
-        similarities = []
-        for product in product_embeddings:
-            similarity = self._cosine_similarity(query_embedding, product['embedding'])
+        if cached_key is None:
+            # Generar embedding para la query
+            query_embeddings = await self.cached_embed([query])
+            if not query_embeddings:
+                return []
             
-            similarities.append({
-                "id": product['id'],
-                "name": product['name'],
-                "category": product['category'],
-                "similarity": similarity,
-                "text_used": product['text_used']
-            })
+            query_embedding = _normalize(query_embeddings[0])
+            
+            # Nivel 2: consulta semánticamente equivalente a una reciente
+            if use_cache:
+                cached_key = self._find_similar_query(query_embedding, top_k)
+        
+        if cached_key is not None:
+            top_results = self._cache_get(cached_key)
+            print("♻️  Resultado reutilizado del cache de consultas")
+        else:
+            top_results = self._rank(query_embedding, catalog, top_k)
+            if use_cache:
+                self._cache_put(cache_key, query_embedding, top_results)
         
-        # Ordenar por similitud
-        similarities.sort(key=lambda x: x['similarity'], reverse=True)
+        self._print_results(top_results, catalog["total_products"])
+        
+        return top_results
+    
+    async def semantic_search_batch(self, queries: List[str], top_k: int = 5) -> List[List[Dict]]:
+        """Búsqueda semántica de varias queries sobre el catálogo del helper.
         
-        # Retornar top_k resultados
-        top_results = similarities[:top_k]
+        Pasa por el mismo cache de consultas que ``semantic_search``; las
+        que fallan se embeben en una sola llamada al modelo y se puntúan
+        juntas contra la matriz de productos.
+        """
+        keys = [self._cache_key(query, top_k) for query in queries]
+        all_results: List[Optional[List[Dict]]] = [None] * len(queries)
+        reused = set()
         
-        print(f"📊 Encontrados {len(similarities)} productos, mostrando top {len(top_results)}:")
+        # Nivel 1: coincidencias exactas
+        for i, key in enumerate(keys):
+            if key in self._query_cache:
+                all_results[i] = self._cache_get(key)
+                reused.add(i)
+        
+        misses = [i for i, results in enumerate(all_results) if results is None]
+        if misses:
+            query_embeddings = await self.cached_embed([queries[i] for i in misses])
+            if not query_embeddings:
+                return [results or [] for results in all_results]
+            
+            # Nivel 2: consultas equivalentes; el resto se puntúa en bloque
+            to_rank = []
+            for i, embedding in zip(misses, query_embeddings):
+                query_embedding = _normalize(embedding)
+                similar_key = self._find_similar_query(query_embedding, top_k)
+                if similar_key is not None:
+                    all_results[i] = self._cache_get(similar_key)
+                    reused.add(i)
+                else:
+                    to_rank.append((i, query_embedding))
+            
+            if to_rank:
+                query_matrix = np.stack([q for _, q in to_rank])
+                for (i, query_embedding), results in zip(to_rank, self._rank_batch(query_matrix, top_k)):
+                    all_results[i] = results
+                    self._cache_put(keys[i], query_embedding, results)
+        
+        for i, (query, top_results) in enumerate(zip(queries, all_results)):
+            print(f"🔍 BÚSQUEDA SEMÁNTICA: '{query}'")
+            print("=" * 50)
+            if i in reused:
+                print("♻️  Resultado reutilizado del cache de consultas")
+            self._print_results(top_results, self.catalog["total_products"])
+            print()
+        
+        return all_results
+    
+    def _rank_batch(self, query_matrix: np.ndarray, top_k: int) -> List[List[Dict]]:
+        """Top_k del catálogo propio para varias consultas normalizadas (Q, D)."""
+        if self.index is not None:
+            k = min(top_k, self.index.ntotal)
+            top_scores, top_idx = self.index.search(query_matrix, k)
+            return [
+                self._build_results(zip(idx.tolist(), sc.tolist()), self.catalog)
+                for idx, sc in zip(top_idx, top_scores)
+            ]
+        
+        if self.quantize:
+            return [self._rank(q, self.catalog, top_k) for q in query_matrix]
+        
+        # Un único producto matriz-matriz: (N, D) @ (D, Q) -> (N, Q)
+        scores = self.product_matrix @ query_matrix.T
+        return [
+            self._build_results(
+                ((i, float(column[i])) for i in _top_k_indices(column, top_k)),
+                self.catalog
+            )
+            for column in scores.T
+        ]
+    
+    @staticmethod
+    def _cache_key(query: str, top_k: int) -> Tuple[str, int]:
+        """Clave del cache de consultas: texto normalizado y top_k."""
+        return (" ".join(query.lower().split()), top_k)
+    
+    def _cache_get(self, key: Tuple[str, int]) -> List[Dict]:
+        """Devuelve resultados cacheados marcándolos como recientes."""
+        self._query_cache.move_to_end(key)
+        return self._query_cache[key][1]
+    
+    def _cache_put(self, key: Tuple[str, int], query_embedding: np.ndarray, results: List[Dict]) -> None:
+        """Guarda resultados expulsando la consulta menos reciente."""
+        self._query_cache[key] = (query_embedding, results)
+        if len(self._query_cache) > QUERY_CACHE_SIZE:
+            self._query_cache.popitem(last=False)
+    
+    def _print_results(self, top_results: List[Dict], total: int) -> None:
+        """Imprime los resultados de una búsqueda."""
+        print(f"📊 Encontrados {total} productos, mostrando top {len(top_results)}:")
         for i, result in enumerate(top_results, 1):
             relevance = self._get_relevance_label(result['similarity'])
             print(f"   {i}. {result['similarity']:.3f} {relevance} - {result['name']} ({result['category']})")
-        
-        return top_results
     
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calcula similitud coseno entre dos vectores."""
-        import math
+    def _find_similar_query(self, query_embedding: np.ndarray, top_k: int) -> Optional[Tuple[str, int]]:
+        """Busca en el cache una consulta con similitud superior al umbral."""
+        keys = [key for key in self._query_cache if key[1] == top_k]
+        if not keys:
+            return None
         
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        magnitude1 = math.sqrt(sum(a * a for a in vec1))
-        magnitude2 = math.sqrt(sum(a * a for a in vec2))
+        sims = np.stack([self._query_cache[key][0] for key in keys]) @ query_embedding
+        best = int(np.argmax(sims))
+        return keys[best] if sims[best] > QUERY_CACHE_THRESHOLD else None
+    
+    def _rank(self, query_embedding: np.ndarray, catalog: Dict[str, Any], top_k: int) -> List[Dict]:
+        """Obtiene los top_k productos más similares a la consulta."""
+        own_catalog = catalog is self.catalog
         
-        if magnitude1 == 0 or magnitude2 == 0:
-            return 0.0
+        if own_catalog and self.index is not None:
+            # FAISS devuelve directamente los top_k ordenados
+            k = min(top_k, self.index.ntotal)
+            top_scores, top_idx = self.index.search(
+                query_embedding.astype(np.float32)[np.newaxis, :], k
+            )
+            ranked = zip(top_idx[0].tolist(), top_scores[0].tolist())
+        else:
+            # Calcular todas las similitudes con un solo producto matriz-vector
+            if own_catalog and self.quantize:
+                query_q, _ = _quantize_int8(query_embedding[np.newaxis, :])
+                scores = _int8_cosine(self.product_q, self.product_q_norms, query_q[0])
+            else:
+                scores = cosine_all(catalog["embeddings"], query_embedding.astype(np.float32))
+            ranked = ((i, float(scores[i])) for i in _top_k_indices(scores, top_k))
         
-        return dot_product / (magnitude1 * magnitude2)
+        return self._build_results(ranked, catalog)
+    
+    def _build_results(self, ranked, catalog: Dict[str, Any]) -> List[Dict]:
+        """Construye los resultados a partir de pares (índice, similitud)."""
+        return [
+            {
+                "id": catalog["ids"][i],
+                "name": catalog["names"][i],
+                "category": catalog["categories"][i],
+                "similarity": similarity,
+                "text_used": catalog["texts"][i]
+            }
+            for i, similarity in ranked
+        ]
     
     def _get_relevance_label(self, similarity: float) -> str:
         """Obtiene etiqueta de relevancia basada en similitud."""
@@ -153,35 +370,37 @@ class CustomEmbeddingHelper:
         
         test_query = "smartphone con excelente cámara"
         
-        for strategy_name, text_func in strategies.items():
+        # Un único batch con los textos de todas las estrategias: cada
+        # estrategia ocupa un bloque de len(products) + 1 (productos + query)
+        stride = len(products) + 1
+        all_texts = [
+            text
+            for text_func in strategies.values()
+            for text in [text_func(product) for product in products] + [test_query]
+        ]
+        
+        all_embeddings = await self.cached_embed(all_texts)
+        if not all_embeddings:
+            print("   ❌ Error generando embeddings")
+            return
+        
+        for n, strategy_name in enumerate(strategies):
             print(f"\n🧪 Estrategia: {strategy_name}")
             
-            # Crear textos con esta estrategia
-            texts = [text_func(product) for product in products]
-            
-            # Generar embeddings
-            embeddings = await self.embedding_service.generate_embeddings(texts + [test_query])
-            if not embeddings:
-                print("   ❌ Error generando embeddings")
-                continue
+            embeddings = all_embeddings[n * stride:(n + 1) * stride]
             
             # Separar query embedding
-            query_embedding = embeddings[-1]
-            product_embeddings = embeddings[:-1]
-            
-            # Calcular similitudes
-            similarities = []
-            for i, product in enumerate(products):
-                similarity = self._cosine_similarity(query_embedding, product_embeddings[i])
-                similarities.append((similarity, product['name']))
+            query_embedding = _normalize(embeddings[-1])
+            product_embeddings = [_normalize(e) for e in embeddings[:-1]]
             
-            # Ordenar y mostrar top 3
-            similarities.sort(reverse=True)
+            # Calcular similitudes y quedarse con el top 3 sin ordenar todo
+            scores = np.stack(product_embeddings) @ query_embedding
             print(f"   📊 Top 3 resultados para '{test_query}':")
             
-            for j, (similarity, name) in enumerate(similarities[:3], 1):
+            for j, i in enumerate(_top_k_indices(scores, 3), 1):
+                similarity = float(scores[i])
                 relevance = self._get_relevance_label(similarity)
-                print(f"      {j}. {similarity:.3f} {relevance} - {name}")
+                print(f"      {j}. {similarity:.3f} {relevance} - {products[i]['name']}")
 
 
 async def practical_example():
@@ -240,13 +459,15 @@ async def practical_example():
         "dispositivo Apple"
     ]
     
-    for query in test_queries:
-        await helper.semantic_search(query, embedding_data["products_with_embeddings"], top_k=3)
-        print()
+    # Todas las queries en un solo batch de embeddings y un solo matmul
+    await helper.semantic_search_batch(test_queries, top_k=3)
     
     # Comparar estrategias
     print(f"\n📊 Paso 3: Comparar estrategias de embedding")
     await helper.compare_embedding_strategies(sample_products)
+    
+    # Persistir los embeddings para la próxima ejecución
+    helper.disk_cache.save()
 
 
 async def embedding_best_practices():
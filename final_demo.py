@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 """Resumen final y demo completa del proyecto."""
 
-import requests
+import asyncio
 import json
 import time
 from typing import Dict, Any
 
+import httpx
+
+BASE_URL = "http://localhost:8000"
+# Límites del pool compartido: conexiones keep-alive reutilizadas
+LIMITS = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+
 
 def print_header(title: str):
     """Imprime un header formateado."""
@@ -20,15 +26,13 @@ def print_section(title: str):
     print('-'*40)
 
 
-def test_search(query: str, **filters) -> Dict[str, Any]:
+async def test_search(client: httpx.AsyncClient, query: str, **filters) -> Dict[str, Any]:
     """Ejecuta una búsqueda y retorna los resultados."""
-    url = "http://localhost:8000/api/v1/buscar"
-    
     data = {"query": query, "top_k": 3}
     data.update(filters)
     
     try:
-        response = requests.post(url, json=data, timeout=10)
+        response = await client.post("/api/v1/buscar", json=data, timeout=10)
         if response.status_code == 200:
             return response.json()
         else:
@@ -37,28 +41,23 @@ def test_search(query: str, **filters) -> Dict[str, Any]:
         return {"error": str(e)}
 
 
-def demo_semantic_intelligence():
+async def timed_search(client: httpx.AsyncClient, query: str, **filters):
+    """Ejecuta una búsqueda y retorna (resultados, segundos transcurridos)."""
+    start = time.perf_counter()
+    results = await test_search(client, query, **filters)
+    return results, time.perf_counter() - start
+
+
+async def get_json(client: httpx.AsyncClient, path: str) -> Dict[str, Any]:
+    """Obtiene un endpoint GET como JSON."""
+    response = await client.get(path, timeout=5)
+    return response.json()
+
+
+async def demo_semantic_intelligence(client: httpx.AsyncClient):
     """Demuestra la inteligencia semántica."""
     print_header("DEMO COMPLETA: BÚSQUEDA SEMÁNTICA E-COMMERCE")
     
-    # Verificar estado
-    print_section("1. ESTADO DEL SISTEMA")
-    try:
-        health = requests.get("http://localhost:8000/api/v1/health", timeout=5).json()
-        stats = requests.get("http://localhost:8000/api/v1/stats", timeout=5).json()
-        
-        print(f"✅ Estado: {health.get('status', 'unknown')}")
-        print(f"📊 Productos indexados: {stats.get('total_documents', 0)}")
-        print(f"📏 Tamaño índice: {stats.get('index_size_mb', 0)} MB")
-        print(f"⚡ Tiempo promedio: {stats.get('avg_search_time_ms', 0)}ms")
-        
-    except Exception as e:
-        print(f"❌ Error verificando estado: {e}")
-        return False
-    
-    # Demos de búsqueda semántica
-    print_section("2. INTELIGENCIA SEMÁNTICA")
-    
     demos = [
         {
             "title": "🔍 Búsqueda por Significado",
@@ -77,13 +76,72 @@ def demo_semantic_intelligence():
         }
     ]
     
-    for demo in demos:
+    filter_demos = [
+        {
+            "title": "📱 Por Categoría",
+            "query": "cámara",
+            "filters": {"category": "Smartphones"},
+            "description": "Solo smartphones con buenas cámaras"
+        },
+        {
+            "title": "💰 Por Precio",
+            "query": "tecnología",
+            "filters": {"price_max": 500.0},
+            "description": "Productos tech económicos"
+        },
+        {
+            "title": "🎯 Combinado",
+            "query": "auriculares",
+            "filters": {"category": "Audio", "price_max": 400.0},
+            "description": "Audio + precio + semántica"
+        }
+    ]
+    
+    multilingual_queries = [
+        ("🇪🇸 Español", "auriculares para música"),
+        ("🇺🇸 English", "headphones for music"),
+        ("🇫🇷 Français", "écouteurs pour musique")
+    ]
+    
+    # Lanzar en paralelo el estado del sistema y todas las búsquedas
+    # independientes; los resultados se imprimen después en orden
+    health, stats, *search_results = await asyncio.gather(
+        get_json(client, "/api/v1/health"),
+        get_json(client, "/api/v1/stats"),
+        *(test_search(client, d['query']) for d in demos),
+        *(test_search(client, d['query'], **d['filters']) for d in filter_demos),
+        *(test_search(client, q, top_k=1) for _, q in multilingual_queries),
+        return_exceptions=True
+    )
+    demo_results = search_results[:len(demos)]
+    filter_results = search_results[len(demos):len(demos) + len(filter_demos)]
+    multilingual_results = search_results[len(demos) + len(filter_demos):]
+    
+    # Verificar estado
+    print_section("1. ESTADO DEL SISTEMA")
+    try:
+        if isinstance(health, Exception):
+            raise health
+        if isinstance(stats, Exception):
+            raise stats
+        
+        print(f"✅ Estado: {health.get('status', 'unknown')}")
+        print(f"📊 Productos indexados: {stats.get('total_documents', 0)}")
+        print(f"📏 Tamaño índice: {stats.get('index_size_mb', 0)} MB")
+        print(f"⚡ Tiempo promedio: {stats.get('avg_search_time_ms', 0)}ms")
+        
+    except Exception as e:
+        print(f"❌ Error verificando estado: {e}")
+        return False
+    
+    # Demos de búsqueda semántica
+    print_section("2. INTELIGENCIA SEMÁNTICA")
+    
+    for demo, results in zip(demos, demo_results):
         print(f"\n{demo['title']}")
         print(f"Query: '{demo['query']}'")
         print(f"💡 {demo['description']}")
         
-        results = test_search(demo['query'])
-        
         if 'error' in results:
             print(f"❌ Error: {results['error']}")
             continue
@@ -107,34 +165,11 @@ def demo_semantic_intelligence():
     # Filtros avanzados
     print_section("3. FILTROS INTELIGENTES")
     
-    filter_demos = [
-        {
-            "title": "📱 Por Categoría",
-            "query": "cámara",
-            "filters": {"category": "Smartphones"},
-            "description": "Solo smartphones con buenas cámaras"
-        },
-        {
-            "title": "💰 Por Precio",
-            "query": "tecnología",
-            "filters": {"price_max": 500.0},
-            "description": "Productos tech económicos"
-        },
-        {
-            "title": "🎯 Combinado",
-            "query": "auriculares",
-            "filters": {"category": "Audio", "price_max": 400.0},
-            "description": "Audio + precio + semántica"
-        }
-    ]
-    
-    for demo in filter_demos:
+    for demo, results in zip(filter_demos, filter_results):
         print(f"\n{demo['title']}")
         print(f"Query: '{demo['query']}' + filtros")
         print(f"💡 {demo['description']}")
         
-        results = test_search(demo['query'], **demo['filters'])
-        
         if 'error' in results:
             print(f"❌ Error: {results['error']}")
             continue
@@ -152,17 +187,9 @@ def demo_semantic_intelligence():
     # Multilingüe
     print_section("4. CAPACIDADES MULTILINGÜES")
     
-    multilingual_queries = [
-        ("🇪🇸 Español", "auriculares para música"),
-        ("🇺🇸 English", "headphones for music"),
-        ("🇫🇷 Français", "écouteurs pour musique")
-    ]
-    
     print("Probando el mismo concepto en diferentes idiomas:")
     
-    for lang, query in multilingual_queries:
-        results = test_search(query, top_k=1)
-        
+    for (lang, query), results in zip(multilingual_queries, multilingual_results):
         if 'error' not in results and results.get('resultados'):
             producto = results['resultados'][0]
             score = producto.get('score_semantico', 0)
@@ -178,11 +205,12 @@ def demo_semantic_intelligence():
     
     print("Probando rendimiento con múltiples queries...")
     
-    for query in queries_test:
-        start = time.time()
-        results = test_search(query, top_k=1)
-        elapsed = time.time() - start
-        
+    # Todas las queries en vuelo a la vez sobre el mismo pool de conexiones
+    latency_results = await asyncio.gather(
+        *(timed_search(client, query, top_k=1) for query in queries_test)
+    )
+    
+    for query, (results, elapsed) in zip(queries_test, latency_results):
         if 'error' not in results:
             search_time = results.get('tiempo_busqueda_ms', 0)
             tiempos.append(search_time)
@@ -234,10 +262,16 @@ def show_final_summary():
     print("\n💡 EL PROYECTO ESTÁ COMPLETAMENTE FUNCIONAL")
 
 
+async def run_demo() -> bool:
+    """Ejecuta la demo con un único cliente HTTP compartido."""
+    async with httpx.AsyncClient(base_url=BASE_URL, limits=LIMITS) as client:
+        return await demo_semantic_intelligence(client)
+
+
 if __name__ == "__main__":
     try:
         # Verificar conexión
-        response = requests.get("http://localhost:8000/ping", timeout=5)
+        response = httpx.get(f"{BASE_URL}/ping", timeout=5)
         if response.status_code != 200:
             print("❌ API no disponible. Ejecuta: python main.py")
             exit(1)
@@ -248,7 +282,7 @@ if __name__ == "__main__":
         exit(1)
     
     # Ejecutar demo completa
-    success = demo_semantic_intelligence()
+    success = asyncio.run(run_demo())
     
     if success:
         show_final_summary()
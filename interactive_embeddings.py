@@ -3,14 +3,49 @@
 
 import asyncio
 import sys
+import threading
 from pathlib import Path
-import json
+
+import numpy as np
 
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent))
 
 from services.embedding_service import get_embedding_service
-from services.elasticsearch_service import get_elasticsearch_service
+from utils.embedding_cache import EmbeddingDiskCache
+
+# Cache de disco compartido por todas las funciones del script: el fichero
+# .npz se lee una sola vez por proceso
+_disk_cache = None
+
+
+def shared_disk_cache() -> EmbeddingDiskCache:
+    """Obtiene el cache de embeddings en disco compartido del script."""
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = EmbeddingDiskCache()
+    return _disk_cache
+
+
+def ainput(prompt: str) -> "asyncio.Future[str]":
+    """Lee de la terminal en un hilo daemon sin bloquear el event loop."""
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+    
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
+    
+    def read():
+        try:
+            line = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(deliver, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(deliver, future.set_result, line)
+    
+    threading.Thread(target=read, daemon=True).start()
+    return future
 
 
 async def embedding_playground():
@@ -21,63 +56,80 @@ async def embedding_playground():
     print()
     
     embedding_service = get_embedding_service()
+    disk_cache = shared_disk_cache()
     
     # Cache de embeddings para comparaciones
     embedding_cache = {}
     
-    while True:
-        try:
-            # Solicitar input del usuario
-            user_input = input("💭 Ingresa texto para generar embedding: ").strip()
+    # Cargar y calentar el modelo en segundo plano mientras el usuario escribe
+    warmup_task = asyncio.create_task(embedding_service.warmup())
+    
+    try:
+        while True:
+            try:
+                # Solicitar input del usuario (el modelo se calienta mientras tanto)
+                user_input = (await ainput("💭 Ingresa texto para generar embedding: ")).strip()
             
-            if user_input.lower() == 'exit':
-                print("👋 ¡Hasta luego!")
-                break
-            elif user_input.lower() == 'help':
-                show_help()
-                continue
-            elif user_input.lower() == 'compare':
-                await compare_cached_embeddings(embedding_cache)
-                continue
-            elif user_input.lower() == 'clear':
-                embedding_cache.clear()
-                print("🧹 Cache de embeddings limpiado")
-                continue
-            elif user_input.lower() == 'list':
-                list_cached_embeddings(embedding_cache)
-                continue
-            elif not user_input:
-                continue
+                if user_input.lower() == 'exit':
+                    print("👋 ¡Hasta luego!")
+                    break
+                elif user_input.lower() == 'help':
+                    show_help()
+                    continue
+                elif user_input.lower() == 'compare':
+                    await compare_cached_embeddings(embedding_cache)
+                    continue
+                elif user_input.lower() == 'clear':
+                    embedding_cache.clear()
+                    print("🧹 Cache de embeddings limpiado")
+                    continue
+                elif user_input.lower() == 'list':
+                    list_cached_embeddings(embedding_cache)
+                    continue
+                elif not user_input:
+                    continue
             
-            # Generar embedding
-            print(f"🧠 Generando embedding para: '{user_input}'")
+                # Generar embedding
+                print(f"🧠 Generando embedding para: '{user_input}'")
+                
+                if warmup_task is not None:
+                    await warmup_task
+                    warmup_task = None
             
-            embeddings = await embedding_service.generate_embeddings([user_input])
-            if embeddings:
-                embedding = embeddings[0]
+                embeddings = await disk_cache.embed([user_input], embedding_service.generate_embeddings)
+                if embeddings:
+                    embedding = np.asarray(embeddings[0], dtype=np.float32)
                 
-                # Guardar en cache
-                embedding_cache[user_input] = embedding
+                    norm = float(np.sqrt(np.einsum('i,i->', embedding, embedding)))
                 
-                # Mostrar información del embedding
-                print(f"✅ Embedding generado:")
-                print(f"   📏 Dimensiones: {len(embedding)}")
-                print(f"   📊 Rango: [{min(embedding):.4f}, {max(embedding):.4f}]")
-                print(f"   🎯 Norma: {sum(x*x for x in embedding)**0.5:.4f}")
-                print(f"   📈 Media: {sum(embedding)/len(embedding):.4f}")
+                    # Guardar en cache normalizado: el coseno es un producto punto
+                    embedding_cache[user_input] = embedding / (norm + 1e-12)
                 
-                # Si hay otros embeddings, calcular similitudes
-                if len(embedding_cache) > 1:
-                    print(f"\n🔍 Similitudes con embeddings anteriores:")
-                    await show_similarities(user_input, embedding_cache)
-            else:
-                print("❌ Error generando embedding")
+                    # Mostrar información del embedding
+                    print(f"✅ Embedding generado:")
+                    print(f"   📏 Dimensiones: {embedding.size}")
+                    print(f"   📊 Rango: [{embedding.min():.4f}, {embedding.max():.4f}]")
+                    print(f"   🎯 Norma: {norm:.4f}")
+                    print(f"   📈 Media: {embedding.mean():.4f}")
                 
-        except KeyboardInterrupt:
-            print("\n👋 ¡Hasta luego!")
-            break
-        except Exception as e:
-            print(f"❌ Error: {str(e)}")
+                    # Si hay otros embeddings, calcular similitudes
+                    if len(embedding_cache) > 1:
+                        print(f"\n🔍 Similitudes con embeddings anteriores:")
+                        await show_similarities(user_input, embedding_cache)
+                else:
+                    print("❌ Error generando embedding")
+                
+            except (KeyboardInterrupt, EOFError):
+                print("\n👋 ¡Hasta luego!")
+                break
+            except Exception as e:
+                print(f"❌ Error: {str(e)}")
+    
+    finally:
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+        # Persistir los embeddings generados en la sesión
+        disk_cache.save()
 
 
 def show_help():
@@ -108,17 +160,18 @@ async def show_similarities(current_text, cache):
     """Muestra similitudes con embeddings en cache."""
     current_embedding = cache[current_text]
     
-    similarities = []
-    for text, embedding in cache.items():
-        if text != current_text:
-            similarity = calculate_cosine_similarity(current_embedding, embedding)
-            similarities.append((similarity, text))
+    # Todas las similitudes en un solo producto matriz-vector
+    texts = [text for text in cache if text != current_text]
+    scores = np.stack([cache[text] for text in texts]) @ current_embedding
     
-    # Ordenar por similitud
-    similarities.sort(reverse=True)
+    # Top 5 con argpartition, ordenando solo los elegidos
+    k = min(5, scores.size)
+    top_idx = np.argpartition(-scores, k - 1)[:k]
+    top_idx = top_idx[np.argsort(-scores[top_idx])]
+    similarities = [(float(scores[j]), texts[j]) for j in top_idx]
     
     # Mostrar top 5
-    for i, (similarity, text) in enumerate(similarities[:5], 1):
+    for i, (similarity, text) in enumerate(similarities, 1):
         # Indicador de similitud
         if similarity > 0.8:
             indicator = "🟢 Muy similar"
@@ -143,39 +196,29 @@ async def compare_cached_embeddings(cache):
     print("=" * 50)
     
     texts = list(cache.keys())
+    matrix = similarity_matrix([cache[text] for text in texts])
     
     # Matriz de similitud
-    print("Similitud".ljust(20), end="")
-    for i in range(len(texts)):
-        print(f"{i+1:>6}", end="")
-    print()
+    print("Similitud".ljust(20) + "".join(f"{i+1:>6}" for i in range(len(texts))))
     print("-" * (20 + 6 * len(texts)))
     
+    # Una sola escritura por fila; la diagonal se muestra como 1.00 exacto
+    np.fill_diagonal(matrix, 1.0)
     for i, text1 in enumerate(texts):
         text_short = f"{i+1}. {text1[:15]}..." if len(text1) > 15 else f"{i+1}. {text1}"
-        print(text_short.ljust(20), end="")
-        
-        for j, text2 in enumerate(texts):
-            if i == j:
-                print("  1.00", end="")
-            else:
-                similarity = calculate_cosine_similarity(cache[text1], cache[text2])
-                print(f"{similarity:6.2f}", end="")
-        print()
+        print(text_short.ljust(20) + "".join(f"{v:6.2f}" for v in matrix[i].tolist()))
 
 
-def calculate_cosine_similarity(vec1, vec2):
-    """Calcula similitud coseno entre dos vectores."""
-    import math
-    
-    dot_product = sum(a * b for a, b in zip(vec1, vec2))
-    magnitude1 = math.sqrt(sum(a * a for a in vec1))
-    magnitude2 = math.sqrt(sum(a * a for a in vec2))
-    
-    if magnitude1 == 0 or magnitude2 == 0:
-        return 0.0
-    
-    return dot_product / (magnitude1 * magnitude2)
+def normalize(vec):
+    """Devuelve el vector float32 con norma L2 unitaria."""
+    vec = np.asarray(vec, dtype=np.float32)
+    return vec / (np.linalg.norm(vec) + 1e-12)
+
+
+def similarity_matrix(vectors):
+    """Calcula la matriz de similitud coseno de vectores normalizados (M @ M.T)."""
+    matrix = np.stack(vectors).astype(np.float32)
+    return matrix @ matrix.T
 
 
 async def quick_embedding_test():
@@ -193,47 +236,40 @@ async def quick_embedding_test():
     ]
     
     embedding_service = get_embedding_service()
+    disk_cache = shared_disk_cache()
     
     print("🧠 Generando embeddings para ejemplos...")
-    embeddings = await embedding_service.generate_embeddings(examples)
+    embeddings = await disk_cache.embed(examples, embedding_service.generate_embeddings)
+    disk_cache.save()
     
     if not embeddings:
         print("❌ Error generando embeddings")
         return
     
     print("✅ Embeddings generados exitosamente")
+    matrix = similarity_matrix([normalize(e) for e in embeddings])
     
     # Mostrar matriz de similitud
     print(f"\n📊 MATRIZ DE SIMILITUD ({len(examples)}x{len(examples)}):")
     print("-" * 60)
     
     # Header
-    print("Ejemplo".ljust(25), end="")
-    for i in range(len(examples)):
-        print(f"{i+1:>6}", end="")
-    print()
+    print("Ejemplo".ljust(25) + "".join(f"{i+1:>6}" for i in range(len(examples))))
     print("-" * (25 + 6 * len(examples)))
     
-    # Filas
+    # Filas: una sola escritura por fila; la diagonal se muestra como 1.00 exacto
+    np.fill_diagonal(matrix, 1.0)
     for i, example1 in enumerate(examples):
         example_short = f"{i+1}. {example1[:20]}..." if len(example1) > 20 else f"{i+1}. {example1}"
-        print(example_short.ljust(25), end="")
-        
-        for j, example2 in enumerate(examples):
-            if i == j:
-                print("  1.00", end="")
-            else:
-                similarity = calculate_cosine_similarity(embeddings[i], embeddings[j])
-                print(f"{similarity:6.2f}", end="")
-        print()
+        print(example_short.ljust(25) + "".join(f"{v:6.2f}" for v in matrix[i].tolist()))
     
     # Encontrar pares más similares
     print(f"\n🎯 PARES MÁS SIMILARES:")
-    pairs = []
-    for i in range(len(examples)):
-        for j in range(i+1, len(examples)):
-            similarity = calculate_cosine_similarity(embeddings[i], embeddings[j])
-            pairs.append((similarity, i, j))
+    rows, cols = np.triu_indices(len(examples), k=1)
+    pairs = [
+        (float(matrix[i, j]), i, j)
+        for i, j in zip(rows.tolist(), cols.tolist())
+    ]
     
     pairs.sort(reverse=True)
     
@@ -1,45 +1,94 @@
 """Aplicación principal FastAPI para búsqueda semántica de e-commerce."""
+import asyncio
+import contextlib
 from contextlib import asynccontextmanager
 
+import orjson
 from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
+from starlette.routing import Route
 
 from config import get_settings
+from api.middleware import PureASGICORS, ReadinessEndpoint, StaticASGIResponse
 from api.routes import router
-from services.elasticsearch_service import get_elasticsearch_service
+from services.elasticsearch_service import close_elasticsearch_service, get_elasticsearch_service
+from services.embedding_service import get_embedding_service
+from services.product_service import close_product_service
 from utils.logger import get_logger
+from utils.monitoring import start_monitoring, stop_monitoring
 
 settings = get_settings()
 logger = get_logger(__name__)
 
 
+async def _startup_es_check(es_service) -> bool:
+    """Verifica Elasticsearch y aplica el mapping del índice al inicio."""
+    try:
+        if await es_service.ensure_ready():
+            logger.info("Conexión con Elasticsearch verificada e índice listo")
+            return True
+        logger.warning("Elasticsearch no disponible al inicio")
+    except Exception as e:
+        logger.error("Error verificando Elasticsearch al inicio: %s", e)
+    return False
+
+
+async def _startup_warmup() -> None:
+    """Precarga el modelo de embeddings."""
+    try:
+        await get_embedding_service().warmup()
+    except Exception as e:
+        logger.error("Error precargando modelo de embeddings: %s", e)
+
+
+async def _startup_checks(app: FastAPI) -> None:
+    """Verificaciones de arranque en paralelo; al terminar la app queda lista.
+    
+    Si Elasticsearch no respondía, se sigue reintentando en segundo plano.
+    """
+    es_ready, _ = await asyncio.gather(_startup_es_check(app.state.es), _startup_warmup())
+    app.state.ready.set()
+    logger.info("Aplicación lista para recibir tráfico")
+    
+    if not es_ready:
+        await app.state.es.retry_until_ready()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manejador del ciclo de vida de la aplicación."""
     # Startup
     logger.info("Iniciando aplicación de búsqueda semántica")
     
-    # Verificar servicios básicos al inicio
-    try:
-        es_service = get_elasticsearch_service()
-        health = await es_service.check_connection()
-        if health["status"] == "up":
-            logger.info("Conexión con Elasticsearch verificada")
-        else:
-            logger.warning("Elasticsearch no disponible al inicio")
-    except Exception as e:
-        logger.error(f"Error verificando Elasticsearch al inicio: {str(e)}")
+    # Un único cliente (y pool de conexiones) para toda la vida del proceso
+    app.state.es = get_elasticsearch_service()
+    
+    # La verificación de Elasticsearch y la precarga del modelo corren en
+    # segundo plano: el servidor acepta conexiones de inmediato y /ping
+    # responde 503 hasta que terminan
+    app.state.ready = asyncio.Event()
+    startup_task = asyncio.create_task(_startup_checks(app))
+    
+    # Consumidor de registros de monitoreo
+    start_monitoring()
     
     yield
     
     # Shutdown
     logger.info("Cerrando aplicación")
-    try:
-        es_service = get_elasticsearch_service()
-        await es_service.close()
-    except Exception as e:
-        logger.error(f"Error cerrando conexiones: {str(e)}")
+    if not startup_task.done():
+        startup_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await startup_task
+    await stop_monitoring()
+    results = await asyncio.gather(
+        close_elasticsearch_service(),
+        close_product_service(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error("Error cerrando conexiones: %s", result)
 
 
 # Crear aplicación FastAPI
@@ -51,6 +100,8 @@ app = FastAPI(
     redoc_url="/redoc",
     openapi_url="/openapi.json",
     lifespan=lifespan,
+    # orjson para toda respuesta JSON que no fije su propia clase
+    default_response_class=ORJSONResponse,
     contact={
         "name": "E-commerce Semantic Search API",
         "url": "https://github.com/RickContreras/ecommerce-semantic-search",
@@ -60,96 +111,106 @@ app = FastAPI(
     },
 )
 
-# Configurar CORS - Permitir TODO desde cualquier lugar
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Permite cualquier origen
-    allow_credentials=True,  # Permite cookies y credenciales
-    allow_methods=["*"],  # Permite todos los métodos HTTP
-    allow_headers=["*"],  # Permite cualquier header
-    expose_headers=["*"],  # Expone todos los headers en respuestas
-)
+# Configurar CORS - Permitir TODO desde cualquier lugar (cualquier origen,
+# método y header, con credenciales) con un middleware ASGI puro
+app.add_middleware(PureASGICORS)
 
 # Incluir rutas
 app.include_router(router, prefix=settings.api_v1_str)
 
 
+# Las respuestas estáticas solo dependen de settings: se serializan una vez
+ROOT_BODY = orjson.dumps({
+    "message": "API de Búsqueda Semántica E-commerce",
+    "version": settings.version,
+    "docs": "/docs",
+    "health": f"{settings.api_v1_str}/health"
+})
+# Las respuestas se construyen una vez: los handlers no reciben
+# BackgroundTasks, así que FastAPI las devuelve sin modificarlas
+ROOT_RESPONSE = Response(content=ROOT_BODY, media_type="application/json")
+
+
 @app.get("/")
 async def root():
     """Endpoint raíz con información básica."""
-    return {
-        "message": "API de Búsqueda Semántica E-commerce",
-        "version": settings.version,
-        "docs": "/docs",
-        "health": f"{settings.api_v1_str}/health"
-    }
+    return ROOT_RESPONSE
 
 
-@app.get("/ping")
-async def ping():
-    """Endpoint simple para verificar que la API está funcionando."""
-    return {"status": "ok", "timestamp": "2025-01-01T00:00:00Z"}
+# Endpoint simple para verificar que la API está funcionando: respuestas
+# serializadas una sola vez y servidas sin pasar por FastAPI (503 mientras
+# terminan las verificaciones de arranque)
+PING_BODY = orjson.dumps({"status": "ok", "timestamp": "2025-01-01T00:00:00Z"})
+PING_STARTING_BODY = orjson.dumps({"status": "starting"})
+readiness = ReadinessEndpoint(
+    ready=StaticASGIResponse(PING_BODY, b"application/json"),
+    starting=StaticASGIResponse(PING_STARTING_BODY, b"application/json", status=503)
+)
+app.router.routes.insert(0, Route("/ping", endpoint=readiness))
+# Alias para sondas de readiness (Kubernetes)
+app.router.routes.insert(1, Route("/readyz", endpoint=readiness))
 
 
-@app.get("/api-info")
-async def api_info():
-    """Información detallada de la API y endpoints disponibles."""
-    return {
-        "api": {
-            "title": "E-commerce Semantic Search",
-            "version": settings.version,
-            "description": "Sistema de búsqueda semántica para productos de e-commerce"
+API_INFO_BODY = orjson.dumps({
+    "api": {
+        "title": "E-commerce Semantic Search",
+        "version": settings.version,
+        "description": "Sistema de búsqueda semántica para productos de e-commerce"
+    },
+    "documentation": {
+        "swagger_ui": f"http://localhost:8000/docs",
+        "redoc": f"http://localhost:8000/redoc", 
+        "openapi_json": f"http://localhost:8000/openapi.json"
+    },
+    "endpoints": {
+        "search": {
+            "url": f"{settings.api_v1_str}/buscar",
+            "method": "POST",
+            "description": "Búsqueda semántica de productos",
+            "example": {
+                "query": "smartphone con buena cámara",
+                "top_k": 5,
+                "category": "Smartphones",
+                "price_max": 1500.0
+            }
         },
-        "documentation": {
-            "swagger_ui": f"http://localhost:8000/docs",
-            "redoc": f"http://localhost:8000/redoc", 
-            "openapi_json": f"http://localhost:8000/openapi.json"
+        "sync": {
+            "url": f"{settings.api_v1_str}/sync",
+            "method": "POST", 
+            "description": "Sincronizar productos desde API externa"
         },
-        "endpoints": {
-            "search": {
-                "url": f"{settings.api_v1_str}/buscar",
-                "method": "POST",
-                "description": "Búsqueda semántica de productos",
-                "example": {
-                    "query": "smartphone con buena cámara",
-                    "top_k": 5,
-                    "category": "Smartphones",
-                    "price_max": 1500.0
-                }
-            },
-            "sync": {
-                "url": f"{settings.api_v1_str}/sync",
-                "method": "POST", 
-                "description": "Sincronizar productos desde API externa"
-            },
-            "health": {
-                "url": f"{settings.api_v1_str}/health",
-                "method": "GET",
-                "description": "Estado de salud de todos los servicios"
-            },
-            "categories": {
-                "url": f"{settings.api_v1_str}/categories",
-                "method": "GET",
-                "description": "Lista de categorías disponibles"
-            },
-            "stats": {
-                "url": f"{settings.api_v1_str}/stats", 
-                "method": "GET",
-                "description": "Estadísticas del índice y búsquedas"
-            }
+        "health": {
+            "url": f"{settings.api_v1_str}/health",
+            "method": "GET",
+            "description": "Estado de salud de todos los servicios"
         },
-        "examples": {
-            "semantic_search": "curl -X POST http://localhost:8000/api/v1/buscar -H 'Content-Type: application/json' -d '{\"query\": \"laptop para programar\", \"top_k\": 3}'",
-            "health_check": "curl http://localhost:8000/api/v1/health",
-            "categories": "curl http://localhost:8000/api/v1/categories"
+        "categories": {
+            "url": f"{settings.api_v1_str}/categories",
+            "method": "GET",
+            "description": "Lista de categorías disponibles"
+        },
+        "stats": {
+            "url": f"{settings.api_v1_str}/stats", 
+            "method": "GET",
+            "description": "Estadísticas del índice y búsquedas"
         }
+    },
+    "examples": {
+        "semantic_search": "curl -X POST http://localhost:8000/api/v1/buscar -H 'Content-Type: application/json' -d '{\"query\": \"laptop para programar\", \"top_k\": 3}'",
+        "health_check": "curl http://localhost:8000/api/v1/health",
+        "categories": "curl http://localhost:8000/api/v1/categories"
     }
+})
+API_INFO_RESPONSE = Response(content=API_INFO_BODY, media_type="application/json")
 
 
-@app.get("/docs-simple", response_class=HTMLResponse)
-async def docs_simple():
-    """Documentación simple de la API en HTML."""
-    html_content = """
+@app.get("/api-info")
+async def api_info():
+    """Información detallada de la API y endpoints disponibles."""
+    return API_INFO_RESPONSE
+
+
+DOCS_SIMPLE_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -240,22 +301,43 @@ async def docs_simple():
     </body>
     </html>
     """
-    return HTMLResponse(content=html_content)
+# Codificado una sola vez al importar el módulo
+DOCS_SIMPLE_BYTES = DOCS_SIMPLE_HTML.encode("utf-8")
+DOCS_SIMPLE_RESPONSE = Response(content=DOCS_SIMPLE_BYTES, media_type="text/html")
+
+
+@app.get("/docs-simple", response_class=HTMLResponse)
+async def docs_simple():
+    """Documentación simple de la API en HTML."""
+    return DOCS_SIMPLE_RESPONSE
 
 
 if __name__ == "__main__":
+    import os
     import uvicorn
     import argparse
 
     parser = argparse.ArgumentParser(description="E-commerce Semantic Search API")
     parser.add_argument("-p", "--port", type=int, default=8000, help="Puerto para el servidor")
     parser.add_argument("--host", type=str, default="0.0.0.0", help="Host para el servidor")
+    parser.add_argument(
+        "--workers", type=int, default=int(os.getenv("WORKERS", "1")),
+        help="Procesos worker (ignorado con --reload)"
+    )
+    parser.add_argument(
+        "--reload", action="store_true", default=os.getenv("DEV") == "1",
+        help="Recarga automática para desarrollo (también con DEV=1)"
+    )
     args = parser.parse_args()
 
+    # uvloop + httptools (en requirements.txt); la recarga solo admite un worker
     uvicorn.run(
         "main:app",
         host=args.host,
         port=args.port,
-        reload=True,
+        loop="uvloop",
+        http="httptools",
+        workers=1 if args.reload else args.workers,
+        reload=args.reload,
         log_level=settings.log_level.lower()
-    )
\ No newline at end of file
+    )
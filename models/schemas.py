@@ -1,70 +1,75 @@
 """Esquemas y modelos Pydantic para el API."""
-from datetime import datetime
-from typing import Any, Dict, List, Optional, Union
+from datetime import datetime, timezone
+from typing import Annotated, Any, Dict, List, Optional
 
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, ValidationInfo, computed_field, field_validator
+
+
+def utc_now() -> datetime:
+    """Fecha y hora actual en UTC (con zona horaria)."""
+    return datetime.now(timezone.utc)
+
+
+# Niveles de relevancia indexados por umbrales superados (0.6 y 0.8)
+_RELEVANCE = ("baja", "media", "alta")
 
 
 # Modelos base del producto
 class Product(BaseModel):
-    """Modelo de producto."""
+    """Modelo de producto.
+
+    pydantic-core convierte el precio en texto a float y parsea las fechas
+    ISO 8601 (incluido el sufijo ``Z``) sin validadores en Python.
+    """
     id: str
     name: str
     description: str
-    price: Union[str, float] 
+    price: float
     image_url: str
     category: str
     stock: int
-    created_at: Union[str, datetime]
-    updated_at: Union[str, datetime]
-
-    @validator('price')
-    def validate_price(cls, v):
-        """Valida y convierte el precio a float."""
-        if isinstance(v, str):
-            return float(v)
-        return v
-
-    @validator('created_at', 'updated_at')
-    def validate_dates(cls, v):
-        """Valida y convierte las fechas."""
-        if isinstance(v, str):
-            # Intenta parsear la fecha ISO
-            return datetime.fromisoformat(v.replace('Z', '+00:00'))
-        return v
+    created_at: datetime
+    updated_at: datetime
 
 
 class ProductWithScore(Product):
     """Producto con score de relevancia para resultados de búsqueda."""
-    score_semantico: float = Field(..., description="Score de similaridad semántica")
-    relevancia: str = Field(..., description="Nivel de relevancia: alta, media, baja")
-
-    @validator('relevancia')
-    def validate_relevancia(cls, v, values):
-        """Asigna nivel de relevancia basado en el score."""
-        score = values.get('score_semantico', 0)
-        if score >= 0.8:
-            return "alta"
-        elif score >= 0.6:
-            return "media"
-        else:
-            return "baja"
+    model_config = ConfigDict(frozen=True)
+    
+    score_semantico: float = Field(
+        ...,
+        description="Parte kNN del score: (1 + similitud coseno) / 2 en [0, 1]; 0 si solo coincide por texto"
+    )
+    score_hibrido: Optional[float] = Field(
+        None,
+        description="Score de ranking (kNN + texto); puede superar 1"
+    )
+
+    @computed_field(description="Nivel de relevancia: alta, media, baja")
+    @property
+    def relevancia(self) -> str:
+        """Nivel de relevancia derivado del score."""
+        score = self.score_semantico
+        return _RELEVANCE[(score >= 0.6) + (score >= 0.8)]
 
 
 # Request models
 class SearchRequest(BaseModel):
     """Request para búsqueda semántica."""
-    query: str = Field(..., description="Consulta de búsqueda")
-    top_k: int = Field(5, ge=1, le=50, description="Número máximo de resultados")
-    category: Optional[str] = Field(None, description="Filtro por categoría")
-    price_min: Optional[float] = Field(None, ge=0, description="Precio mínimo")
-    price_max: Optional[float] = Field(None, gt=0, description="Precio máximo") 
-    include_out_of_stock: bool = Field(False, description="Incluir productos sin stock")
-
-    @validator('price_max')
-    def validate_price_range(cls, v, values):
+    model_config = ConfigDict(frozen=True)
+    
+    query: Annotated[str, Field(description="Consulta de búsqueda")]
+    top_k: Annotated[int, Field(ge=1, le=50, description="Número máximo de resultados")] = 5
+    category: Annotated[Optional[str], Field(description="Filtro por categoría")] = None
+    price_min: Annotated[Optional[float], Field(ge=0, description="Precio mínimo")] = None
+    price_max: Annotated[Optional[float], Field(gt=0, description="Precio máximo")] = None
+    include_out_of_stock: Annotated[bool, Field(description="Incluir productos sin stock")] = False
+
+    @field_validator('price_max', mode='after')
+    @classmethod
+    def validate_price_range(cls, v, info: ValidationInfo):
         """Valida que price_max > price_min."""
-        price_min = values.get('price_min')
+        price_min = info.data.get('price_min')
         if price_min is not None and v is not None and v <= price_min:
             raise ValueError('price_max debe ser mayor que price_min')
         return v
@@ -78,6 +83,8 @@ class SyncRequest(BaseModel):
 # Response models
 class SearchFilters(BaseModel):
     """Filtros aplicados en la búsqueda."""
+    model_config = ConfigDict(frozen=True)
+    
     category: Optional[str] = None
     price_range: Optional[Dict[str, Optional[float]]] = None
     in_stock_only: bool = True
@@ -117,7 +124,7 @@ class IndexStats(BaseModel):
 class HealthResponse(BaseModel):
     """Response del health check."""
     status: str
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
+    timestamp: datetime = Field(default_factory=utc_now)
     services: Dict[str, ServiceStatus]
     index_stats: IndexStats
 
@@ -151,6 +158,8 @@ class StatsResponse(BaseModel):
 # Modelos internos para Elasticsearch
 class ProductDocument(BaseModel):
     """Documento de producto para indexar en Elasticsearch."""
+    model_config = ConfigDict(frozen=True)
+    
     id: str
     name: str
     description: str
@@ -158,14 +167,20 @@ class ProductDocument(BaseModel):
     price: float
     stock: int
     image_url: str
-    embedding: List[float]  # Vector de embedding
+    # Vector de embedding: lista de floats o fila float32 de numpy (el
+    # serializador orjson del cliente ES acepta ambos sin convertir)
+    embedding: Any
     created_at: datetime
     updated_at: datetime
 
     @classmethod
     def from_product(cls, product: Product, embedding: List[float]) -> "ProductDocument":
-        """Crea un documento desde un Product y su embedding."""
-        return cls(
+        """Crea un documento desde un Product y su embedding.
+        
+        El Product ya viene validado y el embedding lo genera el propio
+        servicio, así que se construye sin revalidar (ruta caliente del sync).
+        """
+        return cls.model_construct(
             id=product.id,
             name=product.name,
             description=product.description,
@@ -184,4 +199,4 @@ class ErrorResponse(BaseModel):
     """Response de error estándar."""
     error: str
     detail: Optional[str] = None
-    timestamp: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    timestamp: datetime = Field(default_factory=utc_now)
\ No newline at end of file
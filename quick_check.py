@@ -1,38 +1,71 @@
 #!/usr/bin/env python3
 """Script de verificación rápida para desarrollo diario."""
 
-import requests
+import asyncio
 import json
 import sys
 import time
 from typing import Dict, Any
 
+import httpx
+import orjson
 
-def quick_check() -> bool:
-    """Verificación rápida del sistema."""
-    base_url = "http://localhost:8000"
-    
-    print("⚡ VERIFICACIÓN RÁPIDA DEL PROYECTO")
-    print("=" * 50)
-    
-    # 1. Ping básico
-    print("1️⃣ Conectividad...")
+try:
+    import uvloop
+except ImportError:  # uvloop es opcional (no disponible en Windows)
+    uvloop = None
+
+# Cuerpo fijo de la búsqueda de verificación, serializado una sola vez
+QUICK_SEARCH_BODY = orjson.dumps({"query": "smartphone", "top_k": 1})
+JSON_HEADERS = {"content-type": "application/json"}
+
+
+async def get_response(client: httpx.AsyncClient, method: str, path: str, **kwargs):
+    """Ejecuta una petición y retorna (respuesta o excepción, segundos transcurridos)."""
+    start = time.perf_counter()
     try:
-        response = requests.get(f"{base_url}/ping", timeout=5)
-        if response.status_code == 200:
-            print("   ✅ API disponible")
-        else:
-            print(f"   ❌ API error: {response.status_code}")
-            return False
+        response = await client.request(method, path, **kwargs)
     except Exception as e:
-        print(f"   ❌ No conecta: {e}")
-        print("\n💡 Solución: Ejecuta 'python main.py'")
-        return False
+        response = e
+    return response, time.perf_counter() - start
+
+
+async def run_quick_check(base_url: str) -> bool:
+    """Verificación rápida con un único cliente y las sondas en paralelo."""
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        # 1. Ping básico
+        print("1️⃣ Conectividad...")
+        try:
+            response = await client.get("/ping", timeout=5)
+            if response.status_code == 200:
+                print("   ✅ API disponible")
+            else:
+                print(f"   ❌ API error: {response.status_code}")
+                return False
+        except Exception as e:
+            print(f"   ❌ No conecta: {e}")
+            print("\n💡 Solución: Ejecuta 'python main.py'")
+            return False
+        
+        # Con la API disponible, el resto de sondas son independientes:
+        # se lanzan a la vez y se informan en orden
+        (health_response, _), (stats_response, _), (search_response, elapsed) = await asyncio.gather(
+            get_response(client, "GET", "/api/v1/health", timeout=10),
+            get_response(client, "GET", "/api/v1/stats", timeout=5),
+            get_response(
+                client, "POST", "/api/v1/buscar",
+                content=QUICK_SEARCH_BODY,
+                headers=JSON_HEADERS,
+                timeout=10
+            )
+        )
     
     # 2. Health check
     print("2️⃣ Servicios...")
     try:
-        response = requests.get(f"{base_url}/api/v1/health", timeout=10)
+        response = health_response
+        if isinstance(response, Exception):
+            raise response
         if response.status_code == 200:
             health = response.json()
             status = health.get('status', 'unknown')
@@ -60,7 +93,9 @@ def quick_check() -> bool:
     # 3. Datos indexados
     print("3️⃣ Datos...")
     try:
-        response = requests.get(f"{base_url}/api/v1/stats", timeout=5)
+        response = stats_response
+        if isinstance(response, Exception):
+            raise response
         if response.status_code == 200:
             stats = response.json()
             docs = stats.get('total_documents', 0)
@@ -81,16 +116,9 @@ def quick_check() -> bool:
     # 4. Búsqueda rápida
     print("4️⃣ Búsqueda...")
     try:
-        search_data = {"query": "smartphone", "top_k": 1}
-        
-        start = time.time()
-        response = requests.post(
-            f"{base_url}/api/v1/buscar",
-            json=search_data,
-            headers={"Content-Type": "application/json"},
-            timeout=10
-        )
-        elapsed = time.time() - start
+        response = search_response
+        if isinstance(response, Exception):
+            raise response
         
         if response.status_code == 200:
             results = response.json()
@@ -111,6 +139,21 @@ def quick_check() -> bool:
         print(f"   ❌ Search error: {e}")
         return False
     
+    return True
+
+
+def quick_check() -> bool:
+    """Verificación rápida del sistema."""
+    base_url = "http://localhost:8000"
+    
+    print("⚡ VERIFICACIÓN RÁPIDA DEL PROYECTO")
+    print("=" * 50)
+    
+    # Event loop de libuv si está disponible
+    run = uvloop.run if uvloop is not None else asyncio.run
+    if not run(run_quick_check(base_url)):
+        return False
+    
     print("\n✅ VERIFICACIÓN COMPLETA - Sistema funcionando")
     print(f"📚 Docs: {base_url}/docs")
     return True
@@ -124,6 +167,13 @@ def demo_search():
     print("=" * 50)
     print("Escribe consultas para probar el sistema (o 'exit' para salir)")
     
+    # Una sola conexión keep-alive reutilizada entre consultas
+    with httpx.Client(base_url=base_url) as client:
+        demo_loop(client)
+
+
+def demo_loop(client: httpx.Client):
+    """Bucle de consultas del demo interactivo."""
     while True:
         try:
             query = input("\n🔍 Buscar: ").strip()
@@ -136,10 +186,9 @@ def demo_search():
             # Ejecutar búsqueda
             start = time.time()
             
-            response = requests.post(
-                f"{base_url}/api/v1/buscar",
+            response = client.post(
+                "/api/v1/buscar",
                 json={"query": query, "top_k": 3},
-                headers={"Content-Type": "application/json"},
                 timeout=15
             )
             
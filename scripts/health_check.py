@@ -4,105 +4,121 @@ import sys
 from datetime import datetime
 from pathlib import Path
 
+try:
+    import uvloop
+except ImportError:  # uvloop es opcional (no disponible en Windows)
+    uvloop = None
+
 # Agregar el directorio raíz al path
 sys.path.append(str(Path(__file__).parent.parent))
 
-from services.elasticsearch_service import get_elasticsearch_service
-from services.product_service import get_product_service  
+from services.elasticsearch_service import close_elasticsearch_service, get_elasticsearch_service
+from services.product_service import close_product_service, get_product_service
 from services.embedding_service import get_embedding_service
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
 
-def print_status(service_name: str, status: dict, details: bool = False):
+def print_status(service_name: str, status: dict, details: bool = False, out=print):
     """Imprime el estado de un servicio de forma legible."""
     status_icon = "✅" if status.get("status") == "up" or status.get("status") == "loaded" else "❌"
-    print(f"{status_icon} {service_name}: {status.get('status', 'unknown')}")
+    out(f"{status_icon} {service_name}: {status.get('status', 'unknown')}")
     
     if details:
         for key, value in status.items():
             if key != "status":
-                print(f"   └─ {key}: {value}")
+                out(f"   └─ {key}: {value}")
+
+
+async def run_buffered(check) -> bool:
+    """Ejecuta una verificación e imprime su salida en bloque al terminar.
+    
+    Permite lanzar varias verificaciones en paralelo sin que sus líneas
+    se entremezclen en la terminal.
+    """
+    lines = []
+    try:
+        return await check(lines.append)
+    finally:
+        print("\n".join(lines))
 
 
-async def check_elasticsearch():
+async def check_elasticsearch(out=print):
     """Verifica el estado de Elasticsearch."""
-    print("\n🔍 Verificando Elasticsearch...")
+    out("\n🔍 Verificando Elasticsearch...")
     
     es_service = get_elasticsearch_service()
     
     try:
         # Verificar conexión básica
         health = await es_service.check_connection()
-        print_status("Conexión", health, details=True)
+        print_status("Conexión", health, details=True, out=out)
         
         if health["status"] == "up":
             # Verificar índice
             try:
                 stats = await es_service.get_index_stats()
-                print(f"   └─ Productos indexados: {stats.get('total_productos', 0)}")
-                print(f"   └─ Tamaño del índice: {stats.get('index_size_mb', 0)} MB")
+                out(f"   └─ Productos indexados: {stats.get('total_productos', 0)}")
+                out(f"   └─ Tamaño del índice: {stats.get('index_size_mb', 0)} MB")
             except Exception as e:
-                print(f"   └─ ⚠️  Error obteniendo estadísticas: {str(e)}")
+                out(f"   └─ ⚠️  Error obteniendo estadísticas: {str(e)}")
         
         return health["status"] == "up"
         
     except Exception as e:
-        print(f"❌ Error verificando Elasticsearch: {str(e)}")
+        out(f"❌ Error verificando Elasticsearch: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
-async def check_products_api():
+async def check_products_api(out=print):
     """Verifica el estado de la API de productos."""
-    print("\n🛍️  Verificando API de productos...")
+    out("\n🛍️  Verificando API de productos...")
     
     product_service = get_product_service()
     
     try:
         health = await product_service.check_api_health()
-        print_status("API Productos", health, details=True)
+        print_status("API Productos", health, details=True, out=out)
         
         if health["status"] == "up":
             # Verificar que podemos obtener productos
             try:
                 products = await product_service.get_products(skip=0, limit=1)
-                print(f"   └─ Productos disponibles: ✅ (sample: {len(products)})")
+                out(f"   └─ Productos disponibles: ✅ (sample: {len(products)})")
             except Exception as e:
-                print(f"   └─ ⚠️  Error obteniendo productos: {str(e)}")
+                out(f"   └─ ⚠️  Error obteniendo productos: {str(e)}")
         
         return health["status"] == "up"
         
     except Exception as e:
-        print(f"❌ Error verificando API de productos: {str(e)}")
+        out(f"❌ Error verificando API de productos: {str(e)}")
         return False
 
 
-async def check_embedding_model():
+async def check_embedding_model(out=print):
     """Verifica el estado del modelo de embeddings."""
-    print("\n🧠 Verificando modelo de embeddings...")
+    out("\n🧠 Verificando modelo de embeddings...")
     
     embedding_service = get_embedding_service()
     
     try:
         # Intentar cargar el modelo y generar un embedding de prueba
         model_info = await embedding_service.get_model_info()
-        print_status("Modelo", {"status": "loaded"}, details=False)
+        print_status("Modelo", {"status": "loaded"}, details=False, out=out)
         
         for key, value in model_info.items():
-            print(f"   └─ {key}: {value}")
+            out(f"   └─ {key}: {value}")
         
         # Prueba de embedding
         test_embedding = await embedding_service.generate_embedding("test")
-        print(f"   └─ Prueba de embedding: ✅ (dimensión: {len(test_embedding)})")
+        out(f"   └─ Prueba de embedding: ✅ (dimensión: {len(test_embedding)})")
         
         return True
         
     except Exception as e:
-        print(f"❌ Error verificando modelo de embeddings: {str(e)}")
-        print("   └─ Esto puede deberse a falta de internet para descargar el modelo")
+        out(f"❌ Error verificando modelo de embeddings: {str(e)}")
+        out("   └─ Esto puede deberse a falta de internet para descargar el modelo")
         return False
 
 
@@ -113,10 +129,15 @@ async def comprehensive_health_check():
     
     start_time = datetime.now()
     
-    # Verificar todos los servicios
-    es_ok = await check_elasticsearch()
-    api_ok = await check_products_api()  
-    model_ok = await check_embedding_model()
+    # Verificar todos los servicios en paralelo: la latencia total es la de
+    # la verificación más lenta, no la suma de todas
+    results = await asyncio.gather(
+        run_buffered(check_elasticsearch),
+        run_buffered(check_products_api),
+        run_buffered(check_embedding_model),
+        return_exceptions=True
+    )
+    es_ok, api_ok, model_ok = (result is True for result in results)
     
     # Resumen final
     print("\n" + "=" * 50)
@@ -154,11 +175,12 @@ async def quick_health_check():
     
     try:
         es_service = get_elasticsearch_service()
-        es_health = await es_service.check_connection()
-        await es_service.close()
-        
         product_service = get_product_service()
-        api_health = await product_service.check_api_health()
+        
+        es_health, api_health = await asyncio.gather(
+            es_service.check_connection(),
+            product_service.check_api_health()
+        )
         
         if es_health["status"] == "up" and api_health["status"] == "up":
             print("✅ Servicios básicos funcionando")
@@ -172,12 +194,35 @@ async def quick_health_check():
         return False
 
 
+async def shutdown():
+    """Cierra una sola vez las conexiones compartidas por las verificaciones."""
+    try:
+        await close_elasticsearch_service()
+    except Exception as e:
+        logger.warning("Error cerrando Elasticsearch: %s", e)
+    
+    try:
+        await close_product_service()
+    except Exception as e:
+        logger.warning("Error cerrando el cliente de productos: %s", e)
+
+
+async def run_checks(quick: bool) -> bool:
+    """Ejecuta la verificación elegida y cierra las conexiones al final."""
+    try:
+        if quick:
+            return await quick_health_check()
+        return await comprehensive_health_check()
+    finally:
+        await shutdown()
+
+
 def main():
     """Función principal del script."""
-    if len(sys.argv) > 1 and sys.argv[1] == "--quick":
-        success = asyncio.run(quick_health_check())
-    else:
-        success = asyncio.run(comprehensive_health_check())
+    quick = len(sys.argv) > 1 and sys.argv[1] == "--quick"
+    # Event loop de libuv si está disponible
+    run = uvloop.run if uvloop is not None else asyncio.run
+    success = run(run_checks(quick))
     
     sys.exit(0 if success else 1)
 
@@ -61,13 +61,8 @@ async def reset_index():
     es_service = get_elasticsearch_service()
     
     try:
-        # Eliminar índice existente
-        deleted = await es_service.delete_index()
-        if deleted:
-            logger.info("Índice eliminado")
-        
-        # Crear nuevo índice
-        created = await es_service.create_index()
+        # Eliminar y crear el índice en un solo paso
+        created = await es_service.recreate_index()
         if created:
             logger.info("✅ Nuevo índice creado")
             return True
@@ -0,0 +1,33 @@
+"""Kernels de similitud para los scripts de ejemplo.
+
+Si numba está instalado, ``cosine_all`` se compila a código nativo (con
+cache en disco) y evita el coste fijo de despacho de BLAS en catálogos
+pequeños. Sin numba se usa el producto matriz-vector de NumPy.
+"""
+import numpy as np
+
+try:
+    from numba import njit
+except ImportError:  # numba es opcional
+    njit = None
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def cosine_all(matrix, query):
+        """Similitud coseno de cada fila normalizada con una query normalizada."""
+        n, dim = matrix.shape
+        out = np.empty(n, dtype=np.float32)
+        for i in range(n):
+            acc = np.float32(0.0)
+            for j in range(dim):
+                acc += matrix[i, j] * query[j]
+            out[i] = acc
+        return out
+
+    # Compilar al importar para que la primera búsqueda no pague el JIT
+    cosine_all(np.zeros((1, 1), dtype=np.float32), np.zeros(1, dtype=np.float32))
+else:
+    def cosine_all(matrix, query):
+        """Similitud coseno de cada fila normalizada con una query normalizada."""
+        return matrix @ query
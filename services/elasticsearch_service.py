@@ -1,23 +1,84 @@
 """Servicio para operaciones con Elasticsearch."""
 import asyncio
-from datetime import datetime
-from typing import List, Optional, Dict, Any
-import json
+import time
+from collections import deque
+from contextlib import asynccontextmanager, nullcontext
+from functools import lru_cache
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterable, AsyncIterator, Deque
 
+from elastic_transport import OrjsonSerializer
 from elasticsearch import AsyncElasticsearch
-from elasticsearch.exceptions import NotFoundError, ConnectionError as ESConnectionError
+from elasticsearch.exceptions import ConnectionError as ESConnectionError
+from elasticsearch.helpers import async_streaming_bulk
 
 from config import get_settings
 from models.schemas import (
     Product, ProductDocument, ProductWithScore, SearchRequest, 
     CategoryInfo, SearchFilters
 )
-from services.embedding_service import get_embedding_service
+from services.embedding_service import get_embedding_service, quantize_int8
 from utils.logger import get_logger
 
 settings = get_settings()
 logger = get_logger(__name__)
 
+# Lotes codificados por adelantado en cada flujo bulk
+PREFETCH_BATCHES = 2
+
+# Segundos entre reintentos de ensure_ready en segundo plano
+READY_RETRY_S = 5.0
+
+# Límite de Elasticsearch para knn.num_candidates
+MAX_NUM_CANDIDATES = 10_000
+
+# Ajustes del índice durante cargas bulk: sin refrescos ni réplicas y con
+# menos flushes del translog; al terminar se restauran los valores previos
+# (ver bulk_load_mode)
+BULK_LOAD_SETTINGS = {
+    "refresh_interval": "-1",
+    "number_of_replicas": 0,
+    "translog.flush_threshold_size": "1gb",
+}
+
+
+async def _batched(items: AsyncIterable[Product], size: int) -> AsyncIterator[List[Product]]:
+    """Agrupa un flujo asíncrono de productos en lotes de ``size``."""
+    batch = []
+    async for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def _aiter(items: List[Product]) -> AsyncIterator[Product]:
+    """Expone una lista de productos como flujo asíncrono."""
+    for item in items:
+        yield item
+
+
+async def _locked(
+    batches: AsyncIterator[List[Product]],
+    lock: asyncio.Lock,
+    requeued: Optional[Deque[List[Product]]] = None
+) -> AsyncIterator[List[Product]]:
+    """Permite que varios consumidores compartan el mismo flujo de lotes.
+    
+    Los lotes devueltos a ``requeued`` por un flujo caído se entregan
+    antes que los nuevos.
+    """
+    while True:
+        if requeued:
+            batch = requeued.popleft()
+        else:
+            async with lock:
+                batch = await anext(batches, None)
+        if batch is None:
+            return
+        yield batch
+
 
 class ElasticsearchService:
     """Servicio para operaciones con Elasticsearch."""
@@ -27,14 +88,50 @@ class ElasticsearchService:
         self.es_client = AsyncElasticsearch(
             hosts=[settings.elasticsearch_url],
             request_timeout=settings.search_timeout,
+            # Cada flujo bulk ocupa una conexión: que no dejen sin pool a
+            # las búsquedas concurrentes
+            connections_per_node=max(settings.es_pool_size, settings.sync_concurrency * 2),
+            retry_on_timeout=True,
+            max_retries=3,
+            http_compress=True,
+            # orjson serializa los vectores (arrays numpy incluidos) mucho más
+            # rápido que json; las líneas NDJSON del bulk salen de aquí
+            serializers={"application/json": OrjsonSerializer()},
         )
         self.index_name = settings.index_name
         self.embedding_service = get_embedding_service()
+        # Cache de categorías: (timestamp monotónico, categorías)
+        self._cats_cache: Optional[Tuple[float, List[CategoryInfo]]] = None
+        # Cache de estadísticas del índice: (timestamp monotónico, stats)
+        self._stats_cache: Optional[Tuple[float, Dict[str, Any]]] = None
+        # Generación de los caches: una consulta iniciada antes de una
+        # invalidación no guarda su resultado (ya podría estar obsoleto)
+        self._cache_generation = 0
+        # Búsquedas en curso o recientes, compartidas entre peticiones idénticas
+        self._inflight: Dict[tuple, asyncio.Task] = {}
+        # Existencia del índice conocida por este proceso (None = sin comprobar)
+        self._index_exists: Optional[bool] = None
+        # Conexión verificada y mapping aplicado (ver ensure_ready)
+        self._ready = asyncio.Event()
+        self._ready_lock = asyncio.Lock()
+        self._ready_retry: Optional[asyncio.Task] = None
+        # Cargas bulk activas y ajustes del índice a restaurar al acabar la última
+        self._bulk_loads = 0
+        self._bulk_lock = asyncio.Lock()
+        self._saved_settings: Optional[Dict[str, Any]] = None
     
     async def close(self):
         """Cierra la conexión con Elasticsearch."""
+        if self._ready_retry is not None:
+            self._ready_retry.cancel()
         await self.es_client.close()
     
+    def _invalidate_caches(self) -> None:
+        """Descarta categorías y estadísticas cacheadas tras cambiar el índice."""
+        self._cats_cache = None
+        self._stats_cache = None
+        self._cache_generation += 1
+    
     async def check_connection(self) -> dict:
         """Verifica la conexión y estado del cluster."""
         try:
@@ -54,10 +151,77 @@ class ElasticsearchService:
                 "error": str(e)
             }
     
-    async def create_index(self) -> bool:
-        """Crea el índice con el mapping correcto."""
-        mapping = {
+    async def ensure_ready(self) -> bool:
+        """Verifica la conexión y crea el índice antes de servir tráfico.
+        
+        Evita que búsquedas o indexaciones lleguen antes de aplicar el
+        mapping (Elasticsearch crearía el índice con mapping dinámico). Tras
+        el primer éxito no hace ninguna petición.
+        """
+        if self._ready.is_set():
+            return True
+        
+        async with self._ready_lock:
+            if self._ready.is_set():
+                return True
+            
+            health = await self.check_connection()
+            if health["status"] != "up" or not await self.create_index():
+                return False
+            
+            self._ready.set()
+            return True
+    
+    async def retry_until_ready(self) -> None:
+        """Reintenta ``ensure_ready`` hasta que Elasticsearch responda.
+        
+        Las búsquedas no sondean el cluster: fallan con 503 hasta que esto termina.
+        """
+        while True:
+            await asyncio.sleep(READY_RETRY_S)
+            try:
+                if await self.ensure_ready():
+                    logger.info("Elasticsearch disponible: índice listo")
+                    return
+            except Exception as e:
+                logger.debug("Elasticsearch sigue sin responder: %s", e)
+    
+    def _schedule_ready_retry(self) -> None:
+        """Lanza ``retry_until_ready`` en segundo plano si no está ya en curso."""
+        if self._ready_retry is None or self._ready_retry.done():
+            self._ready_retry = asyncio.create_task(self.retry_until_ready())
+    
+    def _to_index_vectors(self, vectors):
+        """Adapta embeddings al element_type del índice (int8 si es "byte")."""
+        if settings.embedding_element_type == "byte":
+            quantized = quantize_int8(vectors)
+            return quantized.tolist() if isinstance(vectors, list) else quantized
+        return vectors
+    
+    def _vector_index_options(self) -> Dict[str, Any]:
+        """Opciones HNSW del campo embedding.
+        
+        Por defecto ``hnsw`` (ES 8.11+). Con vectores float puede optarse por
+        ``int8_hnsw`` (ES 8.12+), que cuantiza en el servidor y guarda el
+        grafo en int8 (4x menos memoria). Los vectores "byte" ya son int8 y
+        solo admiten ``hnsw``.
+        """
+        index_type = settings.vector_index_type
+        if settings.embedding_element_type == "byte":
+            index_type = "hnsw"
+        return {"type": index_type, "m": 16, "ef_construction": 100}
+    
+    def _index_definition(self) -> Dict[str, Any]:
+        """Mapping y settings del índice de productos.
+        
+        El vector no se guarda en ``_source`` (solo en la estructura HNSW):
+        los hits no lo cargan ni lo parsean, pero un ``_reindex`` desde este
+        índice no puede copiarlo; reconstruir con ``force_reindex``, que
+        vuelve a generar los embeddings.
+        """
+        return {
             "mappings": {
+                "_source": {"excludes": ["embedding"]},
                 "properties": {
                     "id": {"type": "keyword"},
                     "name": {
@@ -78,14 +242,22 @@ class ElasticsearchService:
                     "embedding": {
                         "type": "dense_vector",
                         "dims": 384,
+                        "element_type": settings.embedding_element_type,
                         "index": True,
-                        "similarity": "cosine"
+                        # Con vectores unitarios dot_product equivale a cosine sin
+                        # calcular normas; los int8 escalados por fila no son
+                        # unitarios y siguen usando cosine
+                        "similarity": (
+                            "cosine" if settings.embedding_element_type == "byte" else "dot_product"
+                        ),
+                        "index_options": self._vector_index_options()
                     },
                     "created_at": {"type": "date"},
                     "updated_at": {"type": "date"}
                 }
             },
             "settings": {
+                "refresh_interval": settings.index_refresh_interval,
                 "analysis": {
                     "analyzer": {
                         "spanish": {
@@ -102,6 +274,16 @@ class ElasticsearchService:
                 }
             }
         }
+    
+    async def create_index(self) -> bool:
+        """Crea el índice con el mapping correcto.
+        
+        Si este proceso ya creó o encontró el índice no vuelve a consultar
+        su existencia; los borrados se hacen con ``delete_index`` o
+        ``recreate_index``, que mantienen el dato al día.
+        """
+        if self._index_exists:
+            return True
         
         try:
             # Verificar si el índice ya existe
@@ -109,14 +291,16 @@ class ElasticsearchService:
             
             if exists:
                 logger.info(f"Índice {self.index_name} ya existe")
+                self._index_exists = True
                 return True
             
             # Crear el índice
             logger.info(f"Creando índice {self.index_name}")
             await self.es_client.indices.create(
                 index=self.index_name,
-                body=mapping
+                body=self._index_definition()
             )
+            self._index_exists = True
             
             logger.info(f"Índice {self.index_name} creado exitosamente")
             return True
@@ -125,14 +309,47 @@ class ElasticsearchService:
             logger.error(f"Error creando índice: {str(e)}")
             return False
     
+    async def recreate_index(self) -> bool:
+        """Elimina y vuelve a crear el índice sin consultas de existencia previas."""
+        self._index_exists = None
+        self._ready.clear()
+        try:
+            await self.es_client.indices.delete(
+                index=self.index_name,
+                ignore_unavailable=True
+            )
+            self._invalidate_caches()
+            
+            logger.info(f"Recreando índice {self.index_name}")
+            await self.es_client.indices.create(
+                index=self.index_name,
+                body=self._index_definition()
+            )
+            self._index_exists = True
+            # El mapping recién aplicado deja el servicio listo de nuevo
+            self._ready.set()
+            
+            logger.info(f"Índice {self.index_name} recreado exitosamente")
+            return True
+            
+        except Exception as e:
+            logger.error(f"Error recreando índice: {str(e)}")
+            # Sin índice preparado las búsquedas fallan con 503; se vuelve a
+            # aplicar el mapping en segundo plano en cuanto el cluster responda
+            self._schedule_ready_retry()
+            return False
+    
     async def delete_index(self) -> bool:
-        """Elimina el índice completo."""
+        """Elimina el índice completo (sin consultar antes si existe)."""
+        self._index_exists = None
+        self._ready.clear()
         try:
-            exists = await self.es_client.indices.exists(index=self.index_name)
-            if not exists:
-                return True
-                
-            await self.es_client.indices.delete(index=self.index_name)
+            await self.es_client.indices.delete(
+                index=self.index_name,
+                ignore_unavailable=True
+            )
+            self._index_exists = False
+            self._invalidate_caches()
             logger.info(f"Índice {self.index_name} eliminado")
             return True
             
@@ -142,12 +359,18 @@ class ElasticsearchService:
     
     async def index_product(self, product: Product) -> bool:
         """Indexa un producto individual."""
+        if not await self.ensure_ready():
+            logger.error(f"Elasticsearch no disponible: producto {product.id} sin indexar")
+            return False
+        
         try:
             # Generar embedding
             text_for_embedding = self.embedding_service.prepare_product_text(
                 product.name, product.description
             )
-            embedding = await self.embedding_service.generate_embedding(text_for_embedding)
+            embedding = self._to_index_vectors(
+                await self.embedding_service.generate_embedding_array(text_for_embedding)
+            )
             
             # Crear documento
             doc = ProductDocument.from_product(product, embedding)
@@ -156,7 +379,7 @@ class ElasticsearchService:
             await self.es_client.index(
                 index=self.index_name,
                 id=product.id,
-                body=doc.dict()
+                body=doc.model_dump()
             )
             
             return True
@@ -165,100 +388,334 @@ class ElasticsearchService:
             logger.error(f"Error indexando producto {product.id}: {str(e)}")
             return False
     
-    async def index_products_batch(self, products: List[Product]) -> Dict[str, int]:
-        """Indexa múltiples productos usando bulk API."""
+    @asynccontextmanager
+    async def bulk_load_mode(self):
+        """Aplica los ajustes de carga bulk al índice mientras dura el bloque.
+        
+        Las cargas concurrentes comparten el modo: la primera lee los ajustes
+        actuales y los cambia, y la última en salir restaura esos valores
+        (``None`` si no estaban fijados, que vuelve al valor por defecto).
+        Es una optimización: si el cluster rechaza los ajustes (p. ej. un
+        servicio gestionado sin control de réplicas) se indexa igualmente.
+        """
+        async with self._bulk_lock:
+            if self._bulk_loads == 0:
+                self._saved_settings = await self._enter_bulk_settings()
+            self._bulk_loads += 1
+        try:
+            yield
+        finally:
+            async with self._bulk_lock:
+                self._bulk_loads -= 1
+                if self._bulk_loads == 0 and self._saved_settings is not None:
+                    await self._put_index_settings(self._saved_settings)
+                    self._saved_settings = None
+    
+    async def _enter_bulk_settings(self) -> Optional[Dict[str, Any]]:
+        """Guarda los ajustes actuales y aplica los de carga bulk.
+        
+        Sin poder leerlos no se cambia nada: no habría qué restaurar.
+        """
+        try:
+            response = await self.es_client.indices.get_settings(
+                index=self.index_name,
+                flat_settings=True
+            )
+            current = response[next(iter(response))]["settings"]
+        except Exception as e:
+            logger.warning("No se pudieron leer los ajustes del índice: %s", e)
+            return None
+        
+        saved = {key: current.get(f"index.{key}") for key in BULK_LOAD_SETTINGS}
+        if not await self._put_index_settings(BULK_LOAD_SETTINGS):
+            return None
+        return saved
+    
+    async def _put_index_settings(self, index_settings: Dict[str, Any]) -> bool:
+        """Aplica ajustes dinámicos al índice; un fallo solo se registra."""
+        try:
+            await self.es_client.indices.put_settings(
+                index=self.index_name,
+                settings={"index": index_settings}
+            )
+            return True
+        except Exception as e:
+            logger.warning("No se pudieron aplicar los ajustes de carga bulk: %s", e)
+            return False
+    
+    async def refresh_for_read(self) -> None:
+        """Hace visibles de inmediato los documentos indexados.
+        
+        Las indexaciones no refrescan el índice (crearía segmentos pequeños
+        en cada carga); lo invoca quien necesita leer justo después.
+        """
+        await self.es_client.indices.refresh(index=self.index_name)
+    
+    async def index_products_batch(
+        self,
+        products: List[Product],
+        max_chunk_bytes: Optional[int] = None
+    ) -> Dict[str, int]:
+        """Indexa múltiples productos usando bulk API.
+        
+        La lista se reparte en ``sync_concurrency`` lotes que se indexan en
+        paralelo con el mismo camino que la sincronización en streaming.
+        Los documentos son visibles tras el ``refresh_interval`` del índice
+        o tras ``refresh_for_read``.
+        """
         if not products:
             return {"indexed": 0, "errors": 0}
         
-        logger.info(f"Preparando indexación batch de {len(products)} productos")
+        logger.debug("Preparando indexación batch de %d productos", len(products))
         
-        try:
-            # Generar embeddings para todos los productos
-            texts = [
-                self.embedding_service.prepare_product_text(p.name, p.description)
-                for p in products
-            ]
-            
-            embeddings = await self.embedding_service.generate_embeddings(texts)
-            
-            # Preparar bulk operations
-            bulk_body = []
-            
-            for product, embedding in zip(products, embeddings):
-                # Action header
-                bulk_body.append({
-                    "index": {
+        workers = max(1, settings.sync_concurrency)
+        batch_size = min(settings.sync_batch_size, -(-len(products) // workers))
+        
+        return await self.bulk_index(
+            _aiter(products),
+            batch_size=batch_size,
+            max_chunk_bytes=max_chunk_bytes
+        )
+    
+    async def bulk_index(
+        self,
+        products: AsyncIterable[Product],
+        batch_size: Optional[int] = None,
+        max_chunk_bytes: Optional[int] = None,
+        forcemerge: bool = False,
+        bulk_load: bool = False
+    ) -> Dict[str, int]:
+        """Indexa un catálogo completo en streaming con los helpers bulk.
+        
+        Los productos se consumen a medida que llegan, en lotes de
+        ``sync_batch_size`` que se reparten entre ``sync_concurrency``
+        flujos bulk concurrentes, sin materializar el catálogo en memoria.
+        
+        El trabajo de CPU de cada lote es la inferencia del modelo, que ya
+        corre en el executor (torch libera el GIL) y se solapa entre flujos;
+        los documentos se construyen sin revalidar, así que un pool de
+        procesos solo añadiría el coste de serializar lotes y vectores.
+        
+        Con ``bulk_load`` (cargas completas del catálogo) el índice no se
+        refresca ni replica durante la carga (``bulk_load_mode``); con
+        ``forcemerge`` se compacta a un segmento al terminar, útil tras
+        reconstruir el índice completo.
+        
+        Lanza ``ConnectionError`` si el cluster no está disponible o el
+        índice no se pudo preparar, igual que la búsqueda.
+        """
+        if not await self.ensure_ready():
+            raise ESConnectionError("Elasticsearch no disponible o índice sin preparar")
+        
+        batch_size = batch_size or settings.sync_batch_size
+        batches = _batched(products, batch_size)
+        lock = asyncio.Lock()
+        requeued: Deque[List[Product]] = deque()
+        
+        async with self.bulk_load_mode() if bulk_load else nullcontext():
+            results = await asyncio.gather(*(
+                self._bulk_shard(_locked(batches, lock, requeued), batch_size, max_chunk_bytes, requeued)
+                for _ in range(max(1, settings.sync_concurrency))
+            ))
+            
+            # Lotes devueltos cuando el resto de flujos ya había terminado
+            while requeued:
+                result = await self._bulk_shard(
+                    _locked(batches, lock, requeued), batch_size, max_chunk_bytes, requeued
+                )
+                results.append(result)
+                if result["indexed"] == 0:
+                    # Sin progreso: el cluster rechaza todo, no insistir
+                    results.append({"indexed": 0, "errors": sum(len(b) for b in requeued)})
+                    requeued.clear()
+        
+        indexed = sum(r["indexed"] for r in results)
+        errors = sum(r["errors"] for r in results)
+        
+        logger.info(f"Indexación bulk completada: {indexed} indexados, {errors} errores")
+        
+        if forcemerge:
+            # Sin esperar: la fusión continúa en el cluster
+            await self.es_client.indices.forcemerge(
+                index=self.index_name,
+                max_num_segments=1,
+                wait_for_completion=False
+            )
+        self._invalidate_caches()
+        
+        return {"indexed": indexed, "errors": errors}
+    
+    async def _bulk_shard(
+        self,
+        batches: AsyncIterator[List[Product]],
+        chunk_size: Optional[int] = None,
+        max_chunk_bytes: Optional[int] = None,
+        requeue: Optional[Deque[List[Product]]] = None
+    ) -> Dict[str, int]:
+        """Indexa lotes del catálogo consumiendo el stream de resultados.
+        
+        Un productor genera los embeddings de los lotes siguientes mientras
+        el helper bulk espera la respuesta del chunk en vuelo, así que la
+        inferencia y la red se solapan también dentro de cada flujo.
+        
+        Si el flujo falla, los lotes leídos que aún no se enviaron se
+        devuelven a ``requeue`` para que los indexe otro flujo; sin
+        ``requeue`` cuentan como errores.
+        """
+        pending = 0
+        returned = 0
+        stopped = False
+        # Lotes ya codificados a la espera del bulk (acota la memoria)
+        ready: asyncio.Queue = asyncio.Queue(maxsize=PREFETCH_BATCHES)
+        
+        def give_back(batch: List[Product]) -> None:
+            nonlocal returned
+            if requeue is not None:
+                requeue.append(batch)
+                returned += len(batch)
+        
+        def drain() -> None:
+            while not ready.empty():
+                item = ready.get_nowait()
+                if isinstance(item, tuple):
+                    give_back(item[0])
+        
+        async def produce():
+            nonlocal pending
+            try:
+                # ``stopped`` se comprueba antes de leer: un flujo caído no
+                # saca del flujo compartido lotes que ya no indexará
+                while not stopped:
+                    batch = await anext(batches, None)
+                    if batch is None:
+                        break
+                    pending += len(batch)
+                    logger.debug("Procesando lote de %d productos", len(batch))
+                    
+                    texts = [
+                        self.embedding_service.prepare_product_text(p.name, p.description)
+                        for p in batch
+                    ]
+                    embeddings = self._to_index_vectors(
+                        await self.embedding_service.generate_embeddings_array(texts)
+                    )
+                    if stopped:
+                        give_back(batch)
+                        return
+                    await ready.put((batch, embeddings))
+            except Exception as e:
+                await ready.put(e)
+            else:
+                await ready.put(None)
+        
+        async def actions():
+            while (item := await ready.get()) is not None:
+                if isinstance(item, Exception):
+                    raise item
+                
+                batch, embeddings = item
+                for product, embedding in zip(batch, embeddings):
+                    yield {
+                        "_op_type": "index",
                         "_index": self.index_name,
-                        "_id": product.id
+                        "_id": product.id,
+                        "_source": ProductDocument.from_product(product, embedding).model_dump()
                     }
-                })
-                
-                # Document body
-                doc = ProductDocument.from_product(product, embedding)
-                bulk_body.append(doc.dict())
-            
-            # Ejecutar bulk operation
-            response = await self.es_client.bulk(body=bulk_body)
-            
-            # Procesar resultados
-            indexed = 0
-            errors = 0
-            
-            for item in response["items"]:
-                if "index" in item:
-                    if item["index"].get("status") in [200, 201]:
-                        indexed += 1
-                    else:
-                        errors += 1
-                        logger.warning(f"Error indexando: {item}")
-            
-            logger.info(f"Indexación batch completada: {indexed} indexados, {errors} errores")
-            
-            # Refresh index para búsquedas inmediatas
-            await self.es_client.indices.refresh(index=self.index_name)
-            
-            return {"indexed": indexed, "errors": errors}
-            
+        
+        producer = asyncio.create_task(produce())
+        failed = False
+        indexed = 0
+        errors = 0
+        
+        try:
+            async for ok, item in async_streaming_bulk(
+                self.es_client,
+                actions(),
+                chunk_size=chunk_size or settings.sync_batch_size,
+                max_chunk_bytes=max_chunk_bytes or settings.sync_max_chunk_bytes,
+                max_retries=settings.sync_max_retries,
+                initial_backoff=settings.sync_initial_backoff_s,
+                raise_on_error=False
+            ):
+                if ok:
+                    indexed += 1
+                else:
+                    errors += 1
+                    logger.warning(f"Error indexando: {item}")
         except Exception as e:
-            logger.error(f"Error en indexación batch: {str(e)}")
-            raise
+            logger.error(f"Error en indexación bulk: {str(e)}")
+            failed = True
+        finally:
+            # Parar el productor sin cancelarlo: cancelar a mitad de lectura
+            # rompería el flujo de lotes que comparten los demás workers.
+            # Vaciar la cola libera un put bloqueado; luego sale por
+            # ``stopped`` y se recoge lo que llegó a encolar
+            stopped = True
+            drain()
+            await producer
+            drain()
+        
+        if failed:
+            # Los productos leídos que no se devolvieron ni se indexaron
+            # (los del chunk fallido) cuentan como errores
+            errors = pending - indexed - returned
+        
+        return {"indexed": indexed, "errors": errors}
     
     async def search_products(self, search_request: SearchRequest) -> Dict[str, Any]:
+        """Realiza búsqueda semántica compartiendo peticiones idénticas.
+        
+        Las peticiones concurrentes con los mismos parámetros esperan una
+        única búsqueda, cuyo resultado se reutiliza durante
+        ``search_cache_ttl_s`` segundos. Los errores no se cachean.
+        """
+        key = (
+            search_request.query,
+            search_request.top_k,
+            search_request.category,
+            search_request.price_min,
+            search_request.price_max,
+            search_request.include_out_of_stock,
+        )
+        
+        task = self._inflight.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.ensure_future(self._search_products(search_request))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._expire_search(key, t))
+        
+        # shield: cancelar una petición no cancela la búsqueda compartida
+        return await asyncio.shield(task)
+    
+    def _expire_search(self, key: tuple, task: asyncio.Task) -> None:
+        """Retira una búsqueda terminada del mapa tras su TTL."""
+        def drop():
+            if self._inflight.get(key) is task:
+                del self._inflight[key]
+        
+        if task.cancelled() or task.exception() is not None or settings.search_cache_ttl_s <= 0:
+            drop()
+        else:
+            asyncio.get_running_loop().call_later(settings.search_cache_ttl_s, drop)
+    
+    async def _search_products(self, search_request: SearchRequest) -> Dict[str, Any]:
         """Realiza búsqueda semántica de productos."""
-        start_time = datetime.now()
+        start_ns = time.perf_counter_ns()
         
         try:
+            # Sin sondear el cluster en cada petición: ensure_ready corre en el
+            # arranque (y se reintenta en segundo plano); hasta entonces se
+            # falla de inmediato con error de conexión (503 en la ruta)
+            if not self._ready.is_set():
+                raise ESConnectionError("Elasticsearch no disponible o índice sin preparar")
+            
             # Generar embedding para la consulta
-            query_embedding = await self.embedding_service.generate_embedding(search_request.query)
-            
-            # Construir query de Elasticsearch (búsqueda híbrida)
-            query = {
-                "bool": {
-                    "should": [
-                        # Búsqueda semántica usando embeddings
-                        {
-                            "script_score": {
-                                "query": {"match_all": {}},
-                                "script": {
-                                    "source": "cosineSimilarity(params.query_vector, 'embedding') + 1.0",
-                                    "params": {"query_vector": query_embedding}
-                                }
-                            }
-                        },
-                        # Búsqueda textual tradicional (menor peso)
-                        {
-                            "multi_match": {
-                                "query": search_request.query,
-                                "fields": ["name^2", "description"],
-                                "fuzziness": "AUTO",
-                                "boost": 0.3
-                            }
-                        }
-                    ]
-                }
-            }
+            query_embedding = self._to_index_vectors(
+                await self.embedding_service.generate_query_embedding(search_request.query)
+            )
             
-            # Aplicar filtros
+            # Filtros: se aplican dentro del recorrido HNSW del kNN (pre-filtrado)
+            # y también a la parte textual de la búsqueda híbrida
             filters = []
             
             if search_request.category:
@@ -273,44 +730,65 @@ class ElasticsearchService:
             if not search_request.include_out_of_stock:
                 filters.append({"range": {"stock": {"gt": 0}}})
             
-            if filters:
-                query = {
-                    "bool": {
-                        "must": [query],
-                        "filter": filters
-                    }
+            # Búsqueda textual tradicional (menor peso)
+            text_query = {
+                "multi_match": {
+                    "query": search_request.query,
+                    "fields": ["name^2", "description"],
+                    "fuzziness": "AUTO",
+                    "boost": 0.3
                 }
+            }
+            if filters:
+                text_query = {"bool": {"must": [text_query], "filter": filters}}
+            
+            # Búsqueda semántica con kNN nativo (HNSW) en lugar de recorrer
+            # todos los documentos con script_score
+            knn = {
+                "field": "embedding",
+                "query_vector": query_embedding,
+                "k": search_request.top_k,
+                "num_candidates": min(
+                    max(settings.knn_num_candidates, search_request.top_k * 10),
+                    MAX_NUM_CANDIDATES
+                )
+            }
+            if filters:
+                knn["filter"] = filters
             
-            # Ejecutar búsqueda
-            response = await self.es_client.search(
+            # Búsqueda híbrida (ordena por la suma de ambas partes, sin cota) y,
+            # en la misma petición, el mismo kNN solo: su score es la parte
+            # semántica de cada hit, (1 + similitud) / 2 en [0, 1]. ES 8.11 no
+            # expone el score de cada parte en la respuesta híbrida
+            responses = (await self.es_client.msearch(
                 index=self.index_name,
-                body={
-                    "query": query,
-                    "size": search_request.top_k,
-                    "_source": {
-                        "excludes": ["embedding"]  # No devolver el vector embedding
-                    }
-                }
-            )
+                searches=[
+                    {},
+                    {"knn": knn, "query": text_query, "size": search_request.top_k},
+                    {},
+                    {"knn": knn, "size": search_request.top_k, "_source": False}
+                ]
+            ))["responses"]
+            for item in responses:
+                if "error" in item:
+                    raise RuntimeError(f"Error en msearch: {item['error']}")
+            response, knn_response = responses
+            semantic = {hit["_id"]: hit["_score"] for hit in knn_response["hits"]["hits"]}
             
             # Procesar resultados
             results = []
             for hit in response["hits"]["hits"]:
-                source = hit["_source"]
-                score = hit["_score"]
-                
-                # Normalizar score (el script_score puede dar valores altos)
-                normalized_score = min(max(score / 2.0, 0.0), 1.0)
-                
+                # Fuera del top-k del kNN el hit solo coincide por texto
+                # La relevancia se deriva del score semántico (computed_field)
                 product_with_score = ProductWithScore(
-                    **source,
-                    score_semantico=normalized_score,
-                    relevancia=""  # Se calculará automáticamente en el validator
+                    **hit["_source"],
+                    score_semantico=semantic.get(hit["_id"], 0.0),
+                    score_hibrido=hit["_score"]
                 )
                 results.append(product_with_score)
             
             # Calcular tiempo de búsqueda
-            search_time = int((datetime.now() - start_time).total_seconds() * 1000)
+            search_time = (time.perf_counter_ns() - start_ns) // 1_000_000
             
             # Preparar información de filtros aplicados
             filters_applied = SearchFilters(
@@ -345,8 +823,20 @@ class ElasticsearchService:
             raise
     
     async def get_categories(self) -> List[CategoryInfo]:
-        """Obtiene las categorías disponibles con conteos."""
+        """Obtiene las categorías disponibles con conteos.
+        
+        El resultado se cachea en memoria durante ``categories_ttl_s``
+        segundos y se invalida al indexar o eliminar el índice.
+        """
+        if self._cats_cache is not None:
+            cached_at, cached = self._cats_cache
+            if time.monotonic() - cached_at < settings.categories_ttl_s:
+                return cached
+        
+        generation = self._cache_generation
         try:
+            # Pocas categorías: "map" agrega directamente sobre los valores
+            # sin construir ordinales globales
             response = await self.es_client.search(
                 index=self.index_name,
                 body={
@@ -355,7 +845,8 @@ class ElasticsearchService:
                         "categories": {
                             "terms": {
                                 "field": "category",
-                                "size": 100
+                                "size": 100,
+                                "execution_hint": "map"
                             }
                         }
                     }
@@ -371,6 +862,8 @@ class ElasticsearchService:
                     count=bucket["doc_count"]
                 ))
             
+            if generation == self._cache_generation:
+                self._cats_cache = (time.monotonic(), categories)
             return categories
             
         except Exception as e:
@@ -378,7 +871,17 @@ class ElasticsearchService:
             return []
     
     async def get_index_stats(self) -> Dict[str, Any]:
-        """Obtiene estadísticas del índice."""
+        """Obtiene estadísticas del índice.
+        
+        Las estadísticas válidas se cachean durante ``stats_ttl_s`` segundos
+        (health checks y dashboards las consultan con frecuencia).
+        """
+        if self._stats_cache is not None:
+            cached_at, cached = self._stats_cache
+            if time.monotonic() - cached_at < settings.stats_ttl_s:
+                return dict(cached)
+        
+        generation = self._cache_generation
         try:
             # Estadísticas básicas del índice
             stats = await self.es_client.indices.stats(index=self.index_name)
@@ -387,13 +890,16 @@ class ElasticsearchService:
             # Conteo de documentos
             count_response = await self.es_client.count(index=self.index_name)
             
-            return {
+            result = {
                 "total_productos": count_response["count"],
                 "index_size_mb": round(
                     index_stats["total"]["store"]["size_in_bytes"] / (1024 * 1024), 2
                 ),
                 "last_sync": None  # Esto se puede almacenar en un documento especial
             }
+            if generation == self._cache_generation:
+                self._stats_cache = (time.monotonic(), result)
+            return dict(result)
             
         except Exception as e:
             logger.error(f"Error obteniendo estadísticas: {str(e)}")
@@ -404,13 +910,25 @@ class ElasticsearchService:
             }
 
 
-# Singleton global
-_elasticsearch_service = None
-
-
+@lru_cache(maxsize=1)
 def get_elasticsearch_service() -> ElasticsearchService:
-    """Obtiene la instancia singleton del servicio de Elasticsearch."""
-    global _elasticsearch_service
-    if _elasticsearch_service is None:
-        _elasticsearch_service = ElasticsearchService()
-    return _elasticsearch_service
\ No newline at end of file
+    """Obtiene la instancia singleton del servicio de Elasticsearch.
+    
+    Un único cliente por proceso reutiliza las conexiones HTTP entre
+    peticiones; se cierra una sola vez al apagar la aplicación.
+    """
+    return ElasticsearchService()
+
+async def close_elasticsearch_service() -> None:
+    """Cierra el cliente compartido y descarta el singleton.
+    
+    Una llamada posterior a ``get_elasticsearch_service`` (p. ej. otro
+    lifespan en el mismo proceso) crea un cliente nuevo en lugar de
+    reutilizar uno cerrado. Si nunca se creó, no hace nada.
+    """
+    if get_elasticsearch_service.cache_info().currsize == 0:
+        return
+    
+    service = get_elasticsearch_service()
+    get_elasticsearch_service.cache_clear()
+    await service.close()
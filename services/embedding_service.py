@@ -1,7 +1,11 @@
 """Servicio para generar embeddings semánticos."""
 import asyncio
-from typing import List, Union
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Union
 import numpy as np
+import torch
 
 from sentence_transformers import SentenceTransformer
 from config import get_settings
@@ -10,6 +14,38 @@ from utils.logger import get_logger
 settings = get_settings()
 logger = get_logger(__name__)
 
+_WHITESPACE = re.compile(r"\s+")
+# Un token rara vez supera estos caracteres: recortar el texto a
+# max_seq_length * _CHARS_PER_TOKEN no cambia lo que ve el modelo y evita
+# tokenizar descripciones enormes que el modelo truncaría de todos modos
+_CHARS_PER_TOKEN = 8
+_DEFAULT_MAX_TOKENS = 512
+
+
+def quantize_int8(vectors: np.ndarray) -> np.ndarray:
+    """Cuantiza cada vector a int8 escalando por su máximo absoluto.
+    
+    La similitud coseno no depende de la escala de cada vector, así que
+    una escala por fila conserva el ranking sin calibrar el modelo.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    scale = np.abs(vectors).max(axis=-1, keepdims=True)
+    scale[scale == 0] = 1.0
+    return np.rint(vectors / scale * 127).astype(np.int8)
+
+
+def _unit(vectors) -> np.ndarray:
+    """Convierte a float32 y reescala a norma 1.
+    
+    En GPU el modelo corre en FP16 y la normalización sale con error de
+    redondeo; ``dot_product`` exige vectores unitarios, así que se vuelve a
+    normalizar en float32.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
 
 class EmbeddingService:
     """Servicio para generar embeddings usando sentence-transformers."""
@@ -17,8 +53,14 @@ class EmbeddingService:
     def __init__(self):
         """Inicializa el servicio de embeddings."""
         self.model = None
-        self._loading = False
+        self.device = "cpu"
         self._load_lock = asyncio.Lock()
+        self._loaded = asyncio.Event()
+        # En GPU las inferencias se serializan en un único hilo; en CPU se
+        # usa el pool por defecto
+        self._executor = None
+        # LRU consulta → embedding: las búsquedas populares se repiten mucho
+        self._query_cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
     
     async def _load_model(self) -> None:
         """Carga el modelo de embeddings de forma lazy."""
@@ -26,107 +68,188 @@ class EmbeddingService:
             return
             
         async with self._load_lock:
-            # Double-check locking pattern
+            # Double-check locking pattern: quien esperaba el lock encuentra
+            # el modelo ya cargado
             if self.model is not None:
                 return
-                
-            if self._loading:
-                # Esperar hasta que termine de cargar
-                while self._loading:
-                    await asyncio.sleep(0.1)
-                return
-                
-            self._loading = True
             
             try:
                 logger.info(f"Cargando modelo de embeddings: {settings.embedding_model_name}")
                 
+                device = settings.embed_device or ("cuda" if torch.cuda.is_available() else "cpu")
+                
                 # Ejecutar en thread pool para no bloquear el event loop
                 loop = asyncio.get_event_loop()
-                self.model = await loop.run_in_executor(
+                model = await loop.run_in_executor(
                     None, 
-                    lambda: SentenceTransformer(settings.embedding_model_name)
+                    lambda: SentenceTransformer(settings.embedding_model_name, device=device)
                 )
                 
+                if device.startswith("cuda"):
+                    # FP16 en GPU; en CPU half() sería más lento
+                    model.half()
+                    self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+                self.device = device
+                self.model = model
+                self._query_cache.clear()
+                self._loaded.set()
+                
                 logger.info(
                     "Modelo cargado exitosamente",
                     extra={
                         "model_name": settings.embedding_model_name,
-                        "embedding_dimension": self.model.get_sentence_embedding_dimension()
+                        "embedding_dimension": self.model.get_sentence_embedding_dimension(),
+                        "device": device
                     }
                 )
                 
             except Exception as e:
                 logger.error(f"Error cargando modelo: {str(e)}")
                 raise
-            finally:
-                self._loading = False
     
-    async def generate_embedding(self, text: str) -> List[float]:
-        """Genera embedding para un texto único."""
+    def _batch_size(self) -> int:
+        """Tamaño de lote del modelo (mayor en GPU)."""
+        if settings.embed_batch_size > 0:
+            return settings.embed_batch_size
+        return 256 if self.device.startswith("cuda") else 32
+    
+    async def _encode(self, texts, **kwargs):
+        """Ejecuta ``model.encode`` fuera del event loop y sin autograd."""
+        def encode():
+            with torch.inference_mode():
+                return self.model.encode(texts, **kwargs)
+        
+        return await asyncio.get_event_loop().run_in_executor(self._executor, encode)
+    
+    async def wait_loaded(self, timeout: float) -> bool:
+        """Espera a que termine una carga del modelo en curso.
+        
+        Retorna False si el modelo no queda cargado en ``timeout`` segundos
+        (también si la carga falla). Si no hay ninguna carga en curso retorna
+        True de inmediato (el modelo se cargará de forma lazy como siempre).
+        """
+        if self.model is not None or not self._load_lock.locked():
+            return True
+        
+        try:
+            await asyncio.wait_for(self._loaded.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+    
+    async def warmup(self) -> None:
+        """Carga el modelo y ejecuta una inferencia para dejarlo listo."""
+        if settings.embed_threads > 0:
+            # Limitar hilos de torch para no competir con el event loop
+            torch.set_num_threads(settings.embed_threads)
+        
+        await self._load_model()
+        
+        await self._encode(["warmup"], convert_to_tensor=False)
+        logger.info("Modelo de embeddings precalentado")
+    
+    async def generate_embedding_array(self, text: str) -> np.ndarray:
+        """Genera el embedding de un texto único como vector float32 (D,)."""
         await self._load_model()
         
         try:
-            # Ejecutar en thread pool para no bloquear
-            loop = asyncio.get_event_loop()
-            embedding = await loop.run_in_executor(
-                None,
-                lambda: self.model.encode(text, convert_to_tensor=False)
-            )
-            
-            # Convertir a lista de floats
-            if isinstance(embedding, np.ndarray):
-                embedding = embedding.tolist()
+            # Vectores unitarios para la similitud dot_product del índice
+            embedding = await self._encode(text, convert_to_tensor=False, normalize_embeddings=True)
             
             logger.debug(f"Embedding generado para texto de {len(text)} caracteres")
-            return embedding
+            return _unit(embedding)
             
         except Exception as e:
             logger.error(f"Error generando embedding: {str(e)}")
             raise
     
-    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Genera embeddings para múltiples textos de forma batch."""
+    async def generate_embedding(self, text: str) -> List[float]:
+        """Genera embedding para un texto único."""
+        # Convertir a lista de floats
+        return (await self.generate_embedding_array(text)).tolist()
+    
+    async def generate_query_embedding(self, query: str) -> np.ndarray:
+        """Embedding de una consulta de búsqueda con cache LRU.
+        
+        El modelo es determinista, así que las consultas repetidas no se
+        vuelven a codificar. El vector devuelto se comparte y es de solo
+        lectura.
+        """
+        key = query.strip()
+        cache = self._query_cache
+        
+        embedding = cache.get(key)
+        if embedding is not None:
+            cache.move_to_end(key)
+            return embedding
+        
+        embedding = await self.generate_embedding_array(key)
+        embedding.flags.writeable = False
+        
+        if settings.query_cache_size > 0:
+            cache[key] = embedding
+            if len(cache) > settings.query_cache_size:
+                cache.popitem(last=False)
+        return embedding
+    
+    async def generate_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """Genera embeddings batch como matriz float32 (N, D) de norma 1.
+        
+        Evita convertir cada vector a lista de floats de Python; el cliente
+        de Elasticsearch serializa los arrays directamente con orjson.
+        """
         await self._load_model()
         
         if not texts:
-            return []
+            return np.empty((0, self.model.get_sentence_embedding_dimension()), dtype=np.float32)
             
         try:
-            logger.info(f"Generando embeddings para {len(texts)} textos")
+            # Los textos repetidos (variantes, multi-SKU) se codifican una vez
+            positions: Dict[str, int] = {}
+            inverse = [positions.setdefault(text, len(positions)) for text in texts]
+            unique = list(positions)
             
-            # Ejecutar en thread pool para no bloquear
-            loop = asyncio.get_event_loop()
-            embeddings = await loop.run_in_executor(
-                None,
-                lambda: self.model.encode(texts, convert_to_tensor=False, batch_size=32)
-            )
+            logger.debug("Generando embeddings para %d textos (%d únicos)", len(texts), len(unique))
             
-            # Convertir a lista de listas de floats
-            if isinstance(embeddings, np.ndarray):
-                embeddings = embeddings.tolist()
+            embeddings = _unit(
+                await self._encode(
+                    unique,
+                    convert_to_tensor=False,
+                    batch_size=self._batch_size(),
+                    normalize_embeddings=True
+                )
+            )
+            if len(unique) < len(texts):
+                embeddings = embeddings[inverse]
             
-            logger.info(f"Embeddings generados exitosamente para {len(texts)} textos")
+            logger.debug("Embeddings generados exitosamente para %d textos", len(texts))
             return embeddings
             
         except Exception as e:
             logger.error(f"Error generando embeddings batch: {str(e)}")
             raise
     
+    async def generate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Genera embeddings para múltiples textos de forma batch."""
+        if not texts:
+            return []
+        
+        # Convertir a lista de listas de floats
+        return (await self.generate_embeddings_array(texts)).tolist()
+    
     def prepare_product_text(self, name: str, description: str) -> str:
-        """Prepara el texto del producto para generar embedding."""
-        # Combinar nombre y descripción para mejor contexto semántico
-        combined_text = f"{name}. {description}"
+        """Prepara el texto del producto para generar embedding.
         
-        # Limpiar y normalizar el texto
-        combined_text = combined_text.strip()
+        El límite real es de tokens y lo aplica el modelo (``max_seq_length``);
+        aquí solo se acota el texto para no tokenizar caracteres que nunca
+        llegarían al modelo.
+        """
+        # Combinar nombre y descripción para mejor contexto semántico y
+        # colapsar saltos de línea y espacios repetidos
+        combined_text = _WHITESPACE.sub(" ", f"{name}. {description}").strip()
         
-        # Limitar longitud para evitar textos muy largos
-        max_length = 512  # Límite común para modelos de transformers
-        if len(combined_text) > max_length:
-            combined_text = combined_text[:max_length-3] + "..."
-            
-        return combined_text
+        max_tokens = getattr(self.model, "max_seq_length", None) or _DEFAULT_MAX_TOKENS
+        return combined_text[:max_tokens * _CHARS_PER_TOKEN]
     
     async def get_model_info(self) -> dict:
         """Obtiene información sobre el modelo cargado."""
@@ -136,6 +259,7 @@ class EmbeddingService:
             "model_name": settings.embedding_model_name,
             "embedding_dimension": self.model.get_sentence_embedding_dimension(),
             "max_seq_length": getattr(self.model, 'max_seq_length', 'unknown'),
+            "device": self.device,
             "is_loaded": self.model is not None
         }
 
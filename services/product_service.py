@@ -1,16 +1,40 @@
 """Servicio para interactuar con la API de productos externa."""
 import asyncio
-from typing import List, Optional
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Set, Tuple
 from datetime import datetime
 
 import httpx
+import orjson
+from pydantic import TypeAdapter, ValidationError
+
 from config import get_settings
 from models.schemas import Product
 from utils.logger import get_logger
 
+try:
+    import h2  # noqa: F401  (HTTP/2 de httpx es opcional)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
 settings = get_settings()
 logger = get_logger(__name__)
 
+# Ventana y tamaño máximo con que se agrupan las consultas por ID
+COALESCE_WINDOW_S = 0.02
+COALESCE_MAX_BATCH = 64
+
+# Respuestas transitorias que se reintentan con backoff exponencial y jitter
+RETRY_STATUSES = frozenset({429, 503})
+RETRY_BASE_BACKOFF_S = 0.1
+RETRY_MAX_BACKOFF_S = 2.0
+
+# Validador compilado de una página completa de productos
+_PRODUCT_LIST = TypeAdapter(List[Product])
+
 
 class ProductService:
     """Servicio para obtener productos de la API externa."""
@@ -19,41 +43,176 @@ class ProductService:
         """Inicializa el servicio de productos."""
         self.base_url = settings.productos_api_url.rstrip('/')
         self.timeout = settings.sync_timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        # Peticiones en vuelo acotadas al tamaño del pool de conexiones
+        self._sem = asyncio.Semaphore(settings.productos_api_max_connections)
+        # Cache TTL + LRU: clave -> (instante de la descarga, valor)
+        self._cache: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._refreshing: Dict[Hashable, asyncio.Task] = {}
+        # Consultas por ID pendientes de la próxima tanda
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._batcher: Optional[asyncio.Task] = None
+        self._flushes: Set[asyncio.Task] = set()
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """Devuelve el cliente HTTP compartido, creándolo en el primer uso.
+        
+        Un solo pool keep-alive para todas las llamadas evita un handshake
+        TCP (y TLS) por petición; con HTTP/2 (negociado por ALPN en https)
+        las páginas concurrentes comparten además una sola conexión.
+        """
+        if self._client is None or self._client.is_closed:
+            if settings.productos_api_http2 and not HTTP2_AVAILABLE:
+                logger.warning("HTTP/2 solicitado pero el paquete h2 no está instalado; se usa HTTP/1.1")
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                http2=settings.productos_api_http2 and HTTP2_AVAILABLE,
+                limits=httpx.Limits(
+                    max_connections=settings.productos_api_max_connections,
+                    max_keepalive_connections=settings.productos_api_max_keepalive
+                )
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """Cierra el cliente HTTP compartido si se llegó a crear."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+    
+    async def _get(self, path: str, **kwargs) -> httpx.Response:
+        """GET a la API acotando la concurrencia y reintentando 429/503.
+        
+        La espera entre intentos no ocupa el semáforo.
+        """
+        client = self._get_client()
+        max_retries = settings.productos_api_max_retries
+        for attempt in range(max_retries + 1):
+            async with self._sem:
+                response = await client.get(path, **kwargs)
+            if response.status_code not in RETRY_STATUSES or attempt == max_retries:
+                return response
+            
+            delay = random.uniform(0, min(RETRY_MAX_BACKOFF_S, RETRY_BASE_BACKOFF_S * 2 ** attempt))
+            logger.debug(
+                "Respuesta %d de la API de productos, reintento en %.2fs",
+                response.status_code, delay
+            )
+            await asyncio.sleep(delay)
+    
+    async def _cached(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        """Devuelve ``fetch()`` cacheado con TTL y expulsión LRU.
+        
+        Pasada la mitad del TTL se sirve el valor cacheado y se refresca en
+        segundo plano (stale-while-revalidate). ``None`` y los errores no se
+        cachean.
+        """
+        ttl = settings.productos_cache_ttl_s
+        if ttl <= 0:
+            return await fetch()
+        
+        entry = self._cache.get(key)
+        if entry is not None:
+            fetched_at, value = entry
+            age = time.monotonic() - fetched_at
+            if age < ttl:
+                self._cache.move_to_end(key)
+                if age > ttl / 2 and key not in self._refreshing:
+                    self._refreshing[key] = asyncio.create_task(self._refresh(key, fetch))
+                return value
+            del self._cache[key]
+        
+        value = await fetch()
+        self._store(key, value)
+        return value
+    
+    def _store(self, key: Hashable, value: Any) -> None:
+        """Guarda un valor en el cache expulsando los menos usados."""
+        if value is None:
+            return
+        self._cache[key] = (time.monotonic(), value)
+        self._cache.move_to_end(key)
+        while len(self._cache) > settings.productos_cache_size:
+            self._cache.popitem(last=False)
+    
+    async def _refresh(self, key: Hashable, fetch: Callable[[], Awaitable[Any]]) -> None:
+        """Recarga una entrada en segundo plano; si falla se conserva la anterior."""
+        try:
+            value = await fetch()
+            # Una invalidación durante la descarga gana al refresco
+            if key in self._cache:
+                self._store(key, value)
+        except Exception as e:
+            logger.debug(f"Error refrescando cache de productos {key}: {str(e)}")
+        finally:
+            self._refreshing.pop(key, None)
+    
+    def invalidate(self, product_id: Optional[str] = None) -> None:
+        """Descarta del cache un producto (y las páginas) o, sin ID, todo."""
+        if product_id is None:
+            self._cache.clear()
+            return
         
+        # Cualquier página puede contener el producto modificado
+        for key in [k for k in self._cache if k[0] == "page"]:
+            del self._cache[key]
+        self._cache.pop(("id", product_id), None)
+    
     async def get_products(
         self, 
         skip: int = 0, 
         limit: int = 100, 
         timeout: Optional[int] = None
     ) -> List[Product]:
-        """Obtiene productos de la API externa con paginación."""
+        """Obtiene productos de la API externa con paginación (cacheado)."""
+        products = await self._cached(
+            ("page", skip, limit),
+            lambda: self._fetch_products(skip, limit, timeout)
+        )
+        return list(products)
+    
+    async def _fetch_products(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        timeout: Optional[int] = None
+    ) -> List[Product]:
+        """Descarga una página de productos de la API externa."""
         if timeout is None:
             timeout = self.timeout
             
         url = f"{self.base_url}/?skip={skip}&limit={limit}"
         
         try:
-            async with httpx.AsyncClient(timeout=timeout) as client:
-                logger.info(f"Obteniendo productos: skip={skip}, limit={limit}")
-                
-                response = await client.get(url)
-                response.raise_for_status()
-                
-                data = response.json()
-                
-                # Validar y convertir a modelos Product
+            logger.debug("Obteniendo productos: skip=%d, limit=%d", skip, limit)
+            
+            response = await self._get(
+                "/", params={"skip": skip, "limit": limit}, timeout=timeout
+            )
+            response.raise_for_status()
+            
+            # Validar y convertir a modelos Product en una sola pasada directa
+            # desde los bytes: pydantic-core parsea el JSON sin materializar
+            # la lista intermedia de dicts
+            try:
+                products = _PRODUCT_LIST.validate_json(response.content)
+            except ValidationError:
+                # Alguno es inválido (o el cuerpo no es JSON válido): validar
+                # uno a uno y descartar solo esos
+                data = orjson.loads(response.content)
                 products = []
                 for item in data:
                     try:
-                        product = Product(**item)
+                        product = Product.model_validate(item)
                         products.append(product)
                     except Exception as e:
                         logger.warning(f"Error parseando producto {item.get('id', 'unknown')}: {str(e)}")
                         continue
-                
-                logger.info(f"Productos obtenidos exitosamente: {len(products)}")
-                return products
-                
+            
+            logger.debug("Productos obtenidos exitosamente: %d", len(products))
+            return products
+            
         except httpx.TimeoutException:
             logger.error(f"Timeout obteniendo productos desde {url}")
             raise
@@ -64,63 +223,145 @@ class ProductService:
             logger.error(f"Error inesperado obteniendo productos: {str(e)}")
             raise
     
-    async def get_all_products(self, batch_size: int = 100) -> List[Product]:
-        """Obtiene todos los productos usando paginación automática."""
-        all_products = []
-        skip = 0
+    async def iter_all_products(
+        self,
+        batch_size: int = 100,
+        concurrency: Optional[int] = None
+    ) -> AsyncIterator[Product]:
+        """Recorre todos los productos página a página sin acumularlos en memoria.
+        
+        La API no informa del total: tras la primera página completa se
+        mantienen ``concurrency`` páginas en vuelo y se entregan en orden.
+        """
+        concurrency = max(1, concurrency or settings.productos_api_concurrency)
+        pending: Deque[Tuple[int, asyncio.Task]] = deque()
+        next_skip = 0
+        total = 0
+        
+        def schedule() -> None:
+            nonlocal next_skip
+            # La sincronización siempre lee datos frescos, sin pasar por el cache
+            task = asyncio.create_task(self._fetch_products(skip=next_skip, limit=batch_size))
+            pending.append((next_skip, task))
+            next_skip += batch_size
         
         logger.info("Iniciando obtención de todos los productos")
         
-        while True:
-            try:
-                batch = await self.get_products(skip=skip, limit=batch_size)
-                
-                if not batch:
-                    # No hay más productos
+        # La primera página sirve de sonda: un catálogo pequeño no dispara
+        # peticiones de más
+        schedule()
+        try:
+            while pending:
+                skip, task = pending.popleft()
+                try:
+                    batch = await task
+                except Exception as e:
+                    logger.error(f"Error obteniendo batch en skip={skip}: {str(e)}")
+                    # Si no hemos obtenido nada aún, fallar
+                    if total == 0:
+                        raise
+                    # Si ya entregamos algunos productos, log el error y terminar
+                    logger.warning(f"Continuando con {total} productos obtenidos")
                     break
-                    
-                all_products.extend(batch)
-                skip += len(batch)
+                
+                for product in batch:
+                    yield product
+                
+                total += len(batch)
                 
                 # Si obtuvimos menos productos que el límite, hemos llegado al final
                 if len(batch) < batch_size:
                     break
-                    
-                logger.info(f"Productos obtenidos hasta ahora: {len(all_products)}")
                 
-                # Pequeña pausa para no sobrecargar la API
-                await asyncio.sleep(0.1)
+                logger.debug("Productos obtenidos hasta ahora: %d", total)
                 
-            except Exception as e:
-                logger.error(f"Error obteniendo batch en skip={skip}: {str(e)}")
-                # Intentar continuar con el siguiente batch o fallar completamente
-                if len(all_products) == 0:
-                    # Si no hemos obtenido nada aún, fallar
-                    raise
-                else:
-                    # Si ya tenemos algunos productos, log el error pero continuar
-                    logger.warning(f"Continuando con {len(all_products)} productos obtenidos")
-                    break
+                while len(pending) < concurrency:
+                    schedule()
+        finally:
+            # Páginas pedidas más allá del final (o tras un error) se descartan
+            for _, task in pending:
+                task.cancel()
+            await asyncio.gather(*(task for _, task in pending), return_exceptions=True)
         
-        logger.info(f"Obtención completa: {len(all_products)} productos totales")
-        return all_products
+        logger.info(f"Obtención completa: {total} productos totales")
+    
+    async def get_all_products(self, batch_size: int = 100) -> List[Product]:
+        """Obtiene todos los productos usando paginación automática."""
+        return [product async for product in self.iter_all_products(batch_size)]
     
     async def get_product_by_id(self, product_id: str) -> Optional[Product]:
-        """Obtiene un producto específico por ID."""
-        url = f"{self.base_url}/{product_id}"
+        """Obtiene un producto específico por ID (cacheado)."""
+        return await self._cached(("id", product_id), lambda: self._submit(product_id))
+    
+    async def get_products_by_ids(self, product_ids: List[str]) -> List[Optional[Product]]:
+        """Obtiene varios productos por ID, en el mismo orden (``None`` si no existe)."""
+        return list(await asyncio.gather(
+            *(self.get_product_by_id(product_id) for product_id in product_ids)
+        ))
+    
+    async def _submit(self, product_id: str) -> Optional[Product]:
+        """Encola una consulta por ID en la tanda en curso y espera su resultado.
         
+        Las consultas que llegan dentro de ``COALESCE_WINDOW_S`` se resuelven
+        juntas y los IDs repetidos comparten una única petición. La tanda sale
+        antes si alcanza ``COALESCE_MAX_BATCH``.
+        """
+        future = self._pending.get(product_id)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            self._pending[product_id] = future
+            if len(self._pending) >= COALESCE_MAX_BATCH:
+                batch, self._pending = self._pending, {}
+                task = asyncio.create_task(self._resolve(batch))
+                self._flushes.add(task)
+                task.add_done_callback(self._flushes.discard)
+            elif self._batcher is None:
+                self._batcher = asyncio.create_task(self._flush_after(COALESCE_WINDOW_S))
+        
+        # shield: cancelar a un llamador no cancela el resultado compartido
+        return await asyncio.shield(future)
+    
+    async def _flush_after(self, delay: float) -> None:
+        """Resuelve la tanda pendiente al cerrar la ventana de espera."""
+        await asyncio.sleep(delay)
+        self._batcher = None
+        batch, self._pending = self._pending, {}
+        if batch:
+            await self._resolve(batch)
+    
+    async def _resolve(self, batch: Dict[str, asyncio.Future]) -> None:
+        """Descarga una tanda de productos en paralelo sobre el pool compartido.
+        
+        La API no tiene endpoint de consulta múltiple: cada ID es un GET, pero
+        todos comparten las conexiones keep-alive del cliente.
+        """
+        product_ids = list(batch)
+        results = await asyncio.gather(
+            *(self._fetch_product(product_id) for product_id in product_ids),
+            return_exceptions=True
+        )
+        for product_id, result in zip(product_ids, results):
+            future = batch[product_id]
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+    
+    async def _fetch_product(self, product_id: str) -> Optional[Product]:
+        """Descarga un producto de la API externa; ``None`` si no existe."""
         try:
-            async with httpx.AsyncClient(timeout=self.timeout) as client:
-                response = await client.get(url)
-                
-                if response.status_code == 404:
-                    return None
-                    
-                response.raise_for_status()
-                data = response.json()
-                
-                return Product(**data)
+            response = await self._get(f"/{product_id}")
+            
+            if response.status_code == 404:
+                return None
                 
+            response.raise_for_status()
+            data = orjson.loads(response.content)
+            
+            return Product(**data)
+            
         except httpx.HTTPStatusError as e:
             if e.response.status_code == 404:
                 return None
@@ -136,7 +377,7 @@ class ProductService:
         
         try:
             # Intentar obtener un pequeño batch para verificar conectividad
-            await self.get_products(skip=0, limit=1, timeout=5)
+            await self._fetch_products(skip=0, limit=1, timeout=5)
             
             elapsed = (datetime.now() - start_time).total_seconds() * 1000
             
@@ -164,4 +405,18 @@ def get_product_service() -> ProductService:
     global _product_service
     if _product_service is None:
         _product_service = ProductService()
-    return _product_service
\ No newline at end of file
+    return _product_service
+
+
+async def close_product_service() -> None:
+    """Cierra el pool HTTP del singleton y lo descarta.
+    
+    Una llamada posterior a ``get_product_service`` crea un servicio nuevo
+    en lugar de reutilizar un cliente cerrado. Si nunca se creó, no hace nada.
+    """
+    global _product_service
+    if _product_service is None:
+        return
+    
+    service, _product_service = _product_service, None
+    await service.aclose()
\ No newline at end of file
@@ -1,29 +1,64 @@
 #!/usr/bin/env python3
 """Script para probar embeddings directamente via API REST."""
 
-import requests
+import asyncio
 import json
 from typing import List, Dict, Any
 
-def test_embeddings_via_api():
+import httpx
+
+BASE_URL = "http://localhost:8000"
+# Conexiones keep-alive reutilizadas por todas las peticiones del script
+LIMITS = httpx.Limits(max_keepalive_connections=16)
+# Búsquedas en vuelo a la vez: acota el fan-out sobre el pool
+MAX_CONCURRENT_SEARCHES = 16
+
+
+async def search(
+    client: httpx.AsyncClient,
+    sem: asyncio.Semaphore,
+    payload: Dict[str, Any],
+    timeout: float = 10
+) -> httpx.Response:
+    """Lanza una búsqueda respetando el límite de concurrencia."""
+    async with sem:
+        return await client.post("/api/v1/buscar", json=payload, timeout=timeout)
+
+
+async def test_embeddings_via_api(client: httpx.AsyncClient, sem: asyncio.Semaphore):
     """Prueba embeddings usando endpoints de la API."""
-    base_url = "http://localhost:8000"
-    
     print("🔗 PROBANDO EMBEDDINGS VÍA API REST")
     print("=" * 50)
     
+    test_queries = [
+        "smartphone con excelente cámara",
+        "laptop potente para desarrollo",
+        "auriculares con cancelación de ruido",
+        "dispositivo para gaming",
+        "equipo de fotografía profesional"
+    ]
+    
+    # Salud, búsquedas y estadísticas en paralelo; se imprimen después en orden
+    health_response, stats_response, *responses = await asyncio.gather(
+        client.get("/api/v1/health", timeout=10),
+        client.get("/api/v1/stats", timeout=10),
+        *(search(client, sem, {"query": query, "top_k": 2}, timeout=15) for query in test_queries),
+        return_exceptions=True
+    )
+    
     # 1. Verificar salud del sistema
     print("\n1️⃣ Verificando estado del sistema...")
     try:
-        response = requests.get(f"{base_url}/api/v1/health", timeout=10)
-        health = response.json()
+        if isinstance(health_response, Exception):
+            raise health_response
+        health = health_response.json()
         
         embedding_status = health['services']['embedding_model']['status']
         model_name = health['services']['embedding_model']['model']
         
         print(f"   ✅ Modelo: {model_name}")
         print(f"   ✅ Estado: {embedding_status}")
-        
+    
     except Exception as e:
         print(f"   ❌ Error: {e}")
         return False
@@ -31,27 +66,10 @@ def test_embeddings_via_api():
     # 2. Probar búsquedas semánticas (que usan embeddings internamente)
     print("\n2️⃣ Probando búsquedas semánticas...")
     
-    test_queries = [
-        "smartphone con excelente cámara",
-        "laptop potente para desarrollo", 
-        "auriculares con cancelación de ruido",
-        "dispositivo para gaming",
-        "equipo de fotografía profesional"
-    ]
-    
-    for query in test_queries:
+    for query, response in zip(test_queries, responses):
         try:
-            search_data = {
-                "query": query,
-                "top_k": 2
-            }
-            
-            response = requests.post(
-                f"{base_url}/api/v1/buscar",
-                json=search_data,
-                headers={"Content-Type": "application/json"},
-                timeout=15
-            )
+            if isinstance(response, Exception):
+                raise response
             
             if response.status_code == 200:
                 results = response.json()
@@ -63,29 +81,28 @@ def test_embeddings_via_api():
                     print(f"      └─ {i}. {product['name']} (score: {score:.3f})")
             else:
                 print(f"   ❌ Error {response.status_code}: {response.text}")
-                
+        
         except Exception as e:
             print(f"   ❌ Error en query '{query}': {e}")
     
     # 3. Estadísticas de búsqueda
     print("\n3️⃣ Estadísticas del sistema...")
     try:
-        response = requests.get(f"{base_url}/api/v1/stats", timeout=10)
-        stats = response.json()
+        if isinstance(stats_response, Exception):
+            raise stats_response
+        stats = stats_response.json()
         
         print(f"   📊 Documentos indexados: {stats['total_documents']}")
         print(f"   📏 Tamaño del índice: {stats['index_size_mb']} MB")
         print(f"   ⚡ Tiempo promedio búsqueda: {stats['avg_search_time_ms']}ms")
-        
+    
     except Exception as e:
         print(f"   ❌ Error obteniendo estadísticas: {e}")
     
     return True
 
-def compare_semantic_similarity():
+async def compare_semantic_similarity(client: httpx.AsyncClient, sem: asyncio.Semaphore):
     """Compara la similitud semántica entre diferentes queries."""
-    base_url = "http://localhost:8000"
-    
     print("\n🔬 ANÁLISIS DE SIMILITUD SEMÁNTICA")
     print("=" * 50)
     
@@ -102,23 +119,22 @@ def compare_semantic_similarity():
     
     print("Comparando similitud entre conceptos relacionados:\n")
     
-    for query1, query2 in query_pairs:
+    # Ambas queries de todos los pares en vuelo a la vez
+    responses = await asyncio.gather(
+        *(
+            search(client, sem, {"query": query, "top_k": 3})
+            for pair in query_pairs
+            for query in pair
+        ),
+        return_exceptions=True
+    )
+    
+    for (query1, query2), response1, response2 in zip(query_pairs, responses[::2], responses[1::2]):
         try:
-            # Buscar con primera query
-            response1 = requests.post(
-                f"{base_url}/api/v1/buscar",
-                json={"query": query1, "top_k": 3},
-                headers={"Content-Type": "application/json"},
-                timeout=10
-            )
-            
-            # Buscar con segunda query  
-            response2 = requests.post(
-                f"{base_url}/api/v1/buscar",
-                json={"query": query2, "top_k": 3},
-                headers={"Content-Type": "application/json"},
-                timeout=10
-            )
+            if isinstance(response1, Exception):
+                raise response1
+            if isinstance(response2, Exception):
+                raise response2
             
             if response1.status_code == 200 and response2.status_code == 200:
                 results1 = response1.json()['resultados']
@@ -146,20 +162,18 @@ def compare_semantic_similarity():
                         print(f"      Promedio: {avg_score:.3f}, Diferencia: {score_diff:.3f}")
                 else:
                     print(f"🔄 '{query1}' vs '{query2}': Sin productos en común")
-                
+        
         except Exception as e:
             print(f"❌ Error comparando '{query1}' vs '{query2}': {e}")
 
-def test_category_specific_embeddings():
+async def test_category_specific_embeddings(client: httpx.AsyncClient, sem: asyncio.Semaphore):
     """Prueba embeddings específicos por categoría."""
-    base_url = "http://localhost:8000"
-    
     print("\n📱 PRUEBA POR CATEGORÍAS")
     print("=" * 50)
     
     # Obtener categorías disponibles
     try:
-        response = requests.get(f"{base_url}/api/v1/categories", timeout=10)
+        response = await client.get("/api/v1/categories", timeout=10)
         categories_data = response.json()
         categories = [cat['name'] for cat in categories_data['categories']]
         
@@ -172,60 +186,73 @@ def test_category_specific_embeddings():
             "Audio": ["sonido", "música", "cancelación ruido"],
             "Gaming": ["juegos", "rendimiento", "fps"]
         }
+        category_queries = {
+            category: queries
+            for category, queries in category_queries.items()
+            if category in categories
+        }
+        
+        # Todas las búsquedas de todas las categorías en paralelo
+        jobs = [(category, query) for category, queries in category_queries.items() for query in queries]
+        responses = await asyncio.gather(
+            *(
+                search(client, sem, {"query": query, "category": category, "top_k": 2})
+                for category, query in jobs
+            ),
+            return_exceptions=True
+        )
         
-        for category, queries in category_queries.items():
-            if category in categories:
+        current = None
+        for (category, query), response in zip(jobs, responses):
+            if category != current:
+                current = category
                 print(f"\n🏷️  Categoría: {category}")
+            
+            try:
+                if isinstance(response, Exception):
+                    raise response
                 
-                for query in queries:
-                    try:
-                        search_data = {
-                            "query": query,
-                            "category": category,
-                            "top_k": 2
-                        }
-                        
-                        response = requests.post(
-                            f"{base_url}/api/v1/buscar",
-                            json=search_data,
-                            headers={"Content-Type": "application/json"},
-                            timeout=10
-                        )
-                        
-                        if response.status_code == 200:
-                            results = response.json()
-                            print(f"   🔍 '{query}' → {results['total_resultados']} resultados")
-                            
-                            for product in results['resultados'][:1]:
-                                print(f"      └─ {product['name']} (score: {product['score_semantico']:.3f})")
-                        
-                    except Exception as e:
-                        print(f"      ❌ Error: {e}")
-        
+                if response.status_code == 200:
+                    results = response.json()
+                    print(f"   🔍 '{query}' → {results['total_resultados']} resultados")
+                    
+                    for product in results['resultados'][:1]:
+                        print(f"      └─ {product['name']} (score: {product['score_semantico']:.3f})")
+            
+            except Exception as e:
+                print(f"      ❌ Error: {e}")
+    
     except Exception as e:
         print(f"❌ Error obteniendo categorías: {e}")
 
-if __name__ == "__main__":
+async def main() -> int:
+    """Ejecuta la suite con un único cliente HTTP compartido."""
     print("🧪 SUITE DE PRUEBAS DE EMBEDDINGS VÍA API")
     print("=" * 60)
     
-    # Verificar que la API esté disponible
-    try:
-        response = requests.get("http://localhost:8000/ping", timeout=5)
-        if response.status_code == 200:
-            print("✅ API disponible\n")
-        else:
-            print("❌ API no disponible")
-            exit(1)
-    except:
-        print("❌ No se puede conectar a la API")
-        exit(1)
-    
-    # Ejecutar pruebas
-    test_embeddings_via_api()
-    compare_semantic_similarity()  
-    test_category_specific_embeddings()
+    sem = asyncio.Semaphore(MAX_CONCURRENT_SEARCHES)
+    async with httpx.AsyncClient(base_url=BASE_URL, timeout=15, limits=LIMITS) as client:
+        # Verificar que la API esté disponible
+        try:
+            response = await client.get("/ping", timeout=5)
+            if response.status_code == 200:
+                print("✅ API disponible\n")
+            else:
+                print("❌ API no disponible")
+                return 1
+        except Exception:
+            print("❌ No se puede conectar a la API")
+            return 1
+        
+        # Ejecutar pruebas (la salida de cada una se imprime en bloque)
+        await test_embeddings_via_api(client, sem)
+        await compare_semantic_similarity(client, sem)
+        await test_category_specific_embeddings(client, sem)
     
     print("\n" + "=" * 60)
     print("🎉 PRUEBAS DE EMBEDDINGS VÍA API COMPLETADAS")
-    print("💡 El sistema de embeddings está integrado y funcionando correctamente")
\ No newline at end of file
+    print("💡 El sistema de embeddings está integrado y funcionando correctamente")
+    return 0
+
+if __name__ == "__main__":
+    exit(asyncio.run(main()))
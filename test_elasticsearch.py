@@ -27,8 +27,6 @@ async def test_basic_connection():
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def test_index_operations():
@@ -58,8 +56,6 @@ async def test_index_operations():
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def test_product_indexing():
@@ -103,8 +99,6 @@ async def test_product_indexing():
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def test_semantic_search():
@@ -141,8 +135,6 @@ async def test_semantic_search():
     except Exception as e:
         print(f"❌ Error: {str(e)}")
         return False
-    finally:
-        await es_service.close()
 
 
 async def run_full_test():
@@ -205,7 +197,12 @@ async def run_full_test():
 
 async def main():
     """Función principal."""
-    success = await run_full_test()
+    try:
+        success = await run_full_test()
+    finally:
+        # El cliente es un singleton compartido por todas las pruebas:
+        # se cierra una sola vez al terminar
+        await get_elasticsearch_service().close()
     return 0 if success else 1
 
 
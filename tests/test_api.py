@@ -1,9 +1,10 @@
 """Tests básicos para la API."""
 import pytest
 from fastapi.testclient import TestClient
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 from main import app
+from models.schemas import SearchFilters
 
 client = TestClient(app)
 
@@ -27,6 +28,45 @@ def test_ping_endpoint():
     data = response.json()
     assert data["status"] == "ok"
     assert "timestamp" in data
+    assert client.post("/ping").status_code == 405
+
+
+def test_ping_reports_starting_until_ready():
+    """/ping responde 503 mientras no terminen las verificaciones de arranque."""
+    import asyncio
+    
+    app.state.ready = asyncio.Event()
+    try:
+        response = client.get("/ping")
+        assert response.status_code == 503
+        assert response.json()["status"] == "starting"
+        assert client.get("/readyz").status_code == 503
+        
+        app.state.ready.set()
+        assert client.get("/ping").status_code == 200
+        assert client.get("/readyz").status_code == 200
+    finally:
+        del app.state.ready
+
+
+def test_cors_preflight_and_simple_headers():
+    """El middleware CORS responde el preflight y añade cabeceras una sola vez."""
+    preflight = client.options(
+        "/api/v1/buscar",
+        headers={
+            "Origin": "http://example.com",
+            "Access-Control-Request-Method": "POST",
+            "Access-Control-Request-Headers": "content-type",
+        },
+    )
+    assert preflight.status_code == 200
+    assert preflight.headers["access-control-allow-origin"] == "http://example.com"
+    assert preflight.headers["access-control-allow-headers"] == "content-type"
+    assert "POST" in preflight.headers["access-control-allow-methods"]
+    
+    response = client.get("/ping", headers={"Origin": "http://example.com"})
+    assert response.headers.get_list("access-control-allow-origin") == ["*"]
+    assert response.headers["access-control-allow-credentials"] == "true"
 
 
 @patch('services.elasticsearch_service.get_elasticsearch_service')
@@ -60,6 +100,103 @@ def test_health_endpoint(mock_embedding, mock_product, mock_es):
     assert "index_stats" in data
 
 
+def _sample_product(product_id: str):
+    """Crea un producto mínimo para los tests."""
+    from models.schemas import Product
+    
+    return Product(
+        id=product_id,
+        name=f"Producto {product_id}",
+        description="Descripción de prueba",
+        price=10.0,
+        image_url="https://example.com/image.jpg",
+        category="Test",
+        stock=1,
+        created_at="2025-01-01T00:00:00",
+        updated_at="2025-01-01T00:00:00"
+    )
+
+
+async def _aiter(items):
+    """Convierte una lista en un iterador asíncrono."""
+    for item in items:
+        yield item
+
+
+@patch('api.routes.get_product_service')
+@patch('api.routes.get_elasticsearch_service')
+def test_sync_endpoint_uses_bulk_index(mock_es, mock_product):
+    """La sincronización entrega el catálogo en streaming a bulk_index."""
+    products = [_sample_product(str(i)) for i in range(120)]
+    streamed = []
+    
+    async def bulk_index(stream, forcemerge, bulk_load):
+        assert forcemerge is False
+        assert bulk_load is True
+        streamed.extend([p async for p in stream])
+        return {"indexed": 70, "errors": 50}
+    
+    mock_es_service = AsyncMock()
+    mock_es_service.check_connection.return_value = {"status": "up"}
+    mock_es_service.bulk_index.side_effect = bulk_index
+    mock_es.return_value = mock_es_service
+    
+    mock_product_service = MagicMock()
+    mock_product_service.iter_all_products.return_value = _aiter(products)
+    mock_product.return_value = mock_product_service
+    
+    response = client.post("/api/v1/sync", json={})
+    assert response.status_code == 200
+    
+    data = response.json()
+    assert data["productos_indexados"] == 70
+    assert data["errores"] == 50
+    mock_es_service.bulk_index.assert_awaited_once()
+    mock_es_service.refresh_for_read.assert_awaited_once()
+    assert streamed == products
+
+
+@patch('api.routes.get_product_service')
+@patch('api.routes.get_elasticsearch_service')
+def test_sync_endpoint_skips_index_when_no_products(mock_es, mock_product):
+    """Sin productos no se crea ni se recrea el índice."""
+    mock_es_service = AsyncMock()
+    mock_es_service.check_connection.return_value = {"status": "up"}
+    mock_es.return_value = mock_es_service
+    
+    mock_product_service = MagicMock()
+    mock_product_service.iter_all_products.return_value = _aiter([])
+    mock_product.return_value = mock_product_service
+    
+    response = client.post("/api/v1/sync", json={"force_reindex": True})
+    assert response.status_code == 200
+    assert response.json()["productos_indexados"] == 0
+    
+    mock_es_service.recreate_index.assert_not_called()
+    mock_es_service.create_index.assert_not_called()
+
+
+@patch('api.routes.get_product_service')
+@patch('api.routes.get_elasticsearch_service')
+def test_sync_endpoint_does_not_index_when_index_fails(mock_es, mock_product):
+    """Si no se puede recrear el índice la sincronización responde 503 sin indexar."""
+    mock_es_service = AsyncMock()
+    mock_es_service.check_connection.return_value = {"status": "up"}
+    mock_es_service.recreate_index.return_value = False
+    mock_es.return_value = mock_es_service
+    
+    mock_product_service = MagicMock()
+    mock_product_service.iter_all_products.return_value = _aiter([_sample_product("1")])
+    mock_product.return_value = mock_product_service
+    
+    response = client.post("/api/v1/sync", json={"force_reindex": True})
+    assert response.status_code == 503
+    
+    mock_es_service.recreate_index.assert_awaited_once()
+    mock_es_service.bulk_index.assert_not_called()
+    mock_es_service.refresh_for_read.assert_not_called()
+
+
 def test_search_endpoint_validation():
     """Test de validación del endpoint de búsqueda."""
     # Test con query vacío
@@ -75,6 +212,60 @@ def test_search_endpoint_validation():
     assert response.status_code in [500, 503]  # Error de servicio, no de validación
 
 
+@patch('api.routes.get_elasticsearch_service')
+def test_search_endpoint_maps_connection_errors_to_503(mock_es):
+    """Un error de conexión con Elasticsearch devuelve 503 sin ping previo."""
+    from elasticsearch.exceptions import ConnectionError as ESConnectionError
+    
+    mock_es_service = AsyncMock()
+    mock_es_service.search_products.side_effect = ESConnectionError("connection refused")
+    mock_es.return_value = mock_es_service
+    
+    response = client.post("/api/v1/buscar", json={"query": "smartphone"})
+    assert response.status_code == 503
+    mock_es_service.check_connection.assert_not_called()
+
+
+@patch('api.routes.enqueue_search_prediction')
+@patch('api.routes.get_elasticsearch_service')
+def test_search_endpoint_enqueues_monitoring_record(mock_es, mock_enqueue):
+    """El registro de monitoreo se encola sin bloquear la respuesta."""
+    mock_es_service = AsyncMock()
+    mock_es_service.search_products.return_value = {
+        "query": "smartphone",
+        "total_resultados": 0,
+        "tiempo_busqueda_ms": 3,
+        "filtros_aplicados": SearchFilters(),
+        "resultados": []
+    }
+    mock_es.return_value = mock_es_service
+    
+    response = client.post("/api/v1/buscar", json={"query": "smartphone"})
+    assert response.status_code == 200
+    assert response.json()["query"] == "smartphone"
+    
+    mock_enqueue.assert_called_once()
+    assert mock_enqueue.call_args.kwargs["query"] == "smartphone"
+    assert mock_enqueue.call_args.kwargs["error"] is None
+
+
+@patch('api.routes.enqueue_search_prediction')
+@patch('api.routes.get_elasticsearch_service')
+def test_search_endpoint_enqueues_monitoring_record_on_error(mock_es, mock_enqueue):
+    """Las búsquedas fallidas también se registran en monitoreo."""
+    from elasticsearch.exceptions import ConnectionError as ESConnectionError
+    
+    mock_es_service = AsyncMock()
+    mock_es_service.search_products.side_effect = ESConnectionError("connection refused")
+    mock_es.return_value = mock_es_service
+    
+    response = client.post("/api/v1/buscar", json={"query": "smartphone"})
+    assert response.status_code == 503
+    
+    mock_enqueue.assert_called_once()
+    assert mock_enqueue.call_args.kwargs["error"] == "Service unavailable"
+
+
 def test_categories_endpoint():
     """Test del endpoint de categorías."""
     response = client.get("/api/v1/categories")
@@ -180,4 +371,46 @@ class TestProductModel:
         
         product = Product(**product_data)
         assert product.price == 123.45
-        assert isinstance(product.price, float)
\ No newline at end of file
+        assert isinstance(product.price, float)
+    
+    def test_dates_with_trailing_z(self):
+        """Las fechas ISO con sufijo Z se parsean como UTC sin validadores propios."""
+        from models.schemas import Product
+        from datetime import datetime, timezone
+        
+        product = Product(
+            id="test-123",
+            name="Test Product",
+            description="Test description",
+            price=10.0,
+            image_url="https://example.com/image.jpg",
+            category="Test Category",
+            stock=1,
+            created_at="2025-01-01T00:00:00Z",
+            updated_at="2025-01-02T10:30:00.250Z"
+        )
+        
+        assert product.created_at == datetime(2025, 1, 1, tzinfo=timezone.utc)
+        assert product.updated_at == datetime(2025, 1, 2, 10, 30, 0, 250000, tzinfo=timezone.utc)
+    
+    def test_relevancia_thresholds(self):
+        """La relevancia cambia de nivel exactamente en 0.6 y 0.8."""
+        from models.schemas import ProductWithScore
+        
+        base = {
+            "id": "test-123",
+            "name": "Test Product",
+            "description": "Test description",
+            "price": 10.0,
+            "image_url": "https://example.com/image.jpg",
+            "category": "Test Category",
+            "stock": 1,
+            "created_at": "2025-01-01T00:00:00Z",
+            "updated_at": "2025-01-01T00:00:00Z"
+        }
+        expected = {0.0: "baja", 0.5999: "baja", 0.6: "media", 0.7999: "media", 0.8: "alta", 1.0: "alta"}
+        
+        for score, level in expected.items():
+            product = ProductWithScore(**base, score_semantico=score)
+            assert product.relevancia == level
+            assert product.model_dump()["relevancia"] == level
@@ -0,0 +1,20 @@
+"""Tests de la configuración."""
+from config import get_settings, refresh_settings
+
+
+def test_refresh_settings_updates_shared_instance(monkeypatch):
+    """refresh_settings actualiza la instancia que ya tienen los módulos."""
+    settings = get_settings()
+    original = settings.categories_ttl_s
+    
+    try:
+        monkeypatch.setenv("CATEGORIES_TTL_S", "5")
+        refreshed = refresh_settings()
+        
+        assert refreshed is settings
+        assert settings.categories_ttl_s == 5
+    finally:
+        monkeypatch.delenv("CATEGORIES_TTL_S")
+        refresh_settings()
+    
+    assert settings.categories_ttl_s == original
@@ -0,0 +1,501 @@
+"""Tests del servicio de Elasticsearch."""
+import asyncio
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import numpy as np
+import orjson
+import pytest
+
+from models.schemas import Product, ProductDocument
+from services.elasticsearch_service import ElasticsearchService, _batched
+
+
+def _product(product_id: str) -> Product:
+    """Crea un producto mínimo para los tests."""
+    return Product(
+        id=product_id,
+        name=f"Producto {product_id}",
+        description="Descripción de prueba",
+        price=10.0,
+        image_url="https://example.com/image.jpg",
+        category="Test",
+        stock=1,
+        created_at="2025-01-01T00:00:00",
+        updated_at="2025-01-01T00:00:00"
+    )
+
+
+async def _aiter(items):
+    """Convierte una lista en un iterador asíncrono."""
+    for item in items:
+        yield item
+
+
+def _service() -> ElasticsearchService:
+    """Crea el servicio con cliente y embeddings simulados."""
+    service = ElasticsearchService()
+    service.es_client = AsyncMock()
+    service.index_name = "productos-test"
+    service.embedding_service = MagicMock()
+    service.embedding_service.prepare_product_text.side_effect = lambda n, d: f"{n}. {d}"
+    service.embedding_service.generate_embeddings_array = AsyncMock(
+        side_effect=lambda texts: np.full((len(texts), 384), 0.1, dtype=np.float32)
+    )
+    return service
+
+
+def test_bulk_shard_counts_unsent_products_as_errors():
+    """Si el stream bulk falla, los productos pendientes cuentan como errores."""
+    service = _service()
+    
+    async def failing_stream(client, actions, **kwargs):
+        count = 0
+        async for action in actions:
+            count += 1
+            if count > 2:
+                raise Exception("bulk error")
+            yield True, {"index": {"_id": action["_id"]}}
+    
+    with patch("services.elasticsearch_service.async_streaming_bulk", failing_stream):
+        result = asyncio.run(service._bulk_shard(
+            _batched(_aiter([_product(str(i)) for i in range(5)]), 500)
+        ))
+    
+    assert result == {"indexed": 2, "errors": 3}
+
+
+def test_bulk_shard_encodes_next_batch_while_bulk_is_pending():
+    """Los embeddings del lote siguiente se generan antes de enviar el actual."""
+    service = _service()
+    encoded_at_first_send = []
+    
+    async def stream(client, actions, **kwargs):
+        async for action in actions:
+            if not encoded_at_first_send:
+                await asyncio.sleep(0)  # el chunk "en vuelo" cede el loop
+                encoded_at_first_send.append(service.embedding_service.generate_embeddings_array.await_count)
+            yield True, {}
+    
+    with patch("services.elasticsearch_service.async_streaming_bulk", stream):
+        result = asyncio.run(service._bulk_shard(
+            _batched(_aiter([_product(str(i)) for i in range(6)]), 2)
+        ))
+    
+    assert result == {"indexed": 6, "errors": 0}
+    assert encoded_at_first_send[0] >= 2
+
+
+def test_get_categories_is_cached_until_invalidated():
+    """Las categorías se sirven desde cache hasta la siguiente indexación."""
+    service = _service()
+    service.es_client.search.return_value = {
+        "aggregations": {
+            "categories": {"buckets": [{"key": "Laptops", "doc_count": 3}]}
+        }
+    }
+    
+    first = asyncio.run(service.get_categories())
+    second = asyncio.run(service.get_categories())
+    
+    assert [c.name for c in first] == ["Laptops"]
+    assert second is first
+    assert service.es_client.search.await_count == 1
+    
+    with patch("services.elasticsearch_service.async_streaming_bulk") as bulk:
+        async def stream(client, actions, **kwargs):
+            async for action in actions:
+                yield True, {}
+        bulk.side_effect = stream
+        asyncio.run(service.bulk_index(_aiter([_product("1")])))
+    
+    asyncio.run(service.get_categories())
+    assert service.es_client.search.await_count == 2
+    assert service.es_client.search.call_args.kwargs["body"]["aggs"]["categories"]["terms"]["execution_hint"] == "map"
+
+
+def test_get_categories_discards_results_started_before_invalidation():
+    """Una consulta en vuelo durante una indexación no deja su resultado en cache."""
+    service = _service()
+    
+    async def search(**kwargs):
+        service._invalidate_caches()  # indexación concurrente
+        return {"aggregations": {"categories": {"buckets": [{"key": "Audio", "doc_count": 1}]}}}
+    
+    service.es_client.search.side_effect = search
+    
+    result = asyncio.run(service.get_categories())
+    
+    assert [c.name for c in result] == ["Audio"]
+    assert service._cats_cache is None
+
+
+def test_get_index_stats_caches_successes_only():
+    """Las estadísticas válidas se cachean; los errores no."""
+    service = _service()
+    service.es_client.indices.stats.side_effect = [
+        Exception("timeout"),
+        {"indices": {"productos-test": {"total": {"store": {"size_in_bytes": 1048576}}}}},
+    ]
+    service.es_client.count.return_value = {"count": 7}
+    
+    failed = asyncio.run(service.get_index_stats())
+    first = asyncio.run(service.get_index_stats())
+    second = asyncio.run(service.get_index_stats())
+    
+    assert failed["total_productos"] == 0
+    assert first == second == {"total_productos": 7, "index_size_mb": 1.0, "last_sync": None}
+    assert service.es_client.indices.stats.await_count == 2
+
+
+def test_bulk_index_streams_all_batches_across_workers():
+    """Todos los lotes del flujo se indexan una sola vez entre los workers."""
+    service = _service()
+    sent = []
+    
+    async def stream(client, actions, **kwargs):
+        async for action in actions:
+            sent.append(action["_id"])
+            yield True, {}
+    
+    products = [_product(str(i)) for i in range(25)]
+    with patch("services.elasticsearch_service.settings") as settings:
+        settings.sync_batch_size = 4
+        settings.sync_concurrency = 3
+        settings.sync_max_chunk_bytes = 10_000_000
+        settings.index_refresh_interval = "5s"
+        with patch("services.elasticsearch_service.async_streaming_bulk", stream):
+            result = asyncio.run(service.bulk_index(_aiter(products)))
+    
+    assert result == {"indexed": 25, "errors": 0}
+    assert sorted(sent, key=int) == [p.id for p in products]
+    # Sin refresh forzado ni cambios de ajustes fuera de una carga completa
+    service.es_client.indices.refresh.assert_not_awaited()
+    service.es_client.indices.put_settings.assert_not_awaited()
+    service.es_client.indices.forcemerge.assert_not_awaited()
+
+
+def test_bulk_load_mode_is_shared_and_restores_previous_settings():
+    """Cargas concurrentes activan el modo una vez y restauran los valores leídos."""
+    service = _service()
+    service.es_client.indices.get_settings.return_value = {
+        "productos-000001": {"settings": {
+            "index.refresh_interval": "5s",
+            "index.number_of_replicas": "2",
+        }}
+    }
+    
+    async def stream(client, actions, **kwargs):
+        async for action in actions:
+            await asyncio.sleep(0.001)
+            yield True, {}
+    
+    async def run():
+        return await asyncio.gather(
+            service.bulk_index(_aiter([_product(str(i)) for i in range(5)]), bulk_load=True),
+            service.bulk_index(_aiter([_product(str(i)) for i in range(5, 40)]), bulk_load=True),
+        )
+    
+    with patch("services.elasticsearch_service.async_streaming_bulk", stream):
+        first, second = asyncio.run(run())
+    
+    assert first["indexed"] + second["indexed"] == 40
+    service.es_client.indices.get_settings.assert_awaited_once()
+    applied = [c.kwargs["settings"]["index"] for c in service.es_client.indices.put_settings.await_args_list]
+    assert applied == [
+        {"refresh_interval": "-1", "number_of_replicas": 0, "translog.flush_threshold_size": "1gb"},
+        {"refresh_interval": "5s", "number_of_replicas": "2", "translog.flush_threshold_size": None},
+    ]
+    assert service._bulk_loads == 0
+
+
+def test_bulk_index_hands_batches_of_failed_worker_to_the_others():
+    """Si un flujo bulk cae, sus lotes sin enviar los indexan los demás."""
+    service = _service()
+    sent = []
+    calls = 0
+    
+    async def stream(client, actions, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            # Deja que el productor lea y codifique lotes antes de caer
+            await asyncio.sleep(0.01)
+            raise Exception("nodo caído")
+        async for action in actions:
+            sent.append(action["_id"])
+            await asyncio.sleep(0)
+            yield True, {}
+    
+    products = [_product(str(i)) for i in range(25)]
+    with patch("services.elasticsearch_service.settings") as settings:
+        settings.sync_batch_size = 2
+        settings.sync_concurrency = 3
+        settings.sync_max_chunk_bytes = 10_000_000
+        settings.index_refresh_interval = "5s"
+        with patch("services.elasticsearch_service.async_streaming_bulk", stream):
+            result = asyncio.run(service.bulk_index(_aiter(products)))
+    
+    assert result == {"indexed": 25, "errors": 0}
+    assert sorted(sent, key=int) == [p.id for p in products]
+
+
+def test_index_products_batch_splits_across_workers():
+    """La lista se reparte entre los workers bulk, con reintentos."""
+    service = _service()
+    chunks = []
+    
+    async def stream(client, actions, **kwargs):
+        chunks.append(kwargs)
+        async for action in actions:
+            yield True, {}
+    
+    products = [_product(str(i)) for i in range(10)]
+    with patch("services.elasticsearch_service.async_streaming_bulk", stream):
+        result = asyncio.run(service.index_products_batch(products))
+    
+    assert result == {"indexed": 10, "errors": 0}
+    # sync_concurrency=4 por defecto: lotes de ceil(10 / 4) = 3 productos
+    assert len(chunks) == 4
+    assert all(kw["chunk_size"] == 3 and kw["max_retries"] == 3 for kw in chunks)
+    assert service.embedding_service.generate_embeddings_array.await_count == 4
+    service.es_client.indices.refresh.assert_not_awaited()
+
+
+def test_search_products_coalesces_identical_requests():
+    """Las búsquedas idénticas concurrentes comparten una sola consulta."""
+    from models.schemas import SearchRequest
+    
+    service = _service()
+    calls = 0
+    
+    async def search(request):
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"query": request.query}
+    
+    service._search_products = search
+    
+    async def run():
+        request = SearchRequest(query="laptop para programar")
+        results = await asyncio.gather(*(service.search_products(request) for _ in range(5)))
+        other = await service.search_products(SearchRequest(query="auriculares"))
+        return results, other
+    
+    results, other = asyncio.run(run())
+    
+    assert calls == 2
+    assert all(r == {"query": "laptop para programar"} for r in results)
+    assert other == {"query": "auriculares"}
+
+
+def test_search_products_returns_search_response_shape():
+    """El resultado interno valida contra SearchResponse (la ruta no revalida)."""
+    from models.schemas import SearchRequest, SearchResponse
+    
+    service = _service()
+    service._ready.set()
+    service.embedding_service.generate_query_embedding = AsyncMock(return_value=[0.1] * 384)
+    source = _product("1").dict()
+    service.es_client.msearch.return_value = {
+        "responses": [
+            {"hits": {"total": {"value": 1}, "hits": [{"_id": "1", "_source": source, "_score": 1.7}]}},
+            {"hits": {"total": {"value": 1}, "hits": [{"_id": "1", "_score": 0.92}]}}
+        ]
+    }
+    
+    result = asyncio.run(service._search_products(SearchRequest(query="laptop", price_max=100)))
+    response = SearchResponse(**result)
+    
+    assert response.total_resultados == 1
+    assert response.resultados[0].id == "1"
+    assert response.resultados[0].relevancia == "alta"
+    assert response.filtros_aplicados.price_range == {"min": None, "max": 100}
+
+
+def test_search_products_reports_knn_score_apart_from_hybrid():
+    """Un hit híbrido por encima de 1 conserva su score y la parte kNN va aparte."""
+    from models.schemas import SearchRequest
+    
+    service = _service()
+    service._ready.set()
+    service.embedding_service.generate_query_embedding = AsyncMock(return_value=[0.1] * 384)
+    service.es_client.msearch.return_value = {
+        "responses": [
+            {"hits": {"total": {"value": 3}, "hits": [
+                {"_id": "1", "_source": _product("1").dict(), "_score": 2.4},
+                {"_id": "2", "_source": _product("2").dict(), "_score": 1.1},
+                {"_id": "3", "_source": _product("3").dict(), "_score": 0.9}
+            ]}},
+            {"hits": {"total": {"value": 2}, "hits": [
+                {"_id": "2", "_score": 0.85},
+                {"_id": "1", "_score": 0.55}
+            ]}}
+        ]
+    }
+    
+    results = asyncio.run(service._search_products(SearchRequest(query="laptop", top_k=3)))["resultados"]
+    
+    # Orden y score híbrido intactos (sin recortar a 1)
+    assert [(r.id, r.score_hibrido) for r in results] == [("1", 2.4), ("2", 1.1), ("3", 0.9)]
+    # La relevancia sale de la parte semántica, no del texto
+    assert [(r.score_semantico, r.relevancia) for r in results] == [
+        (0.55, "baja"), (0.85, "alta"), (0.0, "baja")
+    ]
+    
+    hybrid, knn_only = service.es_client.msearch.call_args.kwargs["searches"][1::2]
+    assert knn_only["knn"] == hybrid["knn"]
+    assert "query" not in knn_only and knn_only["_source"] is False
+
+
+def test_search_products_fails_fast_until_ready():
+    """Sin ensure_ready previo la búsqueda falla sin sondear el cluster."""
+    from elasticsearch.exceptions import ConnectionError as ESConnectionError
+    from models.schemas import SearchRequest
+    
+    service = _service()
+    
+    with pytest.raises(ESConnectionError):
+        asyncio.run(service._search_products(SearchRequest(query="laptop")))
+    
+    service.es_client.cluster.health.assert_not_awaited()
+    service.es_client.indices.exists.assert_not_awaited()
+    service.es_client.msearch.assert_not_awaited()
+
+
+def test_indexing_fails_when_not_ready():
+    """Si ensure_ready falla no se indexa nada y el fallo llega a quien llama."""
+    from elasticsearch.exceptions import ConnectionError as ESConnectionError
+    
+    service = _service()
+    service.ensure_ready = AsyncMock(return_value=False)
+    
+    assert asyncio.run(service.index_product(_product("1"))) is False
+    with pytest.raises(ESConnectionError):
+        asyncio.run(service.bulk_index(_aiter([_product("2")])))
+    
+    service.embedding_service.generate_embeddings_array.assert_not_awaited()
+    service.es_client.index.assert_not_awaited()
+    service.es_client.indices.put_settings.assert_not_awaited()
+
+
+def test_search_products_uses_knn_with_prefilter():
+    """La búsqueda usa kNN nativo con los filtros dentro del recorrido HNSW."""
+    from models.schemas import SearchRequest
+    
+    service = _service()
+    service._ready.set()
+    service.embedding_service.generate_query_embedding = AsyncMock(return_value=[0.1] * 384)
+    empty = {"hits": {"total": {"value": 0}, "hits": []}}
+    service.es_client.msearch.return_value = {"responses": [empty, empty]}
+    
+    asyncio.run(service._search_products(SearchRequest(query="laptop", top_k=20, category="Laptops")))
+    
+    body = service.es_client.msearch.call_args.kwargs["searches"][1]
+    assert "script_score" not in str(body)
+    assert body["knn"]["k"] == 20
+    assert body["knn"]["num_candidates"] == 200
+    assert {"term": {"category": "Laptops"}} in body["knn"]["filter"]
+    assert body["query"]["bool"]["filter"] == body["knn"]["filter"]
+    assert body["size"] == 20
+    # El vector ya se excluye de _source en el mapping
+    assert "_source" not in body
+    assert service._index_definition()["mappings"]["_source"] == {"excludes": ["embedding"]}
+
+
+def test_vector_index_options_follow_element_type():
+    """Por defecto hnsw (ES 8.11); int8_hnsw es opcional y no aplica a "byte"."""
+    service = _service()
+    
+    embedding = service._index_definition()["mappings"]["properties"]["embedding"]
+    assert embedding["index_options"] == {"type": "hnsw", "m": 16, "ef_construction": 100}
+    assert embedding["similarity"] == "dot_product"
+    
+    with patch("services.elasticsearch_service.settings.vector_index_type", "int8_hnsw"):
+        embedding = service._index_definition()["mappings"]["properties"]["embedding"]
+    assert embedding["index_options"]["type"] == "int8_hnsw"
+    
+    with patch("services.elasticsearch_service.settings.vector_index_type", "int8_hnsw"), \
+            patch("services.elasticsearch_service.settings.embedding_element_type", "byte"):
+        embedding = service._index_definition()["mappings"]["properties"]["embedding"]
+    assert embedding["index_options"]["type"] == "hnsw"
+    assert embedding["similarity"] == "cosine"
+
+
+def test_create_index_checks_existence_once_until_deleted():
+    """create_index solo consulta la existencia del índice la primera vez."""
+    service = _service()
+    service.es_client.indices.exists.return_value = True
+    
+    async def run():
+        await service.create_index()
+        await service.create_index()
+        await service.delete_index()
+        service.es_client.indices.exists.return_value = False
+        await service.create_index()
+    
+    asyncio.run(run())
+    
+    assert service.es_client.indices.exists.await_count == 2
+    service.es_client.indices.delete.assert_awaited_once_with(index="productos-test", ignore_unavailable=True)
+    service.es_client.indices.create.assert_awaited_once()
+
+
+def test_ensure_ready_applies_mapping_once_and_retries_failures():
+    """ensure_ready crea el índice una vez; si ES no responde lo reintenta después."""
+    service = _service()
+    service.es_client.cluster.health.side_effect = [Exception("down"), {"status": "green"}]
+    service.es_client.indices.exists.return_value = False
+    
+    async def run():
+        return [await service.ensure_ready() for _ in range(3)]
+    
+    assert asyncio.run(run()) == [False, True, True]
+    assert service.es_client.cluster.health.await_count == 2
+    service.es_client.indices.create.assert_awaited_once()
+
+
+def test_failed_recreate_index_rearms_ready_in_background():
+    """Un fallo al recrear el índice deja de servir búsquedas hasta reaplicar el mapping."""
+    service = _service()
+    service._ready.set()
+    service.es_client.indices.create.side_effect = [Exception("timeout"), {}]
+    service.es_client.indices.exists.return_value = False
+    
+    async def run():
+        with patch("services.elasticsearch_service.READY_RETRY_S", 0):
+            assert await service.recreate_index() is False
+            assert not service._ready.is_set()
+            await service._ready_retry
+        return service._ready.is_set()
+    
+    assert asyncio.run(run()) is True
+    assert service.es_client.indices.create.await_count == 2
+
+
+def test_close_elasticsearch_service_discards_closed_singleton():
+    """Tras cerrar el cliente compartido, el siguiente acceso crea uno nuevo."""
+    from services.elasticsearch_service import close_elasticsearch_service, get_elasticsearch_service
+    
+    asyncio.run(close_elasticsearch_service())
+    
+    with patch("services.elasticsearch_service.ElasticsearchService", side_effect=AsyncMock) as cls:
+        first = get_elasticsearch_service()
+        asyncio.run(close_elasticsearch_service())
+        asyncio.run(close_elasticsearch_service())
+        second = get_elasticsearch_service()
+        get_elasticsearch_service.cache_clear()
+    
+    first.close.assert_awaited_once()
+    assert second is not first and cls.call_count == 2
+
+
+def test_client_serializes_numpy_embeddings_with_orjson():
+    """El serializador JSON del cliente acepta filas float32 de numpy sin convertir."""
+    service = ElasticsearchService()
+    serializer = service.es_client.transport.serializers.get_serializer("application/json")
+    
+    embedding = np.array([[0.5, -0.25]], dtype=np.float32)[0]
+    source = ProductDocument.from_product(_product("1"), embedding).model_dump()
+    
+    assert orjson.loads(serializer.dumps(source))["embedding"] == [0.5, -0.25]
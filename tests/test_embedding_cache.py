@@ -0,0 +1,44 @@
+"""Tests del cache de embeddings en disco."""
+import asyncio
+from unittest.mock import AsyncMock
+
+import numpy as np
+
+from utils.embedding_cache import EmbeddingDiskCache
+
+
+def test_embed_generates_only_misses_and_persists(tmp_path):
+    """Solo los textos nuevos llegan al modelo y el cache sobrevive a un reinicio."""
+    path = tmp_path / "cache.npz"
+    generate = AsyncMock(side_effect=lambda texts: [[float(len(t)), 1.0] for t in texts])
+    
+    cache = EmbeddingDiskCache(path=path, model_name="test-model")
+    first = asyncio.run(cache.embed(["hola", "mundo", "hola"], generate))
+    cache.save()
+    
+    generate.assert_awaited_once_with(["hola", "mundo"])
+    assert [v.tolist() for v in first] == [[4.0, 1.0], [5.0, 1.0], [4.0, 1.0]]
+    assert first[0].dtype == np.float32
+    
+    reloaded = EmbeddingDiskCache(path=path, model_name="test-model")
+    second = asyncio.run(reloaded.embed(["mundo", "adiós"], generate))
+    
+    assert generate.await_count == 2
+    assert generate.await_args.args == (["adiós"],)
+    assert second[0].tolist() == [5.0, 1.0]
+    
+    other_model = EmbeddingDiskCache(path=path, model_name="otro-modelo")
+    asyncio.run(other_model.embed(["hola"], generate))
+    assert generate.await_args.args == (["hola"],)
+
+
+def test_embed_sends_misses_sorted_by_length(tmp_path):
+    """Los fallos llegan al modelo ordenados por longitud y vuelven en el orden original."""
+    generate = AsyncMock(side_effect=lambda texts: [[float(len(t))] for t in texts])
+    cache = EmbeddingDiskCache(path=tmp_path / "cache.npz", model_name="test-model")
+    
+    texts = ["descripción bastante larga", "corto", "mediano texto"]
+    vectors = asyncio.run(cache.embed(texts, generate))
+    
+    generate.assert_awaited_once_with(["corto", "mediano texto", "descripción bastante larga"])
+    assert [v[0] for v in vectors] == [len(t) for t in texts]
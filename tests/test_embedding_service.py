@@ -0,0 +1,158 @@
+"""Tests del servicio de embeddings."""
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from services.embedding_service import EmbeddingService, quantize_int8
+
+
+def test_warmup_runs_one_inference_on_loaded_model():
+    """El precalentamiento ejecuta una inferencia con el modelo cargado."""
+    service = EmbeddingService()
+    service.model = MagicMock()
+    
+    asyncio.run(service.warmup())
+    
+    service.model.encode.assert_called_once_with(["warmup"], convert_to_tensor=False)
+
+
+def test_quantize_int8_preserves_cosine_ranking():
+    """La cuantización por fila usa todo el rango int8 y conserva el ranking."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(50, 384)).astype(np.float32)
+    query = vectors[7] + 0.5 * rng.normal(size=384).astype(np.float32)
+    
+    quantized = quantize_int8(vectors)
+    assert quantized.dtype == np.int8
+    assert np.abs(quantized).max(axis=1).tolist() == [127] * 50
+    
+    def cosine(m, q):
+        m = m.astype(np.float32)
+        q = q.astype(np.float32)
+        return (m @ q) / (np.linalg.norm(m, axis=1) * np.linalg.norm(q))
+    
+    exact = cosine(vectors, query)
+    approx = cosine(quantized, quantize_int8(query))
+    assert int(np.argmax(approx)) == 7
+    assert np.abs(exact - approx).max() < 0.02
+
+
+def test_wait_loaded_times_out_only_while_loading():
+    """Sin carga en curso no espera; con carga en curso respeta el timeout."""
+    service = EmbeddingService()
+    assert asyncio.run(service.wait_loaded(0.01)) is True
+    
+    async def run():
+        release = asyncio.Event()
+        
+        async def slow_load():
+            await release.wait()
+            return MagicMock()
+        
+        with patch.object(asyncio.get_running_loop(), "run_in_executor", lambda *a: slow_load()):
+            load = asyncio.create_task(service._load_model())
+            await asyncio.sleep(0)
+            timed_out = await service.wait_loaded(0.01)
+            
+            waiter = asyncio.create_task(service.wait_loaded(5))
+            release.set()
+            await load
+            return timed_out, await waiter
+    
+    assert asyncio.run(run()) == (False, True)
+    assert asyncio.run(service.wait_loaded(0.01)) is True
+
+
+def test_embeddings_are_requested_normalized():
+    """Los embeddings se piden con norma 1 (el índice usa dot_product)."""
+    service = EmbeddingService()
+    service.model = MagicMock()
+    service.model.encode.return_value = np.ones((2, 4), dtype=np.float32) / 2
+    
+    asyncio.run(service.generate_embeddings_array(["a", "b"]))
+    asyncio.run(service.generate_embedding("a"))
+    
+    for call in service.model.encode.call_args_list:
+        assert call.kwargs["normalize_embeddings"] is True
+
+
+def test_fp16_embeddings_are_renormalized_in_float32():
+    """La salida FP16 del modelo se reescala a norma 1 tras pasar a float32."""
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(8, 384)).astype(np.float32)
+    half = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float16)
+    
+    service = EmbeddingService()
+    service.model = MagicMock()
+    service.model.encode.side_effect = lambda texts, **kwargs: half if isinstance(texts, list) else half[0]
+    
+    batch = asyncio.run(service.generate_embeddings_array([str(i) for i in range(8)]))
+    single = asyncio.run(service.generate_embedding_array("0"))
+    
+    assert batch.dtype == np.float32 and single.dtype == np.float32
+    assert np.all(np.abs(np.linalg.norm(batch, axis=1) - 1) < 1e-6)
+    assert abs(np.linalg.norm(single) - 1) < 1e-6
+
+
+def test_load_model_uses_fp16_and_single_thread_on_gpu():
+    """En GPU el modelo pasa a FP16, lotes de 256 y un único hilo de inferencia."""
+    service = EmbeddingService()
+    model = MagicMock()
+    
+    with patch("services.embedding_service.SentenceTransformer", return_value=model) as cls, \
+         patch("services.embedding_service.torch.cuda.is_available", return_value=True):
+        asyncio.run(service._load_model())
+    
+    assert cls.call_args.kwargs["device"] == "cuda"
+    model.half.assert_called_once()
+    assert service._batch_size() == 256
+    assert service._executor._max_workers == 1
+    service._executor.shutdown()
+
+
+def test_query_embeddings_are_cached_lru():
+    """Las consultas repetidas no se recodifican y la más antigua sale del cache."""
+    service = EmbeddingService()
+    service.model = MagicMock()
+    service.model.encode.side_effect = lambda text, **kwargs: np.full(4, len(text), dtype=np.float32)
+    
+    async def run():
+        with patch("services.embedding_service.settings.query_cache_size", 2):
+            first = await service.generate_query_embedding("laptop")
+            again = await service.generate_query_embedding("  laptop ")
+            await service.generate_query_embedding("auriculares")
+            await service.generate_query_embedding("cámara")
+        return first, again
+    
+    first, again = asyncio.run(run())
+    
+    assert again is first
+    assert first.dtype == np.float32 and not first.flags.writeable
+    assert service.model.encode.call_count == 3
+    assert list(service._query_cache) == ["auriculares", "cámara"]
+
+
+def test_prepare_product_text_collapses_whitespace_and_bounds_by_tokens():
+    """El texto se normaliza y solo se acota según max_seq_length del modelo."""
+    service = EmbeddingService()
+    service.model = MagicMock(max_seq_length=128)
+    
+    text = service.prepare_product_text(" Laptop\n Pro ", "Ideal   para\tprogramar. " + "x" * 5000)
+    
+    assert text.startswith("Laptop Pro . Ideal para programar. x")
+    assert len(text) == 128 * 8
+
+
+def test_duplicate_texts_are_encoded_once():
+    """Los textos repetidos se codifican una sola vez y se expanden en orden."""
+    service = EmbeddingService()
+    service.model = MagicMock()
+    service.model.encode.side_effect = lambda texts, **kwargs: np.eye(4, dtype=np.float32)[
+        [len(t) for t in texts]
+    ]
+    
+    result = asyncio.run(service.generate_embeddings_array(["aa", "b", "aa", "ccc", "b"]))
+    
+    assert service.model.encode.call_args.args[0] == ["aa", "b", "ccc"]
+    assert result.argmax(axis=1).tolist() == [2, 1, 2, 3, 1]
@@ -0,0 +1,91 @@
+"""Tests de las utilidades de monitoreo."""
+import asyncio
+from unittest.mock import patch
+
+import httpx
+
+from models.schemas import ProductWithScore
+from utils import monitoring
+
+
+def test_build_search_record_reads_scores_from_models():
+    """Las métricas de score se calculan sobre ProductWithScore."""
+    result = ProductWithScore(
+        id="1",
+        name="Producto",
+        description="Descripción",
+        price=10.0,
+        image_url="https://example.com/image.jpg",
+        category="Test",
+        stock=1,
+        created_at="2025-01-01T00:00:00",
+        updated_at="2025-01-01T00:00:00",
+        score_semantico=0.9,
+        relevancia="alta"
+    )
+    
+    record = monitoring.build_search_record("laptop", None, [result, {"score_semantico": 0.5}], 12)
+    
+    assert record["num_results"] == 2
+    assert record["top_score"] == 0.9
+    assert record["avg_score"] == 0.7
+
+
+def test_enqueue_counts_dropped_records_when_full():
+    """Con la cola llena el registro se descarta y se contabiliza."""
+    async def run():
+        monitoring.start_monitoring()
+        # Sin ceder el control el consumidor no vacía la cola
+        monitoring._queue = asyncio.Queue(maxsize=1)
+        dropped = monitoring.dropped_records
+        first = monitoring.enqueue_search_prediction(
+            query="a", embedding=None, results=[], latency_ms=1
+        )
+        second = monitoring.enqueue_search_prediction(
+            query="b", embedding=None, results=[], latency_ms=1
+        )
+        await monitoring.stop_monitoring()
+        return first, second, monitoring.dropped_records - dropped
+    
+    assert asyncio.run(run()) == (True, False, 1)
+
+
+def test_drain_posts_each_record_over_one_client_with_bounded_concurrency():
+    """Cada registro es un POST por el mismo cliente y nunca hay más del límite en vuelo."""
+    in_flight = 0
+    peak = 0
+    posted = []
+    clients = []
+    
+    async def handler(request):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        posted.append(request.url.path)
+        return httpx.Response(200)
+    
+    real_client = httpx.AsyncClient
+    
+    def client_factory(**kwargs):
+        clients.append(real_client(transport=httpx.MockTransport(handler), **kwargs))
+        return clients[-1]
+    
+    async def run():
+        queue = asyncio.Queue()
+        for i in range(7):
+            queue.put_nowait({"query": str(i)})
+        with patch.object(monitoring, "MONITORING_MAX_IN_FLIGHT", 3), \
+             patch.object(monitoring.httpx, "AsyncClient", client_factory):
+            consumer = asyncio.create_task(monitoring._drain(queue))
+            while len(posted) < 7:
+                await asyncio.sleep(0.005)
+            consumer.cancel()
+            await asyncio.gather(consumer, return_exceptions=True)
+    
+    asyncio.run(run())
+    
+    assert posted == ["/api/v1/predictions/search"] * 7
+    assert peak == 3
+    assert len(clients) == 1 and clients[0].is_closed
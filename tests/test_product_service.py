@@ -0,0 +1,197 @@
+"""Tests del servicio de productos."""
+import asyncio
+
+import httpx
+
+from models.schemas import Product
+from services.product_service import ProductService
+
+
+def _item(product_id: str) -> dict:
+    """Producto mínimo tal como lo devuelve la API externa."""
+    return {
+        "id": product_id,
+        "name": f"Producto {product_id}",
+        "description": "Descripción de prueba",
+        "price": 10.0,
+        "image_url": "https://example.com/image.jpg",
+        "category": "Test",
+        "stock": 1,
+        "created_at": "2025-01-01T00:00:00",
+        "updated_at": "2025-01-01T00:00:00"
+    }
+
+
+def _product(product_id: str) -> Product:
+    """Crea un producto mínimo para los tests."""
+    return Product(**_item(product_id))
+
+
+def _service(handler) -> ProductService:
+    """Crea el servicio con un transporte HTTP simulado."""
+    service = ProductService()
+    service.base_url = "http://productos.test/api/v1/products"
+    service._client = httpx.AsyncClient(
+        base_url=service.base_url,
+        transport=httpx.MockTransport(handler)
+    )
+    return service
+
+
+def test_calls_share_one_client():
+    """Todas las llamadas reutilizan el mismo cliente y su pool."""
+    requests = []
+
+    def handler(request):
+        requests.append(request)
+        if request.url.path.endswith("/products/"):
+            return httpx.Response(200, json=[_item("1")])
+        return httpx.Response(200, json=_item(request.url.path.rsplit("/", 1)[-1]))
+
+    service = _service(handler)
+    client = service._client
+
+    async def run():
+        products = await service.get_products(skip=5, limit=1)
+        product = await service.get_product_by_id("7")
+        assert service._get_client() is client
+        await service.aclose()
+        return products, product
+
+    products, product = asyncio.run(run())
+
+    assert [p.id for p in products] == ["1"]
+    assert product.id == "7"
+    assert str(requests[0].url) == "http://productos.test/api/v1/products/?skip=5&limit=1"
+    assert client.is_closed
+    assert service._client is None
+
+
+def test_iter_all_products_fetches_pages_concurrently():
+    """Las páginas se piden en paralelo y se entregan en orden."""
+    catalog = [str(i) for i in range(230)]
+    in_flight = 0
+    peak = 0
+
+    async def fake_fetch_products(skip=0, limit=100, timeout=None):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return [_product(product_id) for product_id in catalog[skip:skip + limit]]
+
+    service = ProductService()
+    service._fetch_products = fake_fetch_products
+
+    async def run():
+        return [p.id async for p in service.iter_all_products(batch_size=50, concurrency=3)]
+
+    assert asyncio.run(run()) == catalog
+    assert peak == 3
+
+
+def test_iter_all_products_keeps_partial_results_on_error():
+    """Un fallo tras entregar productos corta el recorrido sin propagar."""
+    async def fake_fetch_products(skip=0, limit=100, timeout=None):
+        if skip >= 100:
+            raise httpx.ConnectError("caída")
+        return [_product(str(i)) for i in range(skip, skip + limit)]
+
+    service = ProductService()
+    service._fetch_products = fake_fetch_products
+
+    async def run():
+        return [p.id async for p in service.iter_all_products(batch_size=50, concurrency=4)]
+
+    assert len(asyncio.run(run())) == 100
+
+
+def test_product_cache_hits_revalidates_and_invalidates():
+    """Las repeticiones salen del cache; a mitad de TTL se refrescan en segundo plano."""
+    calls = []
+
+    async def fake_fetch_product(product_id):
+        calls.append(product_id)
+        return _product(product_id)
+
+    service = ProductService()
+    service._fetch_product = fake_fetch_product
+
+    async def run():
+        await service.get_product_by_id("1")
+        await service.get_product_by_id("1")
+        assert calls == ["1"]
+
+        # Entrada envejecida más allá de ttl/2: se sirve y se refresca
+        fetched_at, value = service._cache[("id", "1")]
+        service._cache[("id", "1")] = (fetched_at - 200, value)
+        assert await service.get_product_by_id("1") is value
+        await asyncio.gather(*service._refreshing.values())
+        assert calls == ["1", "1"]
+        assert service._cache[("id", "1")][0] > fetched_at - 200
+
+        service.invalidate("1")
+        await service.get_product_by_id("1")
+        assert calls == ["1", "1", "1"]
+
+    asyncio.run(run())
+
+
+def test_get_products_by_ids_coalesces_requests():
+    """Los IDs de una misma ventana salen en una tanda y los repetidos una sola vez."""
+    calls = []
+
+    async def fake_fetch_product(product_id):
+        calls.append(product_id)
+        await asyncio.sleep(0)
+        return None if product_id == "404" else _product(product_id)
+
+    service = ProductService()
+    service._fetch_product = fake_fetch_product
+
+    async def run():
+        return await service.get_products_by_ids(["1", "2", "1", "404"])
+
+    products = asyncio.run(run())
+
+    assert [p.id if p else None for p in products] == ["1", "2", "1", None]
+    assert sorted(calls) == ["1", "2", "404"]
+    assert service._pending == {}
+
+
+def test_get_products_skips_only_invalid_items():
+    """Un producto inválido en la página se descarta sin perder el resto."""
+    invalid = {**_item("2"), "price": "gratis"}
+
+    def handler(request):
+        return httpx.Response(200, json=[_item("1"), invalid, _item("3")])
+
+    service = _service(handler)
+
+    products = asyncio.run(service._fetch_products(skip=0, limit=3))
+
+    assert [p.id for p in products] == ["1", "3"]
+
+
+def test_transient_errors_are_retried():
+    """Un 503 puntual se reintenta; un 404 no."""
+    responses = {"1": [503, 200], "2": [404, 200]}
+    calls = []
+
+    def handler(request):
+        product_id = request.url.path.rsplit("/", 1)[-1]
+        calls.append(product_id)
+        status = responses[product_id].pop(0)
+        return httpx.Response(status, json=_item(product_id) if status == 200 else {})
+
+    service = _service(handler)
+
+    async def run():
+        return await service._fetch_product("1"), await service._fetch_product("2")
+
+    first, second = asyncio.run(run())
+
+    assert first.id == "1"
+    assert second is None
+    assert calls == ["1", "1", "2"]
@@ -0,0 +1,83 @@
+"""Cache persistente de embeddings en disco para los scripts de ejemplo."""
+import hashlib
+import os
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+from config import get_settings
+from utils.logger import get_logger
+
+settings = get_settings()
+logger = get_logger(__name__)
+
+DEFAULT_CACHE_PATH = Path(__file__).resolve().parent.parent / ".embedding_cache.npz"
+
+
+class EmbeddingDiskCache:
+    """Cache texto → embedding float32 guardado en un único fichero ``.npz``.
+
+    La clave es BLAKE2b del nombre del modelo y el texto, de modo que un
+    cambio de modelo no reutiliza vectores antiguos.
+    """
+
+    def __init__(self, path: Optional[Path] = None, model_name: Optional[str] = None):
+        """Carga el cache desde disco si existe."""
+        self.path = Path(path or DEFAULT_CACHE_PATH)
+        self.model_name = model_name or settings.embedding_model_name
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._dirty = False
+
+        if self.path.exists():
+            try:
+                with np.load(self.path) as data:
+                    self._vectors = {key: data[key] for key in data.files}
+            except Exception as e:
+                logger.warning(f"No se pudo leer el cache de embeddings {self.path}: {str(e)}")
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+    def _key(self, text: str) -> str:
+        """Clave estable para un texto con el modelo actual."""
+        payload = f"{self.model_name}\0{text}".encode("utf-8")
+        return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+    async def embed(
+        self,
+        texts: List[str],
+        generate: Callable[[List[str]], Awaitable[List[List[float]]]]
+    ) -> List[np.ndarray]:
+        """Devuelve los embeddings de ``texts`` generando solo los que faltan."""
+        keys = [self._key(text) for text in texts]
+
+        # Los fallos se agrupan en una sola llamada al modelo
+        misses = {}
+        for key, text in zip(keys, texts):
+            if key not in self._vectors and key not in misses:
+                misses[key] = text
+
+        if misses:
+            # Ordenar por longitud agrupa textos similares en cada lote del
+            # modelo y reduce el padding; el diccionario deshace la permutación
+            pending = sorted(misses.items(), key=lambda item: len(item[1]))
+            generated = await generate([text for _, text in pending])
+            if not generated:
+                return []
+            for (key, _), vector in zip(pending, generated):
+                self._vectors[key] = np.asarray(vector, dtype=np.float32)
+            self._dirty = True
+
+        return [self._vectors[key] for key in keys]
+
+    def save(self) -> None:
+        """Escribe el cache a disco si hubo cambios."""
+        if not self._dirty:
+            return
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez_compressed(f, **self._vectors)
+        os.replace(tmp_path, self.path)
+        self._dirty = False
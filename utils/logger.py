@@ -1,7 +1,7 @@
 """Sistema de logging configurado para la aplicación."""
 import logging
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
 from config import get_settings
@@ -14,8 +14,9 @@ class StructuredFormatter(logging.Formatter):
     
     def format(self, record: logging.LogRecord) -> str:
         """Formatea el log record con estructura adicional."""
-        # Agregar timestamp
-        record.timestamp = datetime.utcnow().isoformat() + "Z"
+        # Agregar timestamp (el instante ya registrado en el record, en UTC)
+        created = datetime.fromtimestamp(record.created, timezone.utc)
+        record.timestamp = created.replace(tzinfo=None).isoformat() + "Z"
         
         # Formatear el mensaje base
         formatted = super().format(record)
@@ -1,4 +1,6 @@
 """Monitoring utilities for ML logging."""
+import asyncio
+import contextlib
 import httpx
 import numpy as np
 from typing import List, Dict, Any, Optional
@@ -7,12 +9,75 @@ from config import get_settings
 
 settings = get_settings()
 MONITORING_SERVICE_URL = "http://localhost:8003/api/v1"
+MONITORING_QUEUE_SIZE = 10_000
+# The monitoring API only accepts one record per request: this caps how many
+# posts are in flight at once, not the size of a payload
+MONITORING_MAX_IN_FLIGHT = 100
+
+# Pending records queue and its consumer (created at startup)
+_queue: Optional[asyncio.Queue] = None
+_consumer: Optional[asyncio.Task] = None
+dropped_records = 0
+
+
+def build_search_record(
+    query: str,
+    embedding: Optional[List[float]],
+    results: List[Any],
+    latency_ms: float,
+    category_filter: Optional[str] = None,
+    price_min: Optional[float] = None,
+    price_max: Optional[float] = None,
+    error: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Build the monitoring payload for a search."""
+    embedding_norm = None
+    if embedding:
+        embedding_array = np.array(embedding)
+        embedding_norm = float(np.linalg.norm(embedding_array))
+
+    top_score = None
+    avg_score = None
+    if results:
+        # Results may be ProductWithScore models or plain dicts
+        scores = [
+            r.get("score_semantico", 0) if isinstance(r, dict) else getattr(r, "score_semantico", 0)
+            for r in results
+        ]
+        top_score = float(max(scores)) if scores else None
+        avg_score = float(np.mean(scores)) if scores else None
+
+    return {
+        "query": query,
+        "query_length": len(query),
+        "embedding_norm": embedding_norm,
+        "num_results": len(results),
+        "top_score": top_score,
+        "avg_score": avg_score,
+        "category_filter": category_filter,
+        "price_min": price_min,
+        "price_max": price_max,
+        "latency_ms": latency_ms,
+        "error": error,
+    }
+
+
+async def _send(client: httpx.AsyncClient, payload: Dict[str, Any]) -> None:
+    """Post one record, never raising."""
+    try:
+        await client.post(
+            f"{MONITORING_SERVICE_URL}/predictions/search",
+            json=payload
+        )
+    except Exception as e:
+        # Don't fail the main request if monitoring fails
+        print(f"Warning: Failed to log prediction to monitoring: {e}")
 
 
 async def log_search_prediction(
     query: str,
     embedding: Optional[List[float]],
-    results: List[Dict[str, Any]],
+    results: List[Any],
     latency_ms: float,
     category_filter: Optional[str] = None,
     price_min: Optional[float] = None,
@@ -21,40 +86,67 @@ async def log_search_prediction(
 ):
     """Log search prediction to monitoring service."""
     try:
-        # Calculate metrics
-        embedding_norm = None
-        if embedding:
-            embedding_array = np.array(embedding)
-            embedding_norm = float(np.linalg.norm(embedding_array))
-
-        top_score = None
-        avg_score = None
-        if results:
-            scores = [r.get("score_semantico", 0) for r in results]
-            top_score = float(max(scores)) if scores else None
-            avg_score = float(np.mean(scores)) if scores else None
-
-        payload = {
-            "query": query,
-            "query_length": len(query),
-            "embedding_norm": embedding_norm,
-            "num_results": len(results),
-            "top_score": top_score,
-            "avg_score": avg_score,
-            "category_filter": category_filter,
-            "price_min": price_min,
-            "price_max": price_max,
-            "latency_ms": latency_ms,
-            "error": error,
-        }
+        payload = build_search_record(
+            query, embedding, results, latency_ms,
+            category_filter, price_min, price_max, error
+        )
 
         # Send async request
         async with httpx.AsyncClient(timeout=2.0) as client:
-            await client.post(
-                f"{MONITORING_SERVICE_URL}/predictions/search",
-                json=payload
-            )
+            await _send(client, payload)
 
     except Exception as e:
         # Don't fail the main request if monitoring fails
-        print(f"Warning: Failed to log prediction to monitoring: {e}")
\ No newline at end of file
+        print(f"Warning: Failed to log prediction to monitoring: {e}")
+
+
+def enqueue_search_prediction(**kwargs: Any) -> bool:
+    """Queue a search record without blocking; drops it if the queue is full."""
+    global dropped_records
+
+    if _queue is None:
+        dropped_records += 1
+        return False
+
+    try:
+        _queue.put_nowait(build_search_record(**kwargs))
+        return True
+    except asyncio.QueueFull:
+        dropped_records += 1
+        return False
+    except Exception as e:
+        print(f"Warning: Failed to queue monitoring record: {e}")
+        return False
+
+
+async def _drain(queue: asyncio.Queue) -> None:
+    """Post queued records concurrently over a single persistent client.
+
+    Each record is still its own request (there is no bulk endpoint); the
+    client's keep-alive pool and the in-flight cap are what keep it cheap.
+    """
+    async with httpx.AsyncClient(timeout=2.0) as client:
+        while True:
+            pending = [await queue.get()]
+            while len(pending) < MONITORING_MAX_IN_FLIGHT and not queue.empty():
+                pending.append(queue.get_nowait())
+
+            await asyncio.gather(*(_send(client, payload) for payload in pending))
+
+
+def start_monitoring() -> None:
+    """Create the monitoring queue and start its consumer."""
+    global _queue, _consumer
+    _queue = asyncio.Queue(maxsize=MONITORING_QUEUE_SIZE)
+    _consumer = asyncio.create_task(_drain(_queue))
+
+
+async def stop_monitoring() -> None:
+    """Stop the consumer; pending records are discarded."""
+    global _queue, _consumer
+    if _consumer is not None:
+        _consumer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await _consumer
+    _queue = None
+    _consumer = None